@@ -2,8 +2,7 @@ import cv2
 import numpy as np
 import depthai as dai
 import control_vals as cv
-
-CONTROL_VALS_FILE = "control_vals.py"
+from calibration import save_calibration
 
 def empty(a):
     """Dummy function for trackbar callback."""
@@ -22,18 +21,8 @@ def get_centerline():
     return cv2.getTrackbarPos("Centerline", "Centerline Adjustment")
 
 def save_centerline(value):
-    """Save the adjusted centerline value to control_vals.py."""
-    with open(CONTROL_VALS_FILE, "r") as file:
-        lines = file.readlines()
-
-    # Update the VERTICAL_CENTERLINE value in control_vals.py
-    for i, line in enumerate(lines):
-        if line.strip().startswith("VERTICAL_CENTERLINE ="):
-            lines[i] = f"VERTICAL_CENTERLINE = {value}\n"
-            break
-
-    with open(CONTROL_VALS_FILE, "w") as file:
-        file.writelines(lines)
+    """Save the adjusted centerline value to the calibration file."""
+    save_calibration({"VERTICAL_CENTERLINE": value})
     print(f"Centerline saved: {value}%")
 
 def main():
@@ -2,37 +2,24 @@ import cv2
 import depthai as dai
 import numpy as np
 import control_vals as cv  # Import the control values module
+from calibration import save_calibration
 
 
 def save_bar_positions(horizontal1, horizontal2, vertical1, vertical2, vertical3, vertical4):
-    """Save the adjusted bar positions to control_vals.py."""
-    with open("control_vals.py", "r") as file:
-        lines = file.readlines()
-
-    with open("control_vals.py", "w") as file:
-        inside_bar_positions = False
-        for line in lines:
-            if line.strip().startswith("BAR_POSITIONS ="):
-                inside_bar_positions = True
-                file.write(
-                    f"BAR_POSITIONS = {{\n"
-                    f"    'horizontal1': {horizontal1},  # Default position for the first horizontal bar\n"
-                    f"    'horizontal2': {horizontal2},  # Default position for the second horizontal bar\n"
-                    f"    'vertical1': {vertical1},    # Default position for the first vertical bar\n"
-                    f"    'vertical2': {vertical2},    # Default position for the second vertical bar\n"
-                    f"    'vertical3': {vertical3},    # Default position for the third vertical bar\n"
-                    f"    'vertical4': {vertical4}     # Default position for the fourth vertical bar\n"
-                    f"}}\n"
-                )
-            elif inside_bar_positions and line.strip() == "}":
-                inside_bar_positions = False
-            elif not inside_bar_positions:
-                file.write(line)
+    """Save the adjusted bar positions to the calibration file."""
+    save_calibration({"BAR_POSITIONS": {
+        "horizontal1": horizontal1,
+        "horizontal2": horizontal2,
+        "vertical1": vertical1,
+        "vertical2": vertical2,
+        "vertical3": vertical3,
+        "vertical4": vertical4,
+    }})
 
 
 def adjust_bars():
     """Adjust the horizontal and vertical bar positions using trackbars."""
-    # Load initial bar positions from control_vals.py
+    # Load initial bar positions (control_vals.py defaults or the calibration file)
     positions = cv.BAR_POSITIONS
     horizontal1 = positions["horizontal1"]
     horizontal2 = positions["horizontal2"]
@@ -105,7 +92,7 @@ def adjust_bars():
             # Check for user input
             key = cv2.waitKey(1) & 0xFF
             if key == ord("q"):
-                # Save bar positions to control_vals.py
+                # Save bar positions to the calibration file
                 save_bar_positions(horizontal1, horizontal2, vertical1, vertical2, vertical3, vertical4)
                 print("Bar positions saved.")
                 break
@@ -2,8 +2,7 @@ import cv2
 import numpy as np
 import depthai as dai
 import control_vals as cv
-
-CONTROL_VALS_FILE = "control_vals.py"
+from calibration import save_calibration
 
 def empty(a):
     """Dummy function for trackbar callback."""
@@ -25,19 +24,8 @@ def get_crop_values():
     return high_crop, low_crop
 
 def save_crop_values(high_crop, low_crop):
-    """Save the adjusted cropping range to control_vals.py."""
-    with open(CONTROL_VALS_FILE, "r") as file:
-        lines = file.readlines()
-
-    # Update the HIGH_CROP and LOW_CROP values in control_vals.py
-    for i, line in enumerate(lines):
-        if line.strip().startswith("HIGH_CROP ="):
-            lines[i] = f"HIGH_CROP = {high_crop}\n"
-        elif line.strip().startswith("LOW_CROP ="):
-            lines[i] = f"LOW_CROP = {low_crop}\n"
-
-    with open(CONTROL_VALS_FILE, "w") as file:
-        file.writelines(lines)
+    """Save the adjusted cropping range to the calibration file."""
+    save_calibration({"HIGH_CROP": high_crop, "LOW_CROP": low_crop})
     print(f"Crop values saved: High Crop = {high_crop}%, Low Crop = {low_crop}%")
 
 def main():
@@ -0,0 +1,120 @@
+# bench_latency.py
+
+import argparse
+import json
+import logging
+import math
+import time
+from datetime import timedelta
+import control_vals as cv
+from fake_vesc import FakeVESC
+from controller_input import Controller
+from latency_probe import LatencyProbe
+from perform_line_following import perform_line_following, FrameSourceExhausted
+from synthetic_frames import SCENES, scene_frame
+
+# Scenes cycled through by default; the endpoint scene would start a real-time U-turn
+DEFAULT_SCENES = ["straight", "offset_left", "curve_left", "offset_right", "curve_right"]
+
+
+class FakeFrame:
+    """Stand-in for dai.ImgFrame with a host monotonic capture timestamp."""
+    def __init__(self, frame, capture_ts):
+        self._frame = frame
+        self._capture_ts = capture_ts
+
+    def getCvFrame(self):
+        # Copy like depthai does when converting, so each frame costs the same
+        return self._frame.copy()
+
+    def getTimestamp(self):
+        return timedelta(seconds=self._capture_ts)
+
+
+class FakeCamera:
+    """
+    Stand-in for dai.Device producing synthetic frames in real time.
+
+    Frames are captured every 1/fps seconds whether or not anyone reads them.
+    The output queue behaves like a non-blocking depthai queue: it holds the
+    newest max_size frames, get() returns the oldest of them and waits for the
+    next capture when it is empty. With fps=0 a frame is captured on every get().
+    """
+    def __init__(self, frames, fps=cv.CAMERA_FPS, duration=10.0, max_size=4):
+        self._frames = frames
+        self._period = 1.0 / fps if fps else 0.0
+        self._max_size = max_size
+        self._start = time.monotonic()
+        self._end = self._start + duration
+        self._next_index = 0
+
+    def getOutputQueue(self, *args, **kwargs):
+        return self
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self._end:
+            raise FrameSourceExhausted()
+        if not self._period:
+            index, capture_ts = self._next_index, now
+        else:
+            newest = math.floor((now - self._start) / self._period)
+            # Older frames were overwritten while the loop was busy
+            index = max(self._next_index, newest - self._max_size + 1)
+            capture_ts = self._start + index * self._period
+            if capture_ts > now:
+                time.sleep(capture_ts - now)
+        self._next_index = index + 1
+        return FakeFrame(self._frames[index % len(self._frames)], capture_ts)
+
+
+def run_latency_benchmark(width=cv.CAMERA_RESOLUTION_WIDTH, height=cv.CAMERA_RESOLUTION_HEIGHT,
+                          fps=cv.CAMERA_FPS, duration=10.0, scenes=DEFAULT_SCENES, color=None):
+    """
+    Run perform_line_following against FakeCamera and FakeVESC.
+
+    Args:
+        color (str): Color to search for, so spot detection runs every frame too.
+
+    Returns:
+        dict: LatencyProbe summary.
+    """
+    frames = [scene_frame(name, width, height) for name in scenes]
+    controller = Controller(start=False)
+    controller.color_to_search = color
+    probe = LatencyProbe()
+    perform_line_following(FakeVESC(), [], device=FakeCamera(frames, fps, duration), controller=controller, probe=probe)
+    return probe.summary()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Measure frame capture to VESC command latency with a fake camera and fake VESC.")
+    parser.add_argument("--resolution", default=f"{cv.CAMERA_RESOLUTION_WIDTH}x{cv.CAMERA_RESOLUTION_HEIGHT}",
+                        help="Frame size as WIDTHxHEIGHT.")
+    parser.add_argument("--fps", type=float, default=cv.CAMERA_FPS, help="Camera frame rate, 0 for unthrottled.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run.")
+    parser.add_argument("--scenes", nargs="+", choices=list(SCENES), default=DEFAULT_SCENES,
+                        help="Synthetic scenes cycled through.")
+    parser.add_argument("--color", choices=["red", "blue", "green"], default=None,
+                        help="Search for this color so spot detection runs every frame.")
+    parser.add_argument("--output", default=None, help="Write the summary as JSON to this file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # Keep the per-frame loop logging out of the console output
+    logging.getLogger('LineFollowing').setLevel(logging.ERROR)
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+
+    summary = run_latency_benchmark(width, height, args.fps, args.duration, args.scenes, args.color)
+    summary.update(resolution=args.resolution, fps=args.fps, color=args.color)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
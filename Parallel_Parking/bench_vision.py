@@ -0,0 +1,232 @@
+# bench_vision.py
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import cv2
+import numpy as np
+import control_vals as cv
+from crop_frame import crop_frame
+from filter_yellow_line import filter_yellow_line
+from get_line_position import get_line_position
+from detect_endpoint import detect_endpoint
+from color_detection import detect_color_in_boxes, is_color_present_in_row
+from synthetic_frames import RESOLUTIONS, SCENES, scene_frame
+
+STAGES = ["crop_frame", "filter_yellow_line", "detect_endpoint", "get_line_position",
+          "detect_color_in_boxes", "is_color_present_in_row", "pipeline"]
+
+# Color searched for in scenes without a spot (so the color stages still do their full work)
+DEFAULT_SEARCH_COLOR = "blue"
+
+
+class StaticFrameDevice:
+    """Stand-in for dai.Device whose output queue always returns the same frame."""
+    def __init__(self, frame):
+        self._frame = frame
+
+    def getOutputQueue(self, *args, **kwargs):
+        return self
+
+    def get(self):
+        return self
+
+    def getCvFrame(self):
+        return self._frame
+
+
+def _time_calls(function, repeat, warmup):
+    """Call function repeat times (after warmup calls) and return the durations in microseconds."""
+    for _ in range(warmup):
+        function()
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        function()
+        samples[i] = (time.perf_counter_ns() - start) / 1000
+    return samples
+
+
+def _summarize(samples):
+    return {
+        "median_us": round(float(np.median(samples)), 2),
+        "p95_us": round(float(np.percentile(samples, 95)), 2),
+        "mean_us": round(float(np.mean(samples)), 2),
+        "samples": int(len(samples)),
+    }
+
+
+def run_pipeline(frame, device, color):
+    """One line-following iteration with an active color search, as in perform_line_following."""
+    cropped_frame = crop_frame(frame, cv.LINES["horizontal_y_percent"])
+    yellow_mask = filter_yellow_line(cropped_frame)
+    if detect_endpoint(yellow_mask, cv.LINES):
+        return
+    get_line_position(yellow_mask)
+    detect_color_in_boxes(color, device)
+    is_color_present_in_row(color, device, row=1)
+    is_color_present_in_row(color, device, row=3)
+
+
+def bench_resolution(width, height, scenes, repeat, warmup):
+    """
+    Time each stage, and the whole pipeline, over the given scenes at one resolution.
+
+    Returns:
+        dict: Stage name to timing summary (median/p95/mean in microseconds).
+    """
+    samples = {stage: [] for stage in STAGES}
+    for name in scenes:
+        frame = scene_frame(name, width, height)
+        color = SCENES[name].get("spot") or DEFAULT_SEARCH_COLOR
+        device = StaticFrameDevice(frame)
+        cropped = crop_frame(frame, cv.LINES["horizontal_y_percent"])
+        mask = filter_yellow_line(cropped)
+
+        stages = {
+            "crop_frame": lambda: crop_frame(frame, cv.LINES["horizontal_y_percent"]),
+            "filter_yellow_line": lambda: filter_yellow_line(cropped),
+            "detect_endpoint": lambda: detect_endpoint(mask, cv.LINES),
+            "get_line_position": lambda: get_line_position(mask),
+            "detect_color_in_boxes": lambda: detect_color_in_boxes(color, device),
+            "is_color_present_in_row": lambda: is_color_present_in_row(color, device, row=1),
+            # Color stages read fresh frames from the queue, as they do live
+            "pipeline": lambda: run_pipeline(frame, device, color),
+        }
+        for stage, function in stages.items():
+            samples[stage].append(_time_calls(function, repeat, warmup))
+
+    return {stage: _summarize(np.concatenate(samples[stage])) for stage in STAGES}
+
+
+def check_scenes(width, height):
+    """
+    Confirm the vision functions see what each synthetic scene contains, so a
+    benchmark never silently times a pipeline that stopped detecting anything.
+
+    Returns:
+        list: Descriptions of mismatches, empty when all scenes are detected as drawn.
+    """
+    problems = []
+    for name, scene in SCENES.items():
+        frame = scene_frame(name, width, height)
+        mask = filter_yellow_line(crop_frame(frame, cv.LINES["horizontal_y_percent"]))
+        if detect_endpoint(mask, cv.LINES) != scene.get("endpoint", False):
+            problems.append(f"{name}: endpoint")
+        if (get_line_position(mask) is None) != (scene.get("offset", 0.0) is None):
+            problems.append(f"{name}: line position")
+        if scene.get("spot"):
+            device = StaticFrameDevice(frame)
+            expected = (True, scene["side"]) if scene.get("rows", (1, 3)) == (1, 3) else (False, None)
+            if detect_color_in_boxes(scene["spot"], device) != expected:
+                problems.append(f"{name}: color boxes")
+            if not is_color_present_in_row(scene["spot"], device, row=3):
+                problems.append(f"{name}: color row")
+    return problems
+
+
+def run_benchmark(resolutions=RESOLUTIONS, scenes=None, repeat=200, warmup=10):
+    """Run the full suite and return the JSON-serializable report."""
+    scenes = scenes or list(SCENES)
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads(),
+            "repeat": repeat,
+            "scenes": scenes,
+        },
+        "results": {},
+    }
+    for width, height in resolutions:
+        key = f"{width}x{height}"
+        problems = check_scenes(width, height)
+        if problems:
+            print(f"Warning: {key} scenes not detected as drawn: {', '.join(problems)}", file=sys.stderr)
+        report["results"][key] = bench_resolution(width, height, scenes, repeat, warmup)
+        report["results"][key]["scene_problems"] = problems
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """
+    Compare median stage times to a stored baseline report.
+
+    Returns:
+        list: (resolution, stage, baseline_us, current_us, ratio) for every stage
+        slower than the baseline by more than tolerance (0.15 = 15 %).
+    """
+    regressions = []
+    for resolution, stages in report["results"].items():
+        for stage in STAGES:
+            base = baseline.get("results", {}).get(resolution, {}).get(stage)
+            if base is None:
+                continue
+            ratio = stages[stage]["median_us"] / max(base["median_us"], 1e-9)
+            if ratio > 1 + tolerance:
+                regressions.append((resolution, stage, base["median_us"], stages[stage]["median_us"], ratio))
+    return regressions
+
+
+def print_report(report, baseline=None):
+    for resolution, stages in report["results"].items():
+        print(f"\n{resolution}")
+        print(f"{'stage':<24} {'median us':>10} {'p95 us':>10}" + (f" {'baseline':>10} {'ratio':>6}" if baseline else ""))
+        for stage in STAGES:
+            row = f"{stage:<24} {stages[stage]['median_us']:>10.1f} {stages[stage]['p95_us']:>10.1f}"
+            base = (baseline or {}).get("results", {}).get(resolution, {}).get(stage)
+            if base:
+                row += f" {base['median_us']:>10.1f} {stages[stage]['median_us'] / max(base['median_us'], 1e-9):>6.2f}"
+            print(row)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the vision functions on synthetic frames.")
+    parser.add_argument("--resolutions", nargs="+", default=[f"{w}x{h}" for w, h in RESOLUTIONS],
+                        help="Frame sizes as WIDTHxHEIGHT.")
+    parser.add_argument("--scenes", nargs="+", choices=list(SCENES), default=None, help="Scenes to time (default: all).")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed calls per stage and scene.")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file (default: stdout).")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed median slowdown against the baseline before failing (0.15 = 15%%).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    resolutions = [tuple(int(v) for v in r.lower().split("x")) for r in args.resolutions]
+    report = run_benchmark(resolutions, args.scenes, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print_report(report, baseline)
+        print(f"\nReport saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for resolution, stage, base, current, ratio in regressions:
+            print(f"Regression: {resolution} {stage} {base:.1f} us -> {current:.1f} us ({ratio:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than baseline by more than {args.tolerance:.0%}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
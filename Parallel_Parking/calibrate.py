@@ -0,0 +1,247 @@
+# calibrate.py
+
+import argparse
+import copy
+import glob
+import os
+import time
+import cv2
+import control_vals as cv
+from calibration import SCHEMA, save_calibration
+from debug_stream import render_frame
+from run_recorder import RunReader, decode_frame, STREAM_FRAME
+
+WINDOW = "Calibration"
+MODES = ["bars", "lines", "centerline", "crop", "hsv"]
+HSV_KEYS = ["LOW_H", "HIGH_H", "LOW_S", "HIGH_S", "LOW_V", "HIGH_V"]
+HELP = "m: next mode  c: next color  space: freeze  n: next image  s: save all  r: revert  q: quit"
+
+
+class CameraSource:
+    """Frames from the OAK-D Lite, opened once for the whole session."""
+    def __init__(self, fps=None):
+        import depthai as dai
+        from camera import create_camera_pipeline
+        self._device = dai.Device(create_camera_pipeline(fps or cv.CAMERA_FPS))
+        self._queue = self._device.getOutputQueue(name="rgb", maxSize=4, blocking=False)
+
+    def get(self):
+        return self._queue.get().getCvFrame()
+
+    def close(self):
+        self._device.close()
+
+
+class RunFileSource:
+    """Frames of a recorded run (run_recorder.py), played at the recorded pace and looped."""
+    def __init__(self, path):
+        self._reader = RunReader(path)
+        self._records = None
+        self._started = None
+        self._first = None
+
+    def get(self):
+        record = next(self._records, None) if self._records is not None else None
+        if record is None:
+            # Start (again) from the beginning
+            self._records = self._reader.records(start=self._reader.start_time, streams={STREAM_FRAME})
+            record = next(self._records, None)
+            if record is None:
+                raise ValueError(f"{self._reader.path} has no frames.")
+            self._started, self._first = time.monotonic(), record.timestamp
+        delay = (record.timestamp - self._first) - (time.monotonic() - self._started)
+        if delay > 0:
+            time.sleep(delay)
+        return decode_frame(record.data[2])
+
+    def close(self):
+        self._reader.close()
+
+
+class ImageSource:
+    """Still images; step() moves to the next one."""
+    def __init__(self, paths):
+        self._paths = paths
+        self._index = 0
+        self._frame = None
+
+    def get(self):
+        if self._frame is None:
+            self._frame = cv2.imread(self._paths[self._index])
+            if self._frame is None:
+                raise ValueError(f"Cannot read image {self._paths[self._index]}.")
+        return self._frame
+
+    def step(self):
+        self._index = (self._index + 1) % len(self._paths)
+        self._frame = None
+        print(f"Image {self._paths[self._index]}")
+
+    def close(self):
+        pass
+
+
+def mode_overlays(mode, values, width, height):
+    """
+    Overlay primitives (see debug_stream.render_overlays) showing the values
+    edited in mode, in frame coordinates.
+    """
+    if mode == "bars":
+        bars = values["BAR_POSITIONS"]
+        h1 = int(height * (1 - bars["horizontal1"] / 100))
+        h2 = int(height * (1 - bars["horizontal2"] / 100))
+        overlays = [("line", (0, h1), (width, h1), (0, 255, 0), 2),
+                    ("line", (0, h2), (width, h2), (0, 255, 255), 2)]
+        colors = [(255, 0, 0), (255, 0, 255), (255, 255, 0), (255, 255, 255)]
+        for i, color in enumerate(colors, start=1):
+            x = int(width * bars[f"vertical{i}"] / 100)
+            overlays.append(("line", (x, 0), (x, height), color, 2))
+        return overlays
+    if mode == "lines":
+        lines = values["LINES"]
+        x1 = int(width * lines["line1_x_percent"] / 100)
+        x2 = int(width * lines["line2_x_percent"] / 100)
+        y = int(height * (1 - lines["horizontal_y_percent"] / 100))
+        return [("line", (x1, 0), (x1, height), (0, 255, 0), 2),
+                ("line", (x2, 0), (x2, height), (0, 255, 0), 2),
+                ("line", (0, y), (width, y), (255, 0, 0), 2)]
+    if mode == "centerline":
+        x = int(width * values["VERTICAL_CENTERLINE"] / 100)
+        return [("line", (x, 0), (x, height), (0, 255, 0), 2)]
+    if mode == "crop":
+        high, low = sorted([values["HIGH_CROP"], values["LOW_CROP"]])
+        return [("rect", (0, int(height * high / 100)), (width, int(height * low / 100)), (0, 255, 0), 2)]
+    return []
+
+
+class CalibrationConsole:
+    """
+    One OpenCV window with a downscaled preview and the trackbars of the
+    current mode. All edits go to a working copy of the calibration, which
+    is saved in one go with save_calibration().
+    """
+    def __init__(self, source, scale=None):
+        self.source = source
+        self.scale = scale if scale is not None else cv.CALIBRATION_PREVIEW_SCALE
+        self.values = {name: copy.deepcopy(getattr(cv, name)) for name in SCHEMA}
+        self.saved = copy.deepcopy(self.values)
+        self.mode = MODES[0]
+        self.colors = list(self.values["HSV_VALUES"])
+        self.color = self.colors[0]
+        self.frozen = False
+
+    def _trackbars(self):
+        """(label, getter, setter, maximum) of each trackbar of the current mode."""
+        def entry(container, key, maximum, label=None):
+            return (label or key, lambda: container()[key],
+                    lambda value: container().__setitem__(key, value), maximum)
+
+        if self.mode == "bars":
+            return [entry(lambda: self.values["BAR_POSITIONS"], key, 100) for key in SCHEMA["BAR_POSITIONS"]]
+        if self.mode == "lines":
+            return [entry(lambda: self.values["LINES"], key, 100) for key in SCHEMA["LINES"]]
+        if self.mode == "centerline":
+            return [entry(lambda: self.values, "VERTICAL_CENTERLINE", 100, "Centerline")]
+        if self.mode == "crop":
+            return [entry(lambda: self.values, "HIGH_CROP", 100, "High Crop"),
+                    entry(lambda: self.values, "LOW_CROP", 100, "Low Crop")]
+        return [entry(lambda: self.values["HSV_VALUES"][self.color], key, 179 if key.endswith("_H") else 255)
+                for key in HSV_KEYS]
+
+    def _build_window(self):
+        # Trackbars cannot be removed individually, so recreate the window for each mode
+        cv2.destroyAllWindows()
+        cv2.namedWindow(WINDOW, cv2.WINDOW_AUTOSIZE)
+        for label, get, set_value, maximum in self._trackbars():
+            cv2.createTrackbar(label, WINDOW, get(), maximum, set_value)
+        title = f"{self.mode} ({self.color})" if self.mode == "hsv" else self.mode
+        print(f"Mode: {title}")
+
+    def render(self, frame):
+        height, width = frame.shape[:2]
+        overlays = mode_overlays(self.mode, self.values, width, height)
+        status = f"{self.mode}{' ' + self.color if self.mode == 'hsv' else ''}"
+        if self.values != self.saved:
+            status += "  (unsaved)"
+        image = render_frame(frame, overlays, self.color if self.mode == "hsv" else None, self.scale,
+                             hsv_values=self.values["HSV_VALUES"])
+        cv2.putText(image, status, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        return image
+
+    def save(self):
+        try:
+            save_calibration(self.values)
+        except ValueError as e:
+            print(f"Not saved: {e}")
+            return False
+        self.saved = copy.deepcopy(self.values)
+        print(f"Calibration saved to {cv.CALIBRATION_FILE}")
+        return True
+
+    def run(self):
+        print(HELP)
+        self._build_window()
+        frame = None
+        while True:
+            if frame is None or not self.frozen:
+                frame = self.source.get()
+            cv2.imshow(WINDOW, self.render(frame))
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord("q"):
+                if self.values != self.saved:
+                    print("Quit without saving the changes.")
+                break
+            elif key == ord("m"):
+                self.mode = MODES[(MODES.index(self.mode) + 1) % len(MODES)]
+                self._build_window()
+            elif key == ord("c") and self.mode == "hsv":
+                self.color = self.colors[(self.colors.index(self.color) + 1) % len(self.colors)]
+                self._build_window()
+            elif key == ord(" "):
+                self.frozen = not self.frozen
+            elif key == ord("n") and hasattr(self.source, "step"):
+                self.source.step()
+                frame = None
+            elif key == ord("s"):
+                self.save()
+            elif key == ord("r"):
+                self.values = copy.deepcopy(self.saved)
+                self._build_window()
+        cv2.destroyAllWindows()
+
+
+def open_source(args):
+    if args.run:
+        return RunFileSource(args.run)
+    if args.images:
+        paths = []
+        for pattern in args.images:
+            paths.extend(sorted(glob.glob(os.path.join(pattern, "*"))) if os.path.isdir(pattern) else [pattern])
+        if not paths:
+            raise SystemExit("No images found.")
+        return ImageSource(paths)
+    return CameraSource()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate spot bars, endpoint lines, centerline, crop and HSV ranges in one session.")
+    parser.add_argument("--run", default=None, help="Use the frames of a recorded run instead of the camera.")
+    parser.add_argument("--images", nargs="+", default=None,
+                        help="Use image files (or directories of images) instead of the camera.")
+    parser.add_argument("--scale", type=float, default=None,
+                        help="Preview scale, defaults to CALIBRATION_PREVIEW_SCALE.")
+    args = parser.parse_args()
+
+    source = open_source(args)
+    try:
+        CalibrationConsole(source, args.scale).run()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
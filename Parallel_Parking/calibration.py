@@ -0,0 +1,306 @@
+# calibration.py
+
+import copy
+import json
+import logging
+import os
+import signal
+import tempfile
+import threading
+import numpy as np
+
+logger = logging.getLogger('LineFollowing')
+
+# Calibrated values kept in the calibration file, with the allowed integer range of each entry
+_PERCENT = (0, 100)
+_HSV_RANGES = {"LOW_H": (0, 179), "HIGH_H": (0, 179), "LOW_S": (0, 255), "HIGH_S": (0, 255),
+               "LOW_V": (0, 255), "HIGH_V": (0, 255)}
+SCHEMA = {
+    "BAR_POSITIONS": {key: _PERCENT for key in
+                      ["horizontal1", "horizontal2", "vertical1", "vertical2", "vertical3", "vertical4"]},
+    "LOW_CROP": _PERCENT,
+    "HIGH_CROP": _PERCENT,
+    "LINES": {"line1_x_percent": _PERCENT, "line2_x_percent": _PERCENT, "horizontal_y_percent": _PERCENT},
+    "VERTICAL_CENTERLINE": (1, 100),  # Divides the steering offset, so never 0
+    "HSV_VALUES": "colors",  # Color name to _HSV_RANGES
+}
+
+# control_vals.py values before the calibration file was applied; entries missing from the file fall back to these
+_defaults = None
+_current = None
+
+
+def _check_int(name, value, limits, errors):
+    if isinstance(value, bool) or not isinstance(value, int):
+        errors.append(f"{name} must be an integer, got {value!r}")
+    elif not limits[0] <= value <= limits[1]:
+        errors.append(f"{name} must be in {limits[0]}..{limits[1]}, got {value}")
+
+
+def _check_dict(name, value, ranges, errors):
+    if not isinstance(value, dict):
+        errors.append(f"{name} must be an object")
+        return
+    for key in value.keys() - ranges.keys():
+        errors.append(f"{name} has unknown entry '{key}'")
+    for key, limits in ranges.items():
+        if key not in value:
+            errors.append(f"{name} is missing '{key}'")
+        else:
+            _check_int(f"{name}.{key}", value[key], limits, errors)
+
+
+def validate(values, partial=False):
+    """
+    Check calibration values against SCHEMA and for consistent ordering
+    (e.g. LOW_H <= HIGH_H, line1 left of line2).
+
+    Args:
+        values (dict): Calibration entries.
+        partial (bool): Allow entries to be missing, as in a calibration file.
+
+    Raises:
+        ValueError: Listing every problem found.
+    """
+    errors = []
+    if not isinstance(values, dict):
+        raise ValueError("Calibration must be a JSON object.")
+    for name in values.keys() - SCHEMA.keys():
+        errors.append(f"Unknown entry '{name}'")
+    for name, spec in SCHEMA.items():
+        if name not in values:
+            if not partial:
+                errors.append(f"Missing entry '{name}'")
+            continue
+        value = values[name]
+        if spec == "colors":
+            if not isinstance(value, dict) or not value:
+                errors.append(f"{name} must be an object of colors")
+                continue
+            for color, hsv in value.items():
+                found = len(errors)
+                _check_dict(f"{name}.{color}", hsv, _HSV_RANGES, errors)
+                if len(errors) == found:
+                    for channel in "HSV":
+                        if hsv[f"LOW_{channel}"] > hsv[f"HIGH_{channel}"]:
+                            errors.append(f"{name}.{color}: LOW_{channel} is above HIGH_{channel}")
+        elif isinstance(spec, dict):
+            _check_dict(name, value, spec, errors)
+        else:
+            _check_int(name, value, spec, errors)
+
+    if not errors:
+        lines = values.get("LINES")
+        if lines and lines["line1_x_percent"] >= lines["line2_x_percent"]:
+            errors.append("LINES: line1_x_percent must be left of line2_x_percent")
+        bars = values.get("BAR_POSITIONS")
+        if bars:
+            if bars["horizontal1"] > bars["horizontal2"]:
+                errors.append("BAR_POSITIONS: horizontal1 must be below horizontal2")
+            verticals = [bars[f"vertical{i}"] for i in range(1, 5)]
+            if verticals != sorted(verticals):
+                errors.append("BAR_POSITIONS: vertical1..vertical4 must be in order from left to right")
+    if errors:
+        raise ValueError("Invalid calibration: " + "; ".join(errors))
+
+
+def read_calibration_file(path):
+    """
+    Load and validate a calibration file.
+
+    Returns:
+        dict: The entries in the file, or an empty dict if it does not exist.
+
+    Raises:
+        ValueError: If the file is not valid JSON or fails validation.
+    """
+    try:
+        with open(path) as f:
+            values = json.load(f)
+    except FileNotFoundError:
+        return {}
+    validate(values, partial=True)
+    return values
+
+
+def save_calibration(updates, path=None):
+    """
+    Merge updates into the calibration file and write it atomically, so a
+    running car watching the file never reads a partial write.
+
+    Args:
+        updates (dict): Entries to replace, e.g. {"VERTICAL_CENTERLINE": 50}.
+        path (str): Calibration file, defaults to CALIBRATION_FILE.
+    """
+    import control_vals as cv
+    path = path or cv.CALIBRATION_FILE
+    values = read_calibration_file(path)
+    values.update(copy.deepcopy(updates))
+    validate(dict(_defaults, **values))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".calibration_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(values, f, indent=4)
+            f.write("\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    # Keep this process consistent with the file
+    reload(path)
+
+
+def apply_calibration_file(namespace, path):
+    """
+    Override the defaults in namespace (the control_vals globals) with the
+    entries of the calibration file. Called once by control_vals.py.
+    """
+    global _defaults
+    _defaults = {name: copy.deepcopy(namespace[name]) for name in SCHEMA}
+    values = read_calibration_file(path)
+    validate(dict(_defaults, **values))
+    namespace.update(values)
+
+
+class FrameGeometry:
+    """Pixel bounds of the spot detection grid for one frame size, rows top to bottom, columns left to right."""
+    def __init__(self, calibration, width, height):
+        bars = calibration.bar_positions
+        y_h1 = height - int(height * bars["horizontal1"] / 100)
+        y_h2 = height - int(height * bars["horizontal2"] / 100)
+        self.rows = {1: (0, y_h2), 2: (y_h2, y_h1), 3: (y_h1, height)}
+        xs = [0] + [int(width * bars[f"vertical{i}"] / 100) for i in range(1, 5)] + [width]
+        self.columns = {col: (xs[col - 1], xs[col]) for col in range(1, 6)}
+
+    def cell(self, frame, row, col):
+        """The frame region of a grid cell, or None for an invalid row or column."""
+        if row not in self.rows or col not in self.columns:
+            return None
+        y1, y2 = self.rows[row]
+        x1, x2 = self.columns[col]
+        return frame[y1:y2, x1:x2]
+
+
+class Calibration:
+    """
+    Read-only snapshot of the calibrated values with the values derived from
+    them (HSV bound arrays, pixel geometry per frame size) computed once.
+    A reload builds a new snapshot and swaps it in; the loop takes
+    current() once per iteration, so every frame sees one consistent set.
+    Values are shared with cv; treat them as read-only.
+    """
+    def __init__(self, values):
+        self.values = copy.deepcopy(values)
+        self.bar_positions = self.values["BAR_POSITIONS"]
+        self.lines = self.values["LINES"]
+        self.vertical_centerline = self.values["VERTICAL_CENTERLINE"]
+        self.low_crop = self.values["LOW_CROP"]
+        self.high_crop = self.values["HIGH_CROP"]
+        self.hsv_values = self.values["HSV_VALUES"]
+        self.hsv_bounds = {
+            color: (np.array([hsv["LOW_H"], hsv["LOW_S"], hsv["LOW_V"]], dtype=np.uint8),
+                    np.array([hsv["HIGH_H"], hsv["HIGH_S"], hsv["HIGH_V"]], dtype=np.uint8))
+            for color, hsv in self.hsv_values.items()
+        }
+        self._geometry = {}
+
+    def geometry(self, width, height):
+        geometry = self._geometry.get((width, height))
+        if geometry is None:
+            geometry = self._geometry[(width, height)] = FrameGeometry(self, width, height)
+        return geometry
+
+
+def _swap(calibration):
+    global _current
+    _current = calibration
+
+
+def current():
+    """The calibration in effect."""
+    if _current is None:
+        import control_vals as cv
+        _swap(Calibration({name: getattr(cv, name) for name in SCHEMA}))
+    return _current
+
+
+def reload(path=None):
+    """
+    Re-read the calibration file and swap in the new values. On an invalid
+    file the values in effect are kept and ValueError is raised.
+
+    Returns:
+        Calibration: The new snapshot.
+    """
+    import control_vals as cv
+    path = path or cv.CALIBRATION_FILE
+    values = dict(copy.deepcopy(_defaults or {name: getattr(cv, name) for name in SCHEMA}),
+                  **read_calibration_file(path))
+    validate(values)
+    calibration = Calibration(values)
+    # Build everything before publishing; each assignment replaces a reference
+    for name, value in calibration.values.items():
+        setattr(cv, name, copy.deepcopy(value))
+    _swap(calibration)
+    return calibration
+
+
+class CalibrationWatcher:
+    """
+    Reloads the calibration when the file changes (checked every interval
+    seconds) or on kill -HUP <pid>. Reloading runs on this watcher's thread,
+    never in the control loop.
+    """
+    def __init__(self, path=None, interval=None, logger=logger):
+        import control_vals as cv
+        self.path = path or cv.CALIBRATION_FILE
+        self.interval = interval if interval is not None else cv.CALIBRATION_WATCH_INTERVAL
+        self.logger = logger
+        self.reloads = 0
+        self._wake = threading.Event()
+        self._stopped = False
+        self._mtime = self._stat()
+        self._thread = threading.Thread(target=self._run, name="CalibrationWatcher", daemon=True)
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def start(self, handle_sighup=True):
+        if handle_sighup and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._wake.set())
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped:
+            requested = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped:
+                return
+            mtime = self._stat()
+            if requested or mtime != self._mtime:
+                self._mtime = mtime
+                self.reload()
+
+    def reload(self):
+        try:
+            reload(self.path)
+        except (ValueError, OSError) as e:
+            self.logger.error(f"Calibration not reloaded, keeping the current values: {e}")
+            print(f"Calibration not reloaded: {e}")
+            return False
+        self.reloads += 1
+        self.logger.info(f"Calibration reloaded from {self.path}.")
+        print("Calibration reloaded.")
+        return True
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
@@ -0,0 +1,26 @@
+# camera.py
+
+import depthai as dai
+import control_vals as cv
+
+
+def create_camera_pipeline(fps=cv.CAMERA_FPS):
+    """
+    Create the OAK-D Lite pipeline streaming BGR preview frames on the "rgb" queue.
+
+    Args:
+        fps (int): Camera frame rate.
+
+    Returns:
+        dai.Pipeline: Pipeline ready to pass to dai.Device.
+    """
+    pipeline = dai.Pipeline()
+    cam_rgb = pipeline.createColorCamera()
+    cam_rgb.setPreviewSize(cv.CAMERA_RESOLUTION_WIDTH, cv.CAMERA_RESOLUTION_HEIGHT)
+    cam_rgb.setInterleaved(False)
+    cam_rgb.setFps(fps)
+
+    xout_rgb = pipeline.createXLinkOut()
+    xout_rgb.setStreamName("rgb")
+    cam_rgb.preview.link(xout_rgb.input)
+    return pipeline
@@ -1,7 +1,9 @@
 import time
+import argparse
 import inputs
 from pyvesc import VESC
 import control_vals as cv  # Import values from control_vals.py
+from command_recorder import CommandRecorder, STREAM_SOCKET_PATH
 
 
 def normalize(value, min_raw, max_raw, min_norm, max_norm):
@@ -35,16 +37,32 @@ def connect_to_vesc(serial_port, baudrate, max_retries=5, retry_interval=2):
                 exit(1)
 
 
-def log_values(servo_position, motor_rpm):
-    """Log steering and RPM values to a shared file."""
-    try:
-        with open("vesc_values.txt", "w") as file:
-            file.write(f"{servo_position},{motor_rpm}")
-    except Exception as e:
-        print(f"Failed to log values: {e}")
+def parse_arguments():
+    """
+    Parse command-line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Drive the car with the gamepad and record every command sent.")
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        help="CSV file to record commands to directly, e.g. recordings/U_Turn.csv."
+    )
+    parser.add_argument(
+        "--stream",
+        type=str,
+        default=STREAM_SOCKET_PATH,
+        help=f"Unix socket streamed to for motions/vesc_record.py. Default is '{STREAM_SOCKET_PATH}'."
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_arguments()
+
     # Replace with the correct serial port and baud rate for your setup.
     serial_port = "/dev/ttyACM0"
     baudrate = 115200
@@ -59,6 +77,11 @@ def main():
     print(f"Steering range: {cv.STEERING_LEFT_MAX} (left) to {cv.STEERING_RIGHT_MAX} (right), neutral at {cv.STEERING_NEUTRAL}.")
     print("Both RT and LT -> No throttle (0 RPM).")
 
+    # Every command sent is recorded once, off the control loop
+    recorder = CommandRecorder(output_file=args.record, stream_path=args.stream)
+    if args.record:
+        print(f"Recording commands to {args.record}")
+
     try:
         rt_pressed = 0.0  # Value for RT trigger
         lt_pressed = 0.0  # Value for LT trigger
@@ -115,14 +138,18 @@ def main():
             vesc.set_rpm(int(motor_rpm))  # Send RPM command to VESC
             print(f"Sent RPM command: {motor_rpm}")
 
-            # Log the current values to the shared file
-            log_values(servo_position, motor_rpm)
+            # Record the values just sent
+            recorder.record(servo_position, int(motor_rpm))
 
     except KeyboardInterrupt:
         print("\nShutting down.")
         vesc.set_rpm(0)  # Stop the motor
         vesc.set_servo(cv.STEERING_NEUTRAL)  # Reset steering to neutral
+        recorder.record(cv.STEERING_NEUTRAL, 0)
     finally:
+        recorder.close()
+        if recorder.dropped:
+            print(f"Warning: {recorder.dropped} commands were dropped from the recording.")
         if hasattr(vesc, 'serial') and vesc.serial:
             vesc.serial.close()
 
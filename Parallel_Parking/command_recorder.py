@@ -0,0 +1,172 @@
+# command_recorder.py
+
+import csv
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+# Local socket that teleop scripts stream every command to (see motions/vesc_record.py)
+STREAM_SOCKET_PATH = "/tmp/vesc_commands.sock"
+
+# Datagram layout: sequence number, monotonic timestamp, servo, rpm
+SAMPLE_FORMAT = struct.Struct("<Qddd")
+
+
+class CommandRecorder:
+    """
+    Records every (monotonic timestamp, servo, rpm) command sent by a teleop
+    loop, exactly once.
+
+    record() only copies three floats into a preallocated block; full blocks
+    are written to CSV by a background thread, so the control loop never
+    touches the disk. Optionally each sample is also sent as a datagram to a
+    local Unix socket so a separate recorder process can capture it.
+    """
+    def __init__(self, output_file=None, stream_path=None, block_size=1024, num_blocks=8, flush_interval=0.5):
+        """
+        Args:
+            output_file (str): CSV file to write (same format as recordings/*.csv), or None.
+            stream_path (str): Unix datagram socket to stream samples to, or None.
+            block_size (int): Samples per preallocated block.
+            num_blocks (int): Number of blocks; samples are dropped (and counted) only
+                if all of them are waiting to be written.
+            flush_interval (float): Seconds between flushes of a partially filled block.
+        """
+        self.output_file = output_file
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.streamed = 0
+        self.stream_dropped = 0
+
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._free_blocks = queue.Queue()
+        self._full_blocks = queue.Queue()
+        for _ in range(num_blocks - 1):
+            self._free_blocks.put(np.empty((block_size, 3), dtype=np.float64))
+        self._block = np.empty((block_size, 3), dtype=np.float64)
+        self._count = 0
+
+        self._socket = None
+        self._stream_path = stream_path
+        if stream_path:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        if output_file:
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+            self._file = open(output_file, mode="w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["Timestamp", "Steering", "RPM"])  # CSV header
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self._thread.start()
+
+    def record(self, servo, rpm, timestamp=None):
+        """Record one command that was just sent to the VESC."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+            if self.output_file:
+                if self._block is None:
+                    self._next_block()
+                if self._block is None:
+                    self.dropped += 1
+                else:
+                    self._block[self._count] = (timestamp, servo, rpm)
+                    self._count += 1
+                    self.recorded += 1
+                    if self._count == len(self._block):
+                        self._full_blocks.put((self._block, self._count))
+                        self._block = None
+                        self._count = 0
+
+        if self._socket is not None:
+            self._send(seq, timestamp, servo, rpm)
+
+    def _next_block(self):
+        try:
+            self._block = self._free_blocks.get_nowait()
+        except queue.Empty:
+            self._block = None
+
+    def _send(self, seq, timestamp, servo, rpm):
+        try:
+            self._socket.sendto(SAMPLE_FORMAT.pack(seq, timestamp, servo, rpm), self._stream_path)
+            self.streamed += 1
+        except (BlockingIOError, FileNotFoundError, ConnectionRefusedError):
+            # Receiver busy or not running; the sequence gap tells it what it missed
+            self.stream_dropped += 1
+
+    def _flush_loop(self):
+        """Background thread writing filled blocks, and partial blocks every flush_interval."""
+        while True:
+            try:
+                block, count = self._full_blocks.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    if self._count == 0:
+                        block = None
+                    else:
+                        block, count = self._block, self._count
+                        self._next_block()
+                        self._count = 0
+                if block is None:
+                    if self._stop_event.is_set() and self._full_blocks.empty():
+                        break
+                    continue
+
+            self._writer.writerows(block[:count].tolist())
+            self._file.flush()
+            self._free_blocks.put(block)
+
+    def close(self):
+        """Write everything recorded so far and release the file and socket."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self._file.close()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def receive_samples(stream_path=STREAM_SOCKET_PATH, stop_event=None, timeout=0.5):
+    """
+    Bind the command stream socket and yield samples as they arrive.
+
+    Yields:
+        tuple: (timestamp, servo, rpm, missed) where missed is the number of
+        samples the sender could not deliver since the previous one.
+    """
+    if os.path.exists(stream_path):
+        os.remove(stream_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(stream_path)
+    sock.settimeout(timeout)
+    expected_seq = None
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                data = sock.recv(SAMPLE_FORMAT.size)
+            except socket.timeout:
+                continue
+            seq, timestamp, servo, rpm = SAMPLE_FORMAT.unpack(data)
+            # A lower sequence number means the sender restarted
+            missed = seq - expected_seq if expected_seq is not None and seq >= expected_seq else 0
+            expected_seq = seq + 1
+            yield timestamp, servo, rpm, missed
+    finally:
+        sock.close()
+        if os.path.exists(stream_path):
+            os.remove(stream_path)
@@ -1,9 +1,32 @@
+import os
+
 # Motor RPM values
 FORWARD_RPM_MIN = 1800
 FORWARD_RPM_MAX = 6000
 REVERSE_RPM_MIN = -1600
 REVERSE_RPM_MAX = -2500
 
+# Directory holding the recorded maneuvers (U_Turn.csv, Left_Parking.csv, ...)
+RECORDINGS_DIR = "/home/jetson/projects/final_project/recordings"
+
+# Recorded maneuver playback speed (1.0 = as recorded)
+# Time is compressed and RPM scaled by the same factor, capped so RPM stays
+# within FORWARD_RPM_MAX/REVERSE_RPM_MAX. Check endpoint error with motions/simulate.py
+U_TURN_SPEED_FACTOR = 1.0
+PARKING_SPEED_FACTOR = 1.0
+
+# Recorded maneuver playback indexing
+# "time" replays commands on the recorded timestamps, "distance" advances
+# through the recording using the VESC tachometer
+MOTION_PLAYBACK_MODE = "time"
+TACHO_COUNTS_PER_EREV = 6  # VESC tachometer steps per electrical revolution
+
+# Recorded maneuver resampling (motions/trajectory.py)
+# None plays the raw ~50 ms samples; otherwise recordings are resampled to this rate
+MOTION_RESAMPLE_HZ = None
+MOTION_INTERPOLATION = "linear"  # "hold", "linear", "cubic" or "slew"
+MOTION_SMOOTHING = 0.0  # Moving average width in seconds, 0 to disable
+
 # for spot detection
 BAR_POSITIONS = {
     'horizontal1': 30,  # Default position for the first horizontal bar
@@ -69,11 +92,132 @@ HSV_VALUES = {
 CAMERA_RESOLUTION_WIDTH = 1280
 CAMERA_RESOLUTION_HEIGHT = 720
 CAMERA_FPS = 12
+CAMERA_WARMUP_FRAMES = 12  # Frames read while waiting for the start button (auto exposure settles)
 
 # Safety timeout
 SAFETY_TIMEOUT = 1.5
 
-# Color Mask
-# Set to False to disable the Color Mask window
-# False will improve performance
-DISPLAY_COLOR_MASK = False
+# Run recording (run_recorder.py)
+# Records camera frames, VESC commands, gamepad events and state transitions
+# of each run; inspect with python3 run_recorder.py <file>
+RUN_RECORDING = False
+RUN_RECORDING_DIR = "runs"
+RUN_RECORDING_JPEG_QUALITY = 80
+RUN_RECORDING_FRAME_INTERVAL = 1  # Record every Nth frame
+
+# Latency probe (latency_probe.py)
+# Logs frame capture to VESC command latency (p50/p95/p99) and loop rate at the end of a run
+LATENCY_PROBE = False
+
+# Per-stage timing of the line-following loop (stage_profiler.py)
+# Logs mean/p95/max of frame wait, crop, yellow filter, endpoint, centroid,
+# spot detection, VESC write, logging and sleep every PROFILE_SUMMARY_INTERVAL seconds
+PROFILE_STAGES = False
+PROFILE_SUMMARY_INTERVAL = 10.0
+
+# Span tracing (tracing.py)
+# Records loop stages, gamepad polling and maneuvers into a ring buffer and writes
+# Chrome Trace Event JSON to TRACE_DIR at exit or on kill -USR1 <pid>; open in ui.perfetto.dev
+TRACE_ENABLED = False
+TRACE_CAPACITY = 65536  # Spans kept, ~40 bytes each
+TRACE_DIR = "traces"
+
+# On-track profiling (profile_capture.py)
+# Press this gamepad button to start a cProfile capture of the line-following
+# loop and again to stop it; the profile is saved to PROFILE_CAPTURE_DIR and
+# the top functions by cumulative time are logged
+PROFILE_CAPTURE_BUTTON = "BTN_SELECT"  # Back/Select button, otherwise unused
+PROFILE_CAPTURE_DIR = "profiles"
+PROFILE_CAPTURE_TOP_N = 25
+
+# Per-frame binary telemetry (telemetry.py)
+# Records cx, offset, steering, rpm, lost frames, state and stage timings (with
+# PROFILE_STAGES) every frame; summarize with python3 telemetry.py <file>
+TELEMETRY = False
+TELEMETRY_DIR = "runs"
+
+# Live telemetry (live_telemetry.py)
+# Publishes the latest loop state to shared memory; watch it from another
+# terminal with python3 live_telemetry.py (or --http 8080 for a web page)
+LIVE_TELEMETRY = False
+LIVE_TELEMETRY_NAME = "parallel_park_live"
+
+# Logging (logger_config.py)
+# Queue log records and write them on one background thread instead of the control loop.
+# At most LOG_QUEUE_SIZE records wait to be written; further ones are dropped and counted
+LOG_QUEUE = True
+LOG_QUEUE_SIZE = 10000
+# Seconds shutdown waits for the writer to make room in a full queue before writing the rest itself
+LOG_SHUTDOWN_TIMEOUT = 1.0
+# Messages repeated every frame (e.g. "Line lost") are logged and printed at most
+# once per interval per message, with a count of the repeats in between
+LOG_THROTTLE_INTERVAL = 2.0
+
+# Debug stream (debug_stream.py)
+# Serves the camera view with the endpoint lines, line position and the mask of the
+# searched color as MJPEG at http://<car>:DEBUG_STREAM_PORT/. Rendering runs on a
+# background thread and only while a browser is connected
+DEBUG_STREAM = False
+DEBUG_STREAM_HOST = "0.0.0.0"
+DEBUG_STREAM_PORT = 8090
+DEBUG_STREAM_FPS = 10
+DEBUG_STREAM_SCALE = 0.5
+DEBUG_STREAM_QUALITY = 70
+
+# Quality of service (qos.py)
+# Lowers processing quality when the loop falls behind the camera and restores it
+# when there is headroom again. A level steps down after QOS_DOWN_FRAMES consecutive
+# frames with work time over QOS_LOOP_TARGET_MS or frame age over QOS_FRAME_AGE_TARGET_MS,
+# and up after QOS_UP_FRAMES consecutive frames below QOS_UP_MARGIN times both targets
+QOS = True
+QOS_LOOP_TARGET_MS = 1000 / CAMERA_FPS
+QOS_FRAME_AGE_TARGET_MS = 150
+QOS_DOWN_FRAMES = 3
+QOS_UP_FRAMES = 3 * CAMERA_FPS  # About 3 s
+QOS_UP_MARGIN = 0.6
+# Level 0 is full quality. roi: fraction of the cropped rows processed (bottom part),
+# decimation: every Nth row and column, morphology: close the yellow mask,
+# spot_interval: spot detection runs every Nth frame
+QOS_LEVELS = [
+    {"roi": 1.0, "decimation": 1, "morphology": True, "spot_interval": 1},
+    {"roi": 1.0, "decimation": 1, "morphology": True, "spot_interval": 2},
+    {"roi": 1.0, "decimation": 2, "morphology": False, "spot_interval": 2},
+    {"roi": 0.75, "decimation": 2, "morphology": False, "spot_interval": 3},
+    {"roi": 0.5, "decimation": 4, "morphology": False, "spot_interval": 4},
+]
+
+# Vision backends (vision_backends.py)
+# Implementation of thresholding, centroid, endpoint and color box checks: a backend
+# name ("opencv", "numpy", "lut", "components", "tiled") or "auto" to benchmark them on synthetic
+# frames at startup and use the fastest one per stage whose results match "opencv".
+# Results are cached in VISION_BACKEND_CACHE per machine and resolution
+VISION_BACKEND = "auto"
+VISION_BACKEND_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vision_backends.json")
+VISION_BACKEND_PLUGINS = []  # Modules that register extra backends with register_backend()
+VISION_AUTOTUNE_REPEAT = 5  # Timed passes over the frames per backend and stage
+VISION_PARITY_CX_TOLERANCE = 2  # Pixels a backend's line position may differ from the reference
+# "tiled" backend (tiled_threshold.py): yellow thresholding split into horizontal bands
+# on a thread pool, one band per thread; 0 threads means one per CPU core
+VISION_TILE_THREADS = 0
+VISION_TILE_MIN_ROWS = 32  # Bands are never smaller, so small crops use fewer threads
+
+# Startup budgets (park.py)
+# python3 park.py startup --check fails when a subcommand takes longer than this
+# from interpreter start until it is ready to run (imports done), in milliseconds
+PARK_STARTUP_BUDGET_MS = {
+    "cli": 300,
+    "default": 3000,
+}
+
+# Calibration (calibration.py)
+# The adjust scripts save BAR_POSITIONS, LOW_CROP/HIGH_CROP, LINES,
+# VERTICAL_CENTERLINE and HSV_VALUES to CALIBRATION_FILE, which overrides the
+# defaults above. With CALIBRATION_WATCH the running car reloads the file when it
+# changes (checked every CALIBRATION_WATCH_INTERVAL seconds) or on kill -HUP <pid>
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration.json")
+CALIBRATION_WATCH = True
+CALIBRATION_WATCH_INTERVAL = 1.0
+CALIBRATION_PREVIEW_SCALE = 0.5  # Preview size in calibrate.py
+
+from calibration import apply_calibration_file
+apply_calibration_file(globals(), CALIBRATION_FILE)
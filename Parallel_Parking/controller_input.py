@@ -1,76 +1,113 @@
 # controller_input.py
 
-import inputs
 import threading
 import time
 import logging
 from logger_config import setup_logger
+import tracing
+from log_throttle import ThrottledLog
 import control_vals as cv  # Import control_vals for HSV values
 
 # Setup logger for controller_input
 logger = setup_logger('ControllerInput', 'controller_input.log')
 
 class Controller:
-    def __init__(self):
+    def __init__(self, start=True, clock=time.time):
+        """
+        Args:
+            start (bool): Start the gamepad polling thread. Without it, events
+                are fed through handle_event (e.g. when replaying a recorded run).
+            clock (callable): Time source used for debouncing.
+        """
         self.motion_paused = False
         self.color_to_search = None  # Initialize color_to_search
+        self.profile_requested = False  # Toggled by PROFILE_CAPTURE_BUTTON, see profile_capture.py
         self._lock = threading.Lock()
         self._color_lock = threading.Lock()  # Lock for color_to_search
         self._stop_event = threading.Event()
-        self._thread = threading.Thread(target=self._poll_controller, daemon=True)
-        self._thread.start()
+        self._listeners = []  # Callbacks receiving (code, state) of every button event
+        self._clock = clock
         self._last_press_time = 0
         self._debounce_delay = 0.3  # 300 ms debounce delay
-        logger.info("Controller polling thread initialized.")
+        self._thread = None
+        self._hot_log = ThrottledLog(logger)  # Errors repeated while the gamepad is missing
+        if start:
+            self._thread = threading.Thread(target=self._poll_controller, daemon=True)
+            self._thread.start()
+            logger.info("Controller polling thread initialized.")
 
     def _poll_controller(self):
         """
         Background thread that polls the gamepad and toggles the motion_paused state
         or sets the color_to_search based on button presses.
         """
+        # Imported here: importing inputs scans the input devices
+        import inputs
         logger.debug("Controller polling thread started.")
         while not self._stop_event.is_set():
             try:
-                events = inputs.get_gamepad()
+                with tracing.span("gamepad_wait"):
+                    events = inputs.get_gamepad()
                 for event in events:
                     if event.ev_type == "Key":
-                        current_time = time.time()
-                        # Handle Y button for pausing/resuming motion
-                        if event.code == "BTN_WEST":  # Y button mapped to BTN_WEST
-                            if event.state == 1:  # Button pressed
-                                if current_time - self._last_press_time > self._debounce_delay:
-                                    with self._lock:
-                                        self.motion_paused = not self.motion_paused
-                                        if self.motion_paused:
-                                            logger.info("Motion paused.")
-                                            print("Motion paused")
-                                        else:
-                                            logger.info("Motion resumed.")
-                                            print("Motion resumed")
-                                    self._last_press_time = current_time
-                        # Handle X, A, B buttons for color search
-                        elif event.code == "BTN_NORTH" and event.state == 1:  # X button
-                            with self._color_lock:
-                                self.color_to_search = 'blue'
-                                logger.info("Color search initiated for Blue.")
-                                print("Color search initiated for Blue.")
-                        elif event.code == "BTN_SOUTH" and event.state == 1:  # A button
-                            with self._color_lock:
-                                self.color_to_search = 'green'
-                                logger.info("Color search initiated for Green.")
-                                print("Color search initiated for Green.")
-                        elif event.code == "BTN_EAST" and event.state == 1:  # B button
-                            with self._color_lock:
-                                self.color_to_search = 'red'
-                                logger.info("Color search initiated for Red.")
-                                print("Color search initiated for Red.")
+                        with tracing.span("gamepad_event"):
+                            self.handle_event(event.code, event.state)
             except inputs.UnpluggedError:
-                logger.warning("Controller disconnected. Waiting for reconnection...")
+                self._hot_log.log("unplugged", logging.WARNING, "Controller disconnected. Waiting for reconnection...")
                 time.sleep(1)  # Wait before retrying
             except Exception as e:
-                logger.error(f"Error polling controller: {e}")
+                self._hot_log.log("poll_error", logging.ERROR, "Error polling controller: %s", e)
                 time.sleep(0.1)  # Brief pause before retrying
 
+    def handle_event(self, code, state):
+        """
+        Apply one gamepad button event: Y toggles motion_paused, X/A/B select
+        the color to search for, PROFILE_CAPTURE_BUTTON toggles a profile capture.
+        """
+        for listener in self._listeners:
+            listener(code, state)
+        current_time = self._clock()
+        # Handle Y button for pausing/resuming motion
+        if code == "BTN_WEST":  # Y button mapped to BTN_WEST
+            if state == 1:  # Button pressed
+                if current_time - self._last_press_time > self._debounce_delay:
+                    with self._lock:
+                        self.motion_paused = not self.motion_paused
+                        if self.motion_paused:
+                            logger.info("Motion paused.")
+                            print("Motion paused")
+                        else:
+                            logger.info("Motion resumed.")
+                            print("Motion resumed")
+                    self._last_press_time = current_time
+        # Handle X, A, B buttons for color search
+        elif code == "BTN_NORTH" and state == 1:  # X button
+            with self._color_lock:
+                self.color_to_search = 'blue'
+                logger.info("Color search initiated for Blue.")
+                print("Color search initiated for Blue.")
+        elif code == "BTN_SOUTH" and state == 1:  # A button
+            with self._color_lock:
+                self.color_to_search = 'green'
+                logger.info("Color search initiated for Green.")
+                print("Color search initiated for Green.")
+        elif code == "BTN_EAST" and state == 1:  # B button
+            with self._color_lock:
+                self.color_to_search = 'red'
+                logger.info("Color search initiated for Red.")
+                print("Color search initiated for Red.")
+        elif code == cv.PROFILE_CAPTURE_BUTTON and state == 1:
+            # Picked up by the line-following loop, which runs the profiler on its own thread
+            self.profile_requested = not self.profile_requested
+            logger.info(f"Profile capture {'requested' if self.profile_requested else 'stop requested'}.")
+
+    def add_listener(self, callback):
+        """
+        Register a callback that receives (code, state) for every button event,
+        e.g. RunRecorder.record_event. Called from the polling thread.
+        """
+        self._listeners.append(callback)
+
     def get_motion_paused(self):
         """
         Safely retrieve the current motion_paused state.
@@ -126,24 +163,43 @@ class Controller:
         """
         logger.info("Stopping controller polling thread...")
         self._stop_event.set()
-        self._thread.join()
+        if self._thread is not None:
+            self._thread.join()
         logger.info("Controller polling thread stopped.")
 
-# Create a singleton controller instance
-_controller_instance = Controller()
+# Singleton controller instance, created (and its polling thread started) on first use
+_controller_instance = None
+_controller_lock = threading.Lock()
+
+def get_controller():
+    global _controller_instance
+    with _controller_lock:
+        if _controller_instance is None:
+            _controller_instance = Controller()
+        return _controller_instance
+
+def stop_controller():
+    """Stop the controller polling thread if the controller was created; never creates it."""
+    with _controller_lock:
+        controller = _controller_instance
+    if controller is not None:
+        controller.stop()
 
 def wait_for_start_signal():
-    return _controller_instance.wait_for_start_signal()
+    return get_controller().wait_for_start_signal()
 
 def is_motion_paused():
-    return _controller_instance.get_motion_paused()
+    return get_controller().get_motion_paused()
 
 def get_color_to_search():
-    return _controller_instance.get_color_to_search()
+    return get_controller().get_color_to_search()
 
 def clear_color_to_search():
-    _controller_instance.clear_color_to_search()
+    get_controller().clear_color_to_search()
 
 def set_motion_paused(state: bool):
-    _controller_instance.set_motion_paused(state)
+    get_controller().set_motion_paused(state)
+
+def add_controller_listener(callback):
+    get_controller().add_listener(callback)
 
@@ -0,0 +1,222 @@
+# debug_stream.py
+
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+import control_vals as cv
+
+logger = logging.getLogger('LineFollowing')
+
+BOUNDARY = "frame"
+
+PAGE = """<!doctype html><html><head><title>Parallel Parking debug view</title></head>
+<body style="margin: 0; background: #222"><img src="/stream.mjpg" style="max-width: 100%"></body></html>"""
+
+
+def render_overlays(image, overlays, origin=(0, 0), scale=1.0):
+    """
+    Draw overlay primitives on image. Coordinates are in frame pixels
+    relative to origin and are multiplied by scale.
+
+    Primitives are tuples:
+        ("line", (x1, y1), (x2, y2), color, thickness)
+        ("rect", (x1, y1), (x2, y2), color, thickness)
+        ("circle", (x, y), radius, color, thickness)
+        ("text", (x, y), text, color)
+        ("offset", (dx, dy), overlays)   Nested primitives relative to (dx, dy)
+        ("scale", factor, overlays)      Nested primitives with coordinates multiplied by factor
+    """
+    ox, oy = origin
+
+    def point(p):
+        return int((p[0] + ox) * scale), int((p[1] + oy) * scale)
+
+    for overlay in overlays:
+        kind = overlay[0]
+        if kind == "line":
+            cv2.line(image, point(overlay[1]), point(overlay[2]), overlay[3], overlay[4])
+        elif kind == "rect":
+            cv2.rectangle(image, point(overlay[1]), point(overlay[2]), overlay[3], overlay[4])
+        elif kind == "circle":
+            cv2.circle(image, point(overlay[1]), max(1, int(overlay[2] * scale)), overlay[3], overlay[4])
+        elif kind == "text":
+            cv2.putText(image, overlay[2], point(overlay[1]), cv2.FONT_HERSHEY_SIMPLEX, 0.5, overlay[3], 1)
+        elif kind == "offset":
+            render_overlays(image, overlay[2], (ox + overlay[1][0], oy + overlay[1][1]), scale)
+        elif kind == "scale":
+            factor = overlay[1]
+            render_overlays(image, overlay[2], (ox / factor, oy / factor), scale * factor)
+
+
+def render_frame(frame, overlays, mask_color=None, scale=1.0, hsv_values=None):
+    """
+    Build the debug image: the downscaled frame, the pixels matching the HSV
+    range of mask_color highlighted in magenta, and the overlays on top.
+    HSV ranges are looked up in hsv_values, by default HSV_VALUES.
+
+    Returns:
+        numpy.ndarray: BGR image.
+    """
+    if scale != 1.0:
+        image = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        image = frame.copy()
+    color_hsv = (hsv_values or cv.HSV_VALUES).get(mask_color) if mask_color else None
+    if color_hsv:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        lower = np.array([color_hsv["LOW_H"], color_hsv["LOW_S"], color_hsv["LOW_V"]])
+        upper = np.array([color_hsv["HIGH_H"], color_hsv["HIGH_S"], color_hsv["HIGH_V"]])
+        mask = cv2.inRange(hsv, lower, upper) > 0
+        image[mask] = (image[mask] // 2) + np.array([127, 0, 127], dtype=np.uint8)
+    render_overlays(image, overlays, scale=scale)
+    return image
+
+
+class DebugStream:
+    """
+    Debug view of the line-following loop, served as MJPEG over HTTP.
+
+    The loop only hands over references: wants_frame() tells it whether a
+    viewer is connected and the next frame is due (at most fps per second),
+    and submit() stores the frame with a list of overlay primitives (see
+    render_overlays). Color masking, drawing, downscaling and JPEG encoding
+    run on a background thread; frames submitted while it is busy replace
+    the pending one. Nothing is rendered while no viewer is connected.
+    Open http://<car>:<port>/ in a browser to watch.
+    """
+    def __init__(self, port=None, fps=None, scale=None, quality=None, host=None, clock=time.monotonic):
+        """
+        Args:
+            port (int): HTTP port, defaults to DEBUG_STREAM_PORT.
+            fps (float): Maximum streamed frame rate, defaults to DEBUG_STREAM_FPS.
+            scale (float): Downscale factor of the streamed image, defaults to DEBUG_STREAM_SCALE.
+            quality (int): JPEG quality, defaults to DEBUG_STREAM_QUALITY.
+            host (str): Address to listen on, defaults to DEBUG_STREAM_HOST.
+            clock (callable): Time source in seconds used for the frame rate cap.
+        """
+        self.port = port if port is not None else cv.DEBUG_STREAM_PORT
+        self.interval = 1.0 / (fps if fps is not None else cv.DEBUG_STREAM_FPS)
+        self.scale = scale if scale is not None else cv.DEBUG_STREAM_SCALE
+        self.quality = quality if quality is not None else cv.DEBUG_STREAM_QUALITY
+        self.host = host if host is not None else cv.DEBUG_STREAM_HOST
+        self._clock = clock
+        self._next_due = 0.0
+        self.clients = 0
+
+        self._condition = threading.Condition()
+        self._pending = None
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._running = False
+        self._server = None
+        self._threads = []
+
+    def start(self):
+        """Start the HTTP server and the render thread."""
+        stream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/stream.mjpg":
+                    stream._serve_stream(self)
+                else:
+                    body = PAGE.encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._running = True
+        self._threads = [threading.Thread(target=self._server.serve_forever, name="DebugStreamHTTP", daemon=True),
+                         threading.Thread(target=self._render_loop, name="DebugStreamRender", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Debug stream on http://{self.host}:{self.port}/")
+        print(f"Debug stream on http://{self.host}:{self.port}/")
+        return self
+
+    def wants_frame(self):
+        """True if a viewer is connected and the next frame is due. Cheap enough to call every frame."""
+        return self.clients > 0 and self._clock() >= self._next_due
+
+    def submit(self, frame, overlays=(), mask_color=None):
+        """
+        Hand a frame to the render thread. The frame must not be modified afterwards.
+
+        Args:
+            frame (numpy.ndarray): BGR camera frame.
+            overlays (list): Overlay primitives in frame coordinates.
+            mask_color (str): Color whose HSV mask is highlighted, or None.
+        """
+        self._next_due = self._clock() + self.interval
+        with self._condition:
+            self._pending = (frame, overlays, mask_color)
+            self._condition.notify_all()
+
+    def _render_loop(self):
+        while True:
+            with self._condition:
+                while self._running and self._pending is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                frame, overlays, mask_color = self._pending
+                self._pending = None
+            try:
+                image = render_frame(frame, overlays, mask_color, self.scale)
+                ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            except Exception as e:
+                logger.error(f"Debug stream render failed: {e}")
+                continue
+            if ok:
+                with self._condition:
+                    self._jpeg = jpeg.tobytes()
+                    self._jpeg_seq += 1
+                    self._condition.notify_all()
+
+    def _serve_stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        with self._condition:
+            self.clients += 1
+        seen = self._jpeg_seq if self._jpeg is None else self._jpeg_seq - 1
+        try:
+            while True:
+                with self._condition:
+                    while self._running and self._jpeg_seq == seen:
+                        self._condition.wait()
+                    if not self._running:
+                        return
+                    jpeg, seen = self._jpeg, self._jpeg_seq
+                handler.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                handler.wfile.write(jpeg + b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._condition:
+                self.clients -= 1
+
+    def close(self):
+        """Stop serving and rendering."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
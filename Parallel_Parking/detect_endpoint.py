@@ -1,13 +1,20 @@
 import cv2
 
-def detect_endpoint(mask, vertical_lines, debug_frame=None):
+def endpoint_columns(width, vertical_lines):
+    """x-coordinates of the left and right endpoint lines in a mask of the given width."""
+    return (int(width * vertical_lines["line1_x_percent"] / 100),
+            int(width * vertical_lines["line2_x_percent"] / 100))
+
+def detect_endpoint(mask, vertical_lines, overlays=None):
     """
     Detect if yellow is present outside the vertical lines (left and right)
     and below the horizontal line.
+
+    If overlays is a list, the vertical lines are appended to it as debug
+    overlay primitives (see debug_stream.render_overlays) in mask coordinates.
     """
     height, width = mask.shape
-    line1_x = int(width * vertical_lines["line1_x_percent"] / 100)
-    line2_x = int(width * vertical_lines["line2_x_percent"] / 100)
+    line1_x, line2_x = endpoint_columns(width, vertical_lines)
 
     left_region = mask[:, :line1_x]
     right_region = mask[:, line2_x:]
@@ -15,9 +22,9 @@ def detect_endpoint(mask, vertical_lines, debug_frame=None):
     yellow_in_left = cv2.countNonZero(left_region) > 0
     yellow_in_right = cv2.countNonZero(right_region) > 0
 
-    if debug_frame is not None:
-        cv2.line(debug_frame, (line1_x, 0), (line1_x, height), (0, 255, 0), 2)
-        cv2.line(debug_frame, (line2_x, 0), (line2_x, height), (0, 255, 0), 2)
+    if overlays is not None:
+        overlays.append(("line", (line1_x, 0), (line1_x, height), (0, 255, 0), 2))
+        overlays.append(("line", (line2_x, 0), (line2_x, height), (0, 255, 0), 2))
 
     return yellow_in_left and yellow_in_right
 
@@ -0,0 +1,125 @@
+# fake_vesc.py
+
+import math
+import time
+from types import SimpleNamespace
+import control_vals as cv
+
+# Approximate Traxxas 1/10 chassis values for the kinematic bicycle model
+WHEELBASE = 0.33                        # meters
+MAX_STEER_ANGLE = math.radians(25)      # front wheel angle at STEERING_LEFT_MAX/RIGHT_MAX
+MPS_PER_RPM = 0.00024                   # ground speed per commanded ERPM
+MOTOR_TAU = 0.15                        # seconds, first-order motor response
+SERVO_RATE = 4.0                        # servo units per second
+
+
+class VirtualClock:
+    """
+    Manually advanced clock for running timed code faster than real time.
+    Pass clock.now / clock.sleep wherever a time source and sleep are accepted.
+    """
+    def __init__(self, start=0.0):
+        self._now = start
+
+    def now(self):
+        return self._now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self._now += seconds
+
+    def advance_to(self, timestamp):
+        self._now = max(self._now, timestamp)
+
+
+class FakeVESC:
+    """
+    Stand-in for pyvesc.VESC that drives a kinematic bicycle model instead of
+    hardware. The model is advanced lazily to the current time of time_source
+    whenever a command is sent or a measurement is read.
+    """
+    def __init__(self, time_source=time.monotonic, motor_tau=MOTOR_TAU, servo_rate=SERVO_RATE, rpm_gain=1.0, step=0.002):
+        """
+        Args:
+            time_source (callable): Returns the current time in seconds.
+            motor_tau (float): Motor time constant in seconds, 0 for instant response.
+            servo_rate (float): Servo slew limit in units per second, None for instant response.
+            rpm_gain (float): Fraction of the commanded RPM the motor settles at
+                (e.g. 0.9 for a sagging battery or high floor friction).
+            step (float): Integration step in seconds.
+        """
+        self._time_source = time_source
+        self.motor_tau = motor_tau
+        self.servo_rate = servo_rate
+        self.rpm_gain = rpm_gain
+        self.step = step
+
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.rpm = 0.0
+        self.servo = cv.STEERING_NEUTRAL
+        self.tachometer = 0.0
+        self.tachometer_abs = 0.0
+        self.commanded_rpm = 0
+        self.commanded_servo = cv.STEERING_NEUTRAL
+        self._last_update = time_source()
+
+    def set_servo(self, value):
+        self._update()
+        self.commanded_servo = value
+
+    def set_rpm(self, value):
+        self._update()
+        self.commanded_rpm = value
+
+    def get_measurements(self):
+        """Return the subset of pyvesc's GetValues fields the model can provide."""
+        self._update()
+        return SimpleNamespace(rpm=self.rpm, tachometer=int(self.tachometer),
+                               tachometer_abs=int(self.tachometer_abs))
+
+    @property
+    def pose(self):
+        """Current (x, y, heading) in meters and radians."""
+        self._update()
+        return self.x, self.y, self.heading
+
+    def _steer_angle(self):
+        if self.servo >= cv.STEERING_NEUTRAL:
+            fraction = (self.servo - cv.STEERING_NEUTRAL) / (cv.STEERING_RIGHT_MAX - cv.STEERING_NEUTRAL)
+        else:
+            fraction = (self.servo - cv.STEERING_NEUTRAL) / (cv.STEERING_NEUTRAL - cv.STEERING_LEFT_MAX)
+        return fraction * MAX_STEER_ANGLE
+
+    def _update(self):
+        now = self._time_source()
+        remaining = now - self._last_update
+        self._last_update = now
+        while remaining > 0:
+            dt = min(self.step, remaining)
+            remaining -= dt
+            self._integrate(dt)
+
+    def _integrate(self, dt):
+        # Motor and servo response
+        target_rpm = self.commanded_rpm * self.rpm_gain
+        if self.motor_tau > 0:
+            self.rpm += (target_rpm - self.rpm) * (1 - math.exp(-dt / self.motor_tau))
+        else:
+            self.rpm = float(target_rpm)
+        if self.servo_rate is not None:
+            max_change = self.servo_rate * dt
+            self.servo += max(-max_change, min(max_change, self.commanded_servo - self.servo))
+        else:
+            self.servo = self.commanded_servo
+
+        counts = self.rpm / 60 * cv.TACHO_COUNTS_PER_EREV * dt
+        self.tachometer += counts
+        self.tachometer_abs += abs(counts)
+
+        # Kinematic bicycle model, positive steering turns right (clockwise)
+        speed = self.rpm * MPS_PER_RPM
+        self.x += speed * math.cos(self.heading) * dt
+        self.y += speed * math.sin(self.heading) * dt
+        self.heading -= speed * math.tan(self._steer_angle()) / WHEELBASE * dt
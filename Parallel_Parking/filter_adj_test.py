@@ -3,10 +3,7 @@ import numpy as np
 import depthai as dai
 import control_vals as cv
 import sys
-import json
-import ast
-
-CONTROL_VALS_FILE = "control_vals.py"
+from calibration import save_calibration
 
 def empty(a):
     """Dummy function for trackbar callback."""
@@ -43,48 +40,15 @@ def get_hsv_values():
     }
 
 def save_hsv_values(color, hsv_values):
-    """Save HSV values for the specified color to control_vals.py."""
-    with open(CONTROL_VALS_FILE, "r") as file:
-        lines = file.readlines()
-
-    # Locate the HSV_VALUES dictionary start line
-    hsv_start_line = None
-    for i, line in enumerate(lines):
-        if line.strip().startswith("HSV_VALUES = {"):
-            hsv_start_line = i
-            break
-
-    if hsv_start_line is None:
-        print("Error: HSV_VALUES dictionary not found in control_vals.py")
-        return
-
-    # Reconstruct the HSV_VALUES dictionary from the lines
-    hsv_dict_lines = []
-    open_braces = 0
-    for line in lines[hsv_start_line:]:
-        hsv_dict_lines.append(line)
-        open_braces += line.count("{") - line.count("}")
-        if open_braces == 0:
-            break
-
-    try:
-        hsv_dict = ast.literal_eval("".join(hsv_dict_lines).split("=", 1)[1].strip())
-    except SyntaxError as e:
-        print("Error parsing HSV_VALUES dictionary:", e)
-        return
-
-    # Update the specified color's HSV values
+    """Save HSV values for the specified color to the calibration file."""
+    hsv_dict = dict(cv.HSV_VALUES)
     hsv_dict[color] = hsv_values
-
-    # Replace the HSV_VALUES dictionary in the file
-    new_hsv_dict = f"HSV_VALUES = {json.dumps(hsv_dict, indent=4)}\n"
-    lines[hsv_start_line:hsv_start_line + len(hsv_dict_lines)] = [new_hsv_dict]
-
-    # Save the updated file
-    with open(CONTROL_VALS_FILE, "w") as file:
-        file.writelines(lines)
-
-#    print(f"HSV values saved for {color}.")
+    try:
+        save_calibration({"HSV_VALUES": hsv_dict})
+    except ValueError as e:
+        print(f"HSV values not saved: {e}")
+        return False
+    return True
 
 
 def filter_color(frame, hsv_values):
@@ -145,6 +109,7 @@ def main():
         # Get the output queue for the RGB stream
         rgb_queue = device.getOutputQueue(name="rgb", maxSize=4, blocking=False)
 
+        last_values = color_hsv
         try:
             while True:
                 # Get the latest frame from the camera
@@ -154,8 +119,10 @@ def main():
                 # Get current HSV values from trackbars
                 hsv_values = get_hsv_values()
 
-                # Save HSV values after each adjustment
-                save_hsv_values(color, hsv_values)
+                # Save HSV values after each adjustment (a running car picks them up)
+                if hsv_values != last_values:
+                    save_hsv_values(color, hsv_values)
+                    last_values = hsv_values
 
                 # Filter the selected color using the adjusted HSV range
                 color_filtered = filter_color(frame, hsv_values)
@@ -1,15 +1,18 @@
 import cv2
 import numpy as np
-import control_vals as cv
+import calibration
 
-def filter_yellow_line(frame):
-    """Filter the yellow line using saved HSV values."""
+KERNEL = np.ones((5, 5), np.uint8)
+
+def filter_yellow_line(frame, calib=None, close=True):
+    """
+    Filter the yellow line using saved HSV values (of calib, by default the current calibration).
+    With close, small gaps in the mask are closed with a 5x5 kernel.
+    """
     hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    hsv_values = cv.HSV_VALUES["yellow"]
-    lower_bound = np.array([hsv_values["LOW_H"], hsv_values["LOW_S"], hsv_values["LOW_V"]])
-    upper_bound = np.array([hsv_values["HIGH_H"], hsv_values["HIGH_S"], hsv_values["HIGH_V"]])
+    lower_bound, upper_bound = (calib or calibration.current()).hsv_bounds["yellow"]
     mask = cv2.inRange(hsv, lower_bound, upper_bound)
-    kernel = np.ones((5, 5), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    if close:
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, KERNEL)
     return mask
 
@@ -0,0 +1,352 @@
+# hsv_autocal.py
+
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import control_vals as cv
+import calibration
+from calibration import save_calibration
+from run_recorder import RunReader, decode_frame, STREAM_FRAME
+
+# HSV histogram quantization: bin width per channel and resulting bin counts (OpenCV H is 0..179)
+BIN_WIDTH = np.array([4, 8, 8])
+BINS = tuple(int(n) for n in np.ceil(np.array([180, 256, 256]) / BIN_WIDTH))
+
+# Lower/upper percentiles of the labeled pixels used as search starting boxes
+START_PERCENTILES = [(1, 99), (5, 95), (10, 90), (25, 75)]
+
+
+def load_frames(paths):
+    """
+    Yield BGR frames from image files, directories of images and run recordings (.run).
+    """
+    for pattern in paths:
+        if os.path.isdir(pattern):
+            files = sorted(glob.glob(os.path.join(pattern, "*")))
+        else:
+            files = sorted(glob.glob(pattern)) or [pattern]
+        for path in files:
+            if path.endswith(".run"):
+                with RunReader(path) as reader:
+                    for record in reader.records(streams={STREAM_FRAME}):
+                        yield path, decode_frame(record.data[2])
+            else:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    yield path, frame
+
+
+def load_label_file(path):
+    """
+    Load per-image labels: {"frames": [{"image": path, "labels": [label, ...]}, ...]}.
+    A label is {"color": c, "cells": [[row, col], ...]} (BAR_POSITIONS grid,
+    rows top to bottom) or {"color": c, "rect": [x1, y1, x2, y2]} in pixels.
+
+    Returns:
+        list: (image path, labels) pairs, paths relative to the label file.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    return [(os.path.join(base, entry["image"]), entry["labels"]) for entry in data["frames"]]
+
+
+def label_mask(shape, label, geometry):
+    """Boolean mask of the region a label marks."""
+    mask = np.zeros(shape[:2], dtype=bool)
+    if "rect" in label:
+        x1, y1, x2, y2 = label["rect"]
+        mask[y1:y2, x1:x2] = True
+    for row, col in label.get("cells", []):
+        (y1, y2), (x1, x2) = geometry.rows[row], geometry.columns[col]
+        mask[y1:y2, x1:x2] = True
+    return mask
+
+
+def bin_index(hsv):
+    """Flat histogram bin of each HSV pixel."""
+    q = hsv // BIN_WIDTH.astype(hsv.dtype)
+    return np.ravel_multi_index((q[..., 0], q[..., 1], q[..., 2]), BINS)
+
+
+class HistogramSet:
+    """
+    Per-color histograms of labeled (positive) pixels and of all pixels,
+    accumulated frame by frame with np.bincount.
+    """
+    def __init__(self, colors, stride=2):
+        self.colors = colors
+        self.stride = stride
+        size = int(np.prod(BINS))
+        self.total = np.zeros(size, dtype=np.int64)
+        self.positive = {color: np.zeros(size, dtype=np.int64) for color in colors}
+        self.frames = 0
+
+    def add(self, frame, labels, calib):
+        height, width = frame.shape[:2]
+        geometry = calib.geometry(width, height)
+        s = self.stride
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)[::s, ::s]
+        bins = bin_index(hsv).ravel()
+        self.total += np.bincount(bins, minlength=self.total.size)
+        for color in self.colors:
+            masks = [label_mask(frame.shape, label, geometry)[::s, ::s]
+                     for label in labels if label["color"] == color]
+            if masks:
+                selected = bins[np.logical_or.reduce(masks).ravel()]
+                self.positive[color] += np.bincount(selected, minlength=self.total.size)
+        self.frames += 1
+
+    def arrays(self, color):
+        """(positive, negative) histograms of color shaped BINS; negatives are all unlabeled pixels."""
+        positive = self.positive[color]
+        return positive.reshape(BINS), (self.total - positive).reshape(BINS)
+
+
+def summed_volume(hist):
+    """Summed-volume table with a zero border, so any box sum takes 8 lookups."""
+    table = np.zeros(tuple(n + 1 for n in hist.shape), dtype=np.int64)
+    table[1:, 1:, 1:] = hist.cumsum(0).cumsum(1).cumsum(2)
+    return table
+
+
+def box_sums(table, boxes):
+    """
+    Histogram sums of many boxes at once.
+
+    Args:
+        table: summed_volume() of the histogram.
+        boxes (numpy.ndarray): N x 6 inclusive bin bounds (h0, h1, s0, s1, v0, v1).
+    """
+    h0, h1, s0, s1, v0, v1 = boxes.T
+    h1, s1, v1 = h1 + 1, s1 + 1, v1 + 1
+    return (table[h1, s1, v1] - table[h0, s1, v1] - table[h1, s0, v1] - table[h1, s1, v0]
+            + table[h0, s0, v1] + table[h0, s1, v0] + table[h1, s0, v0] - table[h0, s0, v0])
+
+
+def score(tp, fp, positives, beta):
+    """F-beta of the pixel classification; beta < 1 weighs precision higher."""
+    precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 0.0)
+    recall = tp / max(positives, 1)
+    b2 = beta * beta
+    return np.where(tp > 0, (1 + b2) * precision * recall / np.maximum(b2 * precision + recall, 1e-12), 0.0)
+
+
+def search_box(job):
+    """
+    Coordinate ascent over the six box bounds from a start box: each round
+    scores every value of every bound (vectorized) and applies the best move.
+    Runs in a worker process.
+
+    Returns:
+        tuple: (score, box)
+    """
+    positive, negative, start, beta = job
+    pos_table, neg_table = summed_volume(positive), summed_volume(negative)
+    positives = int(positive.sum())
+    limits = [BINS[0] - 1, BINS[0] - 1, BINS[1] - 1, BINS[1] - 1, BINS[2] - 1, BINS[2] - 1]
+    box = np.array(start, dtype=np.int64)
+
+    def evaluate(boxes):
+        tp = box_sums(pos_table, boxes)
+        return score(tp, box_sums(neg_table, boxes), positives, beta)
+
+    best = float(evaluate(box[None])[0])
+    while True:
+        improved = False
+        for i in range(6):
+            low_bound = i % 2 == 0
+            other = box[i + 1] if low_bound else box[i - 1]
+            values = np.arange(0, other + 1) if low_bound else np.arange(other, limits[i] + 1)
+            candidates = np.repeat(box[None], len(values), axis=0)
+            candidates[:, i] = values
+            scores = evaluate(candidates)
+            j = int(np.argmax(scores))
+            if scores[j] > best + 1e-12:
+                best, box = float(scores[j]), candidates[j]
+                improved = True
+        if not improved:
+            return best, box.tolist()
+
+
+def start_boxes(positive, current_hsv=None):
+    """Starting boxes from percentiles of the labeled pixels, plus the current thresholds."""
+    boxes = []
+    marginals = [positive.sum(axis=(1, 2)), positive.sum(axis=(0, 2)), positive.sum(axis=(0, 1))]
+    cumulative = [np.cumsum(m) / max(m.sum(), 1) for m in marginals]
+    for low, high in START_PERCENTILES:
+        box = []
+        for c in cumulative:
+            box += [int(np.searchsorted(c, low / 100)), int(np.searchsorted(c, high / 100))]
+        boxes.append(box)
+    if current_hsv:
+        boxes.append(hsv_to_box(current_hsv))
+    return boxes
+
+
+def hsv_to_box(hsv):
+    lows = np.array([hsv["LOW_H"], hsv["LOW_S"], hsv["LOW_V"]]) // BIN_WIDTH
+    highs = np.minimum(np.array([hsv["HIGH_H"], hsv["HIGH_S"], hsv["HIGH_V"]]) // BIN_WIDTH, np.array(BINS) - 1)
+    return [int(lows[0]), int(highs[0]), int(lows[1]), int(highs[1]), int(lows[2]), int(highs[2])]
+
+
+def box_to_hsv(box):
+    """HSV_VALUES entry covering exactly the pixels of the box's bins."""
+    maxima = [179, 255, 255]
+    values = {}
+    for channel, i, width, maximum in zip("HSV", range(3), BIN_WIDTH, maxima):
+        values[f"LOW_{channel}"] = int(box[2 * i] * width)
+        values[f"HIGH_{channel}"] = int(min((box[2 * i + 1] + 1) * width - 1, maximum))
+    return values
+
+
+def calibrate(histograms, beta=0.5, workers=None, current=None):
+    """
+    Search the threshold box of each color.
+
+    Returns:
+        dict: color -> {"hsv": HSV_VALUES entry, "precision", "recall", "score"}.
+    """
+    jobs, owners = [], []
+    for color in histograms.colors:
+        positive, negative = histograms.arrays(color)
+        if positive.sum() == 0:
+            continue
+        for start in start_boxes(positive, (current or {}).get(color)):
+            jobs.append((positive, negative, start, beta))
+            owners.append(color)
+
+    best = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for color, (value, box) in zip(owners, pool.map(search_box, jobs)):
+            if color not in best or value > best[color][0]:
+                best[color] = (value, box)
+
+    results = {}
+    for color, (value, box) in best.items():
+        positive, negative = histograms.arrays(color)
+        boxes = np.array([box])
+        tp = int(box_sums(summed_volume(positive), boxes)[0])
+        fp = int(box_sums(summed_volume(negative), boxes)[0])
+        results[color] = {
+            "hsv": box_to_hsv(box),
+            "precision": tp / max(tp + fp, 1),
+            "recall": tp / max(int(positive.sum()), 1),
+            "score": value,
+        }
+    return results
+
+
+def region_rates(labeled_frames, thresholds, calib, min_pixels=1):
+    """
+    Detection rates as color_detection sees them: a grid cell fires when at
+    least min_pixels of it fall inside the thresholds.
+
+    Returns:
+        dict: color -> {"hit_rate": labeled regions that fire, "false_alarm_rate":
+        unlabeled grid cells that fire}.
+    """
+    counts = {color: [0, 0, 0, 0] for color in thresholds}  # hits, labeled, alarms, unlabeled
+    for frame, labels in labeled_frames:
+        height, width = frame.shape[:2]
+        geometry = calib.geometry(width, height)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        for color, hsv_values in thresholds.items():
+            lower = np.array([hsv_values["LOW_H"], hsv_values["LOW_S"], hsv_values["LOW_V"]])
+            upper = np.array([hsv_values["HIGH_H"], hsv_values["HIGH_S"], hsv_values["HIGH_V"]])
+            mask = cv2.inRange(hsv, lower, upper)
+            labeled_cells = set()
+            for label in labels:
+                if label["color"] != color:
+                    continue
+                labeled_cells.update(tuple(cell) for cell in label.get("cells", []))
+                counts[color][0] += cv2.countNonZero(mask[label_mask(frame.shape, label, geometry)]) >= min_pixels
+                counts[color][1] += 1
+            for row in geometry.rows:
+                for col in geometry.columns:
+                    if (row, col) not in labeled_cells:
+                        counts[color][2] += cv2.countNonZero(geometry.cell(mask, row, col)) >= min_pixels
+                        counts[color][3] += 1
+    return {color: {"hit_rate": hits / max(labeled, 1), "false_alarm_rate": alarms / max(unlabeled, 1)}
+            for color, (hits, labeled, alarms, unlabeled) in counts.items()}
+
+
+def parse_label(text):
+    """Parse a --label value "color:row,col[;row,col...]"."""
+    color, cells = text.split(":", 1)
+    return {"color": color, "cells": [[int(v) for v in cell.split(",")] for cell in cells.split(";")]}
+
+
+def labeled_frames(args):
+    """Yield (frame, labels) from --labels or from --frames with --label applied to every frame."""
+    if args.labels:
+        for path, labels in load_label_file(args.labels):
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"Skipping unreadable image {path}")
+                continue
+            yield frame, labels
+    else:
+        labels = [parse_label(text) for text in args.label]
+        for _, frame in load_frames(args.frames):
+            yield frame, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute HSV thresholds per color from labeled frames and report precision/recall.")
+    parser.add_argument("--labels", default=None, help="JSON label file (see load_label_file).")
+    parser.add_argument("--frames", nargs="+", default=[], help="Images, directories or .run files.")
+    parser.add_argument("--label", action="append", default=[],
+                        help='Grid cells holding a color in every --frames frame, e.g. "red:1,2;3,2".')
+    parser.add_argument("--stride", type=int, default=2, help="Use every Nth pixel in each direction.")
+    parser.add_argument("--beta", type=float, default=0.5,
+                        help="F-beta weighting; below 1 favors precision, since one stray pixel triggers a detection.")
+    parser.add_argument("--min-pixels", type=int, default=1,
+                        help="Pixels a region needs inside the thresholds to count as detected in the hit/false rates.")
+    parser.add_argument("--workers", type=int, default=None, help="Search processes, default one per CPU.")
+    parser.add_argument("--output", default=None, help="Write the thresholds as a calibration file.")
+    parser.add_argument("--save", action="store_true", help="Save the thresholds to CALIBRATION_FILE.")
+    args = parser.parse_args()
+    if not args.labels and not (args.frames and args.label):
+        parser.error("give --labels, or --frames with at least one --label")
+
+    calib = calibration.current()
+    label_sets = [labels for _, labels in load_label_file(args.labels)] if args.labels else \
+        [[parse_label(text) for text in args.label]]
+    colors = sorted({label["color"] for labels in label_sets for label in labels})
+    histograms = HistogramSet(colors, stride=args.stride)
+    for frame, labels in labeled_frames(args):
+        histograms.add(frame, labels, calib)
+    print(f"{histograms.frames} frames, {int(histograms.total.sum())} pixels sampled")
+
+    results = calibrate(histograms, beta=args.beta, workers=args.workers, current=cv.HSV_VALUES)
+    thresholds = {color: result["hsv"] for color, result in results.items()}
+    rates = region_rates(labeled_frames(args), thresholds, calib, args.min_pixels)
+
+    print(f"\n{'color':<8} {'H':>9} {'S':>9} {'V':>9} {'precision':>10} {'recall':>7} {'hit':>6} {'false':>6}")
+    for color, result in results.items():
+        hsv = result["hsv"]
+        print(f"{color:<8} {hsv['LOW_H']:>4}-{hsv['HIGH_H']:<4} {hsv['LOW_S']:>4}-{hsv['HIGH_S']:<4} "
+              f"{hsv['LOW_V']:>4}-{hsv['HIGH_V']:<4} {result['precision']:>10.3f} {result['recall']:>7.3f} "
+              f"{rates[color]['hit_rate']:>6.2f} {rates[color]['false_alarm_rate']:>6.2f}")
+    print("\nPixel precision/recall are relative to the labeled regions; hit is the share of labeled regions")
+    print("that would detect the color, false the share of unlabeled grid cells that would.")
+
+    hsv_values = dict(cv.HSV_VALUES, **thresholds)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"HSV_VALUES": hsv_values}, f, indent=4)
+            f.write("\n")
+        print(f"\nThresholds written to {args.output}")
+    if args.save:
+        save_calibration({"HSV_VALUES": hsv_values})
+        print(f"\nThresholds saved to {cv.CALIBRATION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
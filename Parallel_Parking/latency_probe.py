@@ -0,0 +1,107 @@
+# latency_probe.py
+
+import time
+import numpy as np
+
+
+class LatencyProbe:
+    """
+    Measures the latency from a frame's capture to the first servo and RPM
+    command sent after the control loop took it, and the achieved loop rate.
+
+    Call frame_taken() once per loop frame and wrap the VESC with wrap_vesc()
+    (perform_line_following does both when given probe=). Frames read outside
+    the loop, e.g. by spot detection, are not counted. Capture times come
+    from ImgFrame.getTimestamp(), which depthai reports on the host monotonic
+    clock, so they include exposure-to-host transfer and queueing.
+    """
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._servo_pending = None
+        self._rpm_pending = None
+        self.frames = 0
+        self.frames_without_command = 0
+        self.first_frame_time = None
+        self.last_frame_time = None
+        self.servo_latencies = []
+        self.rpm_latencies = []
+
+    def frame_taken(self, capture_ts=None):
+        """Note a frame taken by the control loop, captured at capture_ts (default: now)."""
+        now = self._clock()
+        if self._servo_pending is not None:
+            self.frames_without_command += 1
+        self._servo_pending = self._rpm_pending = capture_ts if capture_ts is not None else now
+        self.frames += 1
+        if self.first_frame_time is None:
+            self.first_frame_time = now
+        self.last_frame_time = now
+
+    def servo_sent(self):
+        if self._servo_pending is not None:
+            self.servo_latencies.append(self._clock() - self._servo_pending)
+            self._servo_pending = None
+
+    def rpm_sent(self):
+        if self._rpm_pending is not None:
+            self.rpm_latencies.append(self._clock() - self._rpm_pending)
+            self._rpm_pending = None
+
+    def wrap_vesc(self, vesc):
+        return _ProbedVESC(vesc, self)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Frame count, loop rate in Hz and p50/p95/p99/max latency in
+            milliseconds for servo and RPM commands.
+        """
+        elapsed = (self.last_frame_time or 0) - (self.first_frame_time or 0)
+        result = {
+            "frames": self.frames,
+            "frames_without_command": self.frames_without_command,
+            "loop_rate_hz": round((self.frames - 1) / elapsed, 2) if elapsed > 0 else None,
+        }
+        for name, latencies in (("servo", self.servo_latencies), ("rpm", self.rpm_latencies)):
+            if latencies:
+                ms = np.asarray(latencies) * 1000
+                p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+                result[name] = {"count": len(ms), "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2),
+                                "p99_ms": round(float(p99), 2), "max_ms": round(float(ms.max()), 2)}
+        return result
+
+    def format_summary(self):
+        summary = self.summary()
+        text = f"{summary['frames']} frames at {summary['loop_rate_hz']} Hz"
+        for name in ("servo", "rpm"):
+            if name in summary:
+                s = summary[name]
+                text += (f", capture to {name} p50 {s['p50_ms']:.1f} ms, p95 {s['p95_ms']:.1f} ms,"
+                         f" p99 {s['p99_ms']:.1f} ms")
+        return text
+
+
+def frame_capture_time(in_frame):
+    """Host monotonic capture time of a depthai ImgFrame in seconds, or None if it has none."""
+    get_timestamp = getattr(in_frame, "getTimestamp", None)
+    if get_timestamp is None:
+        return None
+    return get_timestamp().total_seconds()
+
+
+class _ProbedVESC:
+    def __init__(self, vesc, probe):
+        self._vesc = vesc
+        self._probe = probe
+
+    def set_servo(self, value):
+        self._vesc.set_servo(value)
+        self._probe.servo_sent()
+
+    def set_rpm(self, value):
+        self._vesc.set_rpm(value)
+        self._probe.rpm_sent()
+
+    def __getattr__(self, name):
+        return getattr(self._vesc, name)
+
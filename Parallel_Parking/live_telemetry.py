@@ -0,0 +1,218 @@
+# live_telemetry.py
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import shared_memory
+import numpy as np
+import control_vals as cv
+from telemetry import RECORD_DTYPE, COLOR_NAMES, SIDE_CODES, CommandTracker
+
+# Layout of the shared block: a uint64 sequence counter followed by one record
+SEQ_DTYPE = np.dtype("<u8")
+LIVE_DTYPE = np.dtype(RECORD_DTYPE.descr + [("loop_hz", "<f4"), ("pid", "<u4")])
+BLOCK_SIZE = SEQ_DTYPE.itemsize + LIVE_DTYPE.itemsize
+
+SIDE_NAMES = {code: side for side, code in SIDE_CODES.items()}
+# Mirrors perform_line_following.STATE_NAMES, which the monitor does not import to stay free of camera dependencies
+STATE_NAMES = {0: "LINE_FOLLOWING", 1: "COLOR_DETECTED", 2: "COLOR_DISAPPEARED", 3: "PARKED"}
+
+
+def _attach(name):
+    """Attach to an existing block without letting this process's resource tracker unlink it at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class LiveTelemetry(CommandTracker):
+    """
+    Publishes the latest loop state into a multiprocessing.shared_memory
+    block for a monitor process (python3 live_telemetry.py).
+
+    Writes are protected by a seqlock: the sequence counter is odd while the
+    record is being written, and readers retry until they see the same even
+    value before and after copying. Publishing is a tuple assignment and two
+    integer stores, with no locks, syscalls or waiting on readers.
+    """
+    def __init__(self, name=None):
+        super().__init__()
+        self.name = name or cv.LIVE_TELEMETRY_NAME
+        try:
+            self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=BLOCK_SIZE)
+        except FileExistsError:
+            # Left behind by a run that did not exit cleanly
+            stale = _attach(self.name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=BLOCK_SIZE)
+        self._seq = np.ndarray((1,), dtype=SEQ_DTYPE, buffer=self._shm.buf)
+        self._record = np.ndarray((1,), dtype=LIVE_DTYPE, buffer=self._shm.buf, offset=SEQ_DTYPE.itemsize)
+        self._seq[0] = 0
+        self._pid = os.getpid()
+        self._last_time = None
+        self._loop_hz = math.nan
+
+    def record(self, *args):
+        """Publish the state of one loop iteration. Takes the arguments of make_record()."""
+        timestamp = args[0]
+        if self._last_time is not None and timestamp > self._last_time:
+            rate = 1.0 / (timestamp - self._last_time)
+            self._loop_hz = rate if math.isnan(self._loop_hz) else 0.9 * self._loop_hz + 0.1 * rate
+        self._last_time = timestamp
+
+        seq = int(self._seq[0])
+        self._seq[0] = seq + 1  # Odd: write in progress
+        self._record[0] = self.make_record(*args) + (self._loop_hz, self._pid)
+        self._seq[0] = seq + 2
+
+    def close(self):
+        """Release and remove the shared block."""
+        if self._shm is not None:
+            del self._seq, self._record
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class LiveTelemetryReader:
+    """Reads consistent snapshots of the published state from another process."""
+    def __init__(self, name=None):
+        self._shm = _attach(name or cv.LIVE_TELEMETRY_NAME)
+        self._seq = np.ndarray((1,), dtype=SEQ_DTYPE, buffer=self._shm.buf)
+        self._record = np.ndarray((1,), dtype=LIVE_DTYPE, buffer=self._shm.buf, offset=SEQ_DTYPE.itemsize)
+        self._copy = np.zeros(1, dtype=LIVE_DTYPE)
+
+    def read(self, retries=100):
+        """
+        Returns:
+            dict: Latest published record with a "seq" entry, or None if
+            nothing was published yet or no consistent copy was obtained.
+        """
+        for _ in range(retries):
+            before = int(self._seq[0])
+            if before == 0:
+                return None
+            if before % 2:
+                continue
+            self._copy[0] = self._record[0]
+            if int(self._seq[0]) == before:
+                snapshot = {name: self._copy[0][name].item() for name in LIVE_DTYPE.names}
+                snapshot["seq"] = before // 2
+                return snapshot
+        return None
+
+    def close(self):
+        del self._seq, self._record
+        self._shm.close()
+
+
+def describe(snapshot):
+    """Readable form of a snapshot for display."""
+    result = dict(snapshot)
+    result["state"] = STATE_NAMES.get(snapshot["state"], snapshot["state"])
+    result["color"] = COLOR_NAMES.get(snapshot["color"])
+    result["side"] = SIDE_NAMES.get(snapshot["side"])
+    result["cx"] = None if snapshot["cx"] < 0 else snapshot["cx"]
+    return {key: (None if isinstance(value, float) and math.isnan(value) else value) for key, value in result.items()}
+
+
+def format_snapshot(state):
+    timings = "  ".join(f"{key[:-3]} {value:.1f}" for key, value in state.items()
+                        if key.endswith("_ms") and value is not None)
+    return (f"#{state['frame']:<6} {str(state['state']):<18} {'PAUSED ' if state['paused'] else ''}"
+            f"{'in_pause ' if state['in_pause'] else ''}"
+            f"cx {state['cx']}  offset {state['offset'] if state['offset'] is None else round(state['offset'], 3)}  "
+            f"steer {state['steering'] if state['steering'] is None else round(state['steering'], 3)}  "
+            f"rpm {state['rpm']}  lost {state['lost_frames']}  "
+            f"color {state['color']} side {state['side']}  "
+            f"{state['loop_hz'] or 0:.1f} Hz\n  ms: {timings}")
+
+
+def wait_for_reader(name, poll=0.5):
+    """Attach to the block, waiting until the car program has created it."""
+    while True:
+        try:
+            return LiveTelemetryReader(name)
+        except FileNotFoundError:
+            time.sleep(poll)
+
+
+def run_terminal(reader, rate):
+    while True:
+        snapshot = reader.read()
+        text = format_snapshot(describe(snapshot)) if snapshot else "Waiting for data..."
+        sys.stdout.write("\x1b[2J\x1b[H" + text + "\n")
+        sys.stdout.flush()
+        time.sleep(1.0 / rate)
+
+
+PAGE = """<!doctype html><html><head><title>Parallel Parking live</title></head>
+<body style="font-family: monospace"><pre id="state">Waiting for data...</pre>
+<script>
+async function update() {
+  try {
+    const response = await fetch('/state.json');
+    document.getElementById('state').textContent = JSON.stringify(await response.json(), null, 2);
+  } catch (e) {}
+}
+setInterval(update, %d);
+</script></body></html>"""
+
+
+def run_http(reader, port, rate):
+    """Serve the latest snapshot as /state.json and a page polling it at rate Hz on localhost."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/state.json":
+                snapshot = reader.read()
+                body = json.dumps(describe(snapshot) if snapshot else None).encode()
+                content_type = "application/json"
+            else:
+                body = (PAGE % int(1000 / rate)).encode()
+                content_type = "text/html"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving live telemetry on http://127.0.0.1:{port}/")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the live state published by the car program.")
+    parser.add_argument("--name", default=cv.LIVE_TELEMETRY_NAME, help="Shared memory block name.")
+    parser.add_argument("--rate", type=float, default=5.0, help="Refresh rate in Hz.")
+    parser.add_argument("--http", type=int, default=None, metavar="PORT",
+                        help="Serve a web page on localhost:PORT instead of printing to the terminal.")
+    args = parser.parse_args()
+
+    print(f"Waiting for shared memory block '{args.name}'...")
+    reader = wait_for_reader(args.name)
+    try:
+        if args.http:
+            run_http(reader, args.http, args.rate)
+        else:
+            run_terminal(reader, args.rate)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# log_throttle.py
+
+import time
+import control_vals as cv
+
+
+class _KeyState:
+    __slots__ = ("last_emit", "suppressed", "window_start", "last_seen", "level", "msg", "args", "console")
+
+    def __init__(self):
+        self.last_emit = None
+        self.suppressed = 0
+        self.window_start = 0.0
+        self.last_seen = 0.0
+
+
+class ThrottledLog:
+    """
+    Rate-limited log and console sink for messages repeated every frame.
+
+    Each message kind (key) is emitted at most once per interval. Occurrences
+    in between are only counted and reported with the next emitted message,
+    or by flush_due() once the interval has passed, as "N occurrences in T s".
+    Messages are %-style format strings with separate arguments, so nothing
+    is formatted unless a record is actually emitted.
+    """
+    def __init__(self, logger, interval=None, clock=time.monotonic):
+        """
+        Args:
+            logger (logging.Logger): Logger to emit to.
+            interval (float): Minimum seconds between records of one key, defaults to LOG_THROTTLE_INTERVAL.
+            clock (callable): Time source in seconds.
+        """
+        self.logger = logger
+        self.interval = interval if interval is not None else cv.LOG_THROTTLE_INTERVAL
+        self._clock = clock
+        self._keys = {}
+
+    def log(self, key, level, msg, *args, console=False):
+        """
+        Log msg % args under key unless the key was emitted less than interval ago.
+
+        Args:
+            key (str): Message kind that is rate limited as a whole.
+            level (int): Logging level.
+            msg (str): %-style format string.
+            console (bool): Also print the message when it is emitted.
+        """
+        if not console and not self.logger.isEnabledFor(level):
+            return
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState()
+        now = self._clock()
+        if state.last_emit is not None and now - state.last_emit < self.interval:
+            if not state.suppressed:
+                state.window_start = now
+            state.suppressed += 1
+            state.last_seen = now
+            # Keep the latest arguments for the summary
+            state.level, state.msg, state.args, state.console = level, msg, args, console
+            return
+        self._emit(state, now, level, msg, args, console, state.suppressed)
+
+    def _emit(self, state, occurred, level, msg, args, console, suppressed):
+        if suppressed:
+            # Repeats since the last record, plus this one
+            msg = msg + " [%d occurrences in %.1f s]"
+            args = args + (suppressed + 1, occurred - state.window_start)
+        self.logger.log(level, msg, *args)
+        if console:
+            print(msg % args if args else msg)
+        state.last_emit = occurred
+        state.suppressed = 0
+
+    def flush_due(self):
+        """Report keys whose suppressed repeats are older than interval. Cheap enough to call every frame."""
+        if not self._keys:
+            return
+        now = self._clock()
+        for state in self._keys.values():
+            if state.suppressed and now - state.last_emit >= self.interval:
+                # The latest occurrence is the reported message itself
+                self._emit(state, state.last_seen, state.level, state.msg, state.args, state.console,
+                           state.suppressed - 1)
+
+    def flush(self):
+        """Report all suppressed repeats now, e.g. before exiting."""
+        for state in self._keys.values():
+            if state.suppressed:
+                self._emit(state, state.last_seen, state.level, state.msg, state.args, state.console,
+                           state.suppressed - 1)
+
@@ -1,9 +1,110 @@
 # logger_config.py
 
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import control_vals as cv
 
-def setup_logger(name, log_file, level=logging.INFO):
+# Shared background writer for LOG_QUEUE mode, created by the first queued setup_logger call
+# and started by the first record, so importing a module that sets up a logger starts no thread
+_queue_handler = None
+_listener = None
+_router = None
+_setup_lock = threading.Lock()
+
+
+class _BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops (and counts) records instead of blocking when the
+    queue is full, and starts the listener with the first record.
+    """
+    def __init__(self, record_queue, listener_start):
+        super().__init__(record_queue)
+        self.dropped = 0
+        self._listener_start = listener_start
+
+    def enqueue(self, record):
+        if self._listener_start is not None:
+            self._listener_start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    """
+    QueueListener whose stop() waits up to LOG_SHUTDOWN_TIMEOUT seconds for
+    room for its sentinel. The base class uses put_nowait and raises
+    queue.Full when the bounded queue is full.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=cv.LOG_SHUTDOWN_TIMEOUT)
+
+    def drain(self):
+        """Write the records still queued on the calling thread."""
+        # Take them all before writing, so a writer thread still running gets none of them
+        records = []
+        while True:
+            try:
+                records.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for record in records:
+            if record is not self._sentinel:
+                self.handle(record)
+
+
+class _LoggerRouter(logging.Handler):
+    """Passes each record to the file handler of the logger that created it."""
+    def __init__(self):
+        super().__init__()
+        self.handlers = {}
+
+    def handle(self, record):
+        handler = self.handlers.get(record.name)
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+        return True
+
+
+def _create_file_handler(log_file, level):
+    # 5 MB per file; the file is opened on the first record
+    f_handler = RotatingFileHandler(log_file, maxBytes=5*1024*1024, backupCount=2, delay=True)
+    f_handler.setLevel(level)
+
+    # Create formatters and add them to handlers
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    f_handler.setFormatter(formatter)
+    return f_handler
+
+
+def _start_listener():
+    """Start the background writer thread (once)."""
+    with _setup_lock:
+        if _queue_handler is not None and _queue_handler._listener_start is not None:
+            _listener.start()
+            _queue_handler._listener_start = None
+            atexit.register(shutdown_logging)
+
+
+def _get_queue_handler():
+    """Create the shared queue and background writer on first use; the writer starts with the first record."""
+    global _queue_handler, _listener, _router
+    with _setup_lock:
+        if _queue_handler is None:
+            record_queue = queue.Queue(maxsize=cv.LOG_QUEUE_SIZE)
+            _router = _LoggerRouter()
+            _queue_handler = _BoundedQueueHandler(record_queue, _start_listener)
+            _listener = _Listener(record_queue, _router)
+        return _queue_handler
+
+
+def setup_logger(name, log_file, level=logging.INFO, queued=None):
     """
     Creates a logger with the specified name and log file using RotatingFileHandler.
 
@@ -11,30 +112,73 @@ def setup_logger(name, log_file, level=logging.INFO):
         name (str): Name of the logger.
         log_file (str): File path for the log file.
         level (int): Logging level.
+        queued (bool): Hand records to the shared background writer instead of
+            writing them on the calling thread. Defaults to LOG_QUEUE in control_vals.py.
 
     Returns:
         Logger object.
     """
+    if queued is None:
+        queued = cv.LOG_QUEUE
+
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
     # Prevent logging messages from being propagated to the root logger
     logger.propagate = False
 
-    # Create handlers
-    # Removed StreamHandler to prevent console logging
-    f_handler = RotatingFileHandler(log_file, maxBytes=5*1024*1024, backupCount=2)  # 5 MB per file
-    f_handler.setLevel(level)
-
-    # Create formatters and add them to handlers
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    f_handler.setFormatter(formatter)
-
     # Add handlers to the logger
+    # Removed StreamHandler to prevent console logging
     if not logger.hasHandlers():
-        logger.addHandler(f_handler)
+        f_handler = _create_file_handler(log_file, level)
+        if queued:
+            queue_handler = _get_queue_handler()
+            _router.handlers[name] = f_handler
+            logger.addHandler(queue_handler)
+        else:
+            logger.addHandler(f_handler)
 
     return logger
 
+
+def dropped_log_records():
+    """Number of records dropped because the log queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def shutdown_logging():
+    """
+    Write all queued records and stop the background writer. Loggers set up
+    in queued mode then write to their files directly. Registered with
+    atexit; safe to call more than once.
+    """
+    global _queue_handler, _listener, _router
+    with _setup_lock:
+        if _listener is None:
+            return
+        try:
+            if _queue_handler._listener_start is None:  # Started
+                try:
+                    _listener.stop()
+                except queue.Full:
+                    # The writer made no room in time: write the rest from here and
+                    # let the writer exit when it reaches the sentinel
+                    _listener.drain()
+                    try:
+                        _listener.enqueue_sentinel()
+                    except queue.Full:
+                        pass
+        finally:
+            _queue_handler._listener_start = None
+            dropped = _queue_handler.dropped
+            for name, handler in _router.handlers.items():
+                logger = logging.getLogger(name)
+                logger.removeHandler(_queue_handler)
+                logger.addHandler(handler)
+            # Records queued while the writer was stopping
+            _listener.drain()
+            for name, handler in _router.handlers.items():
+                if dropped:
+                    logging.getLogger(name).warning(f"{dropped} log records dropped because the log queue was full.")
+                handler.flush()
+            _queue_handler = _listener = _router = None
@@ -0,0 +1,245 @@
+# motions/playback.py
+
+import csv
+import time
+import logging
+import control_vals as cv
+
+logger = logging.getLogger('MotionPlayback')
+
+def load_motion_data(file_path):
+    """
+    Load a recorded motion from CSV.
+
+    Args:
+        file_path (str): CSV file with a header row and Timestamp, Steering, RPM columns.
+
+    Returns:
+        list: (timestamp, steering, rpm) tuples in recorded order.
+    """
+    motion_data = []
+    with open(file_path, mode="r") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)  # Skip the header row
+        for row in reader:
+            if len(row) < 3:
+                continue
+            timestamp, steering, rpm = float(row[0]), float(row[1]), float(row[2])
+            motion_data.append((timestamp, steering, rpm))
+    return motion_data
+
+def load_recording(file_path):
+    """
+    Load a recording for playback. When MOTION_RESAMPLE_HZ is set the
+    recording is resampled and smoothed by motions.trajectory (cached per
+    file), otherwise the raw samples are returned.
+    """
+    if cv.MOTION_RESAMPLE_HZ:
+        from motions.trajectory import load_trajectory
+        return load_trajectory(file_path)
+    return load_motion_data(file_path)
+
+def clamp_command(steering, rpm, speed_factor=1.0):
+    """
+    Clamp a steering/RPM pair to the safe servo and motor ranges.
+
+    Reverse RPM is clamped to REVERSE_RPM_MIN as recorded, scaled with the
+    playback speed factor so scaled samples keep their proportions, but
+    never beyond REVERSE_RPM_MAX.
+    """
+    steering = max(cv.STEERING_LEFT_MAX, min(cv.STEERING_RIGHT_MAX, steering))
+    reverse_limit = max(cv.REVERSE_RPM_MAX, cv.REVERSE_RPM_MIN * speed_factor)
+    rpm = int(max(reverse_limit, min(cv.FORWARD_RPM_MAX, rpm)))
+    return steering, rpm
+
+def max_speed_factor(motion_data):
+    """
+    Largest speed factor that keeps every recorded RPM within
+    FORWARD_RPM_MAX and REVERSE_RPM_MAX once scaled.
+    """
+    limit = float("inf")
+    for _, _, rpm in motion_data:
+        if rpm > 0:
+            limit = min(limit, cv.FORWARD_RPM_MAX / rpm)
+        elif rpm < 0:
+            limit = min(limit, cv.REVERSE_RPM_MAX / rpm)
+    return limit
+
+def scale_motion(motion_data, speed_factor):
+    """
+    Compress time and scale RPM by the same factor.
+
+    For a kinematic car the path only depends on distance travelled per
+    steering command, so dividing every interval by the factor while
+    multiplying RPM by it keeps the path the same. The factor is capped so no
+    scaled RPM exceeds the motor limits; clipping individual samples instead
+    would bend the path.
+
+    Args:
+        motion_data (list or np.ndarray): (timestamp, steering, rpm) rows.
+        speed_factor (float): >1 plays faster, <1 plays slower.
+
+    Returns:
+        tuple: (scaled motion data, speed factor actually applied).
+    """
+    if speed_factor <= 0:
+        raise ValueError(f"Speed factor must be positive, got {speed_factor}.")
+
+    limit = max_speed_factor(motion_data)
+    if speed_factor > limit:
+        logger.warning(f"Speed factor {speed_factor:.2f} exceeds RPM limits, capping at {limit:.2f}.")
+        speed_factor = limit
+
+    if speed_factor == 1.0 or len(motion_data) == 0:
+        return motion_data, speed_factor
+
+    t0 = motion_data[0][0]
+    if hasattr(motion_data, "shape"):
+        # Resampled NumPy trajectory
+        scaled = motion_data.copy()
+        scaled[:, 0] = t0 + (scaled[:, 0] - t0) / speed_factor
+        scaled[:, 2] *= speed_factor
+        return scaled, speed_factor
+
+    scaled = [(t0 + (timestamp - t0) / speed_factor, steering, rpm * speed_factor)
+              for timestamp, steering, rpm in motion_data]
+    return scaled, speed_factor
+
+def distance_profile(motion_data):
+    """
+    Convert a recording into a distance-indexed profile by integrating the
+    recorded RPM over each command's duration.
+
+    Args:
+        motion_data (list): (timestamp, steering, rpm) tuples.
+
+    Returns:
+        list: (end_counts, steering, rpm, duration) per command, where
+        end_counts is the cumulative absolute tachometer count at which the
+        command is finished. Commands with zero RPM keep their duration and
+        are held in time.
+    """
+    profile = []
+    travelled = 0.0
+    for i in range(len(motion_data) - 1):
+        timestamp, steering, rpm = motion_data[i]
+        duration = motion_data[i + 1][0] - timestamp
+        travelled += abs(rpm) * max(duration, 0.0) / 60 * cv.TACHO_COUNTS_PER_EREV
+        profile.append((travelled, steering, rpm, duration))
+    return profile
+
+def read_tachometer(vesc):
+    """Absolute tachometer count from the VESC, or None if the read failed."""
+    measurements = vesc.get_measurements()
+    if measurements is None:
+        return None
+    return measurements.tachometer_abs
+
+def play_motion(vesc, motion_data, speed_factor=1.0, label="Motion", clock=time.monotonic, sleep=time.sleep, mode=None):
+    """
+    Send a recorded motion to the VESC and stop the robot afterwards.
+
+    Args:
+        vesc: VESC (or anything with set_servo/set_rpm, and get_measurements in distance mode).
+        motion_data (list or np.ndarray): (timestamp, steering, rpm) rows, raw
+            or resampled by motions.trajectory.
+        speed_factor (float): Playback speed, see scale_motion.
+        label (str): Name used in log messages.
+        clock (callable): Monotonic time source in seconds.
+        sleep (callable): Sleep function matching clock.
+        mode (str): "time" or "distance", defaults to MOTION_PLAYBACK_MODE.
+
+    Returns:
+        float: Speed factor actually applied.
+    """
+    if mode is None:
+        mode = cv.MOTION_PLAYBACK_MODE
+    if mode not in ("time", "distance"):
+        raise ValueError(f"Unknown playback mode '{mode}'. Expected 'time' or 'distance'.")
+
+    motion_data, speed_factor = scale_motion(motion_data, speed_factor)
+    if speed_factor != 1.0:
+        logger.info(f"{label} playback at {speed_factor:.2f}x recorded speed.")
+
+    if len(motion_data) > 0:
+        if mode == "distance":
+            _play_by_distance(vesc, motion_data, label, clock, sleep, speed_factor)
+        else:
+            _play_by_time(vesc, motion_data, label, clock, sleep, speed_factor)
+
+    # Stop the robot after executing the motion
+    vesc.set_rpm(0)
+    vesc.set_servo(cv.STEERING_NEUTRAL)
+    return speed_factor
+
+def _play_by_time(vesc, motion_data, label, clock, sleep, speed_factor=1.0):
+    """
+    Send each command at its recorded time. Commands are scheduled against
+    the start time rather than sleeping for each interval, so small delays in
+    set_servo/set_rpm do not accumulate.
+    """
+    t0 = motion_data[0][0]
+    start_time = clock()
+
+    for i in range(len(motion_data) - 1):
+        _, steering, rpm = motion_data[i]
+        next_timestamp = motion_data[i + 1][0]
+
+        # Ensure commands are within safe ranges
+        steering, rpm = clamp_command(steering, rpm, speed_factor)
+
+        vesc.set_servo(steering)
+        vesc.set_rpm(rpm)
+        logger.debug("%s -> Steering: %.2f, RPM: %s", label, steering, rpm)
+
+        # Wait until the next command is due
+        time_to_wait = start_time + (next_timestamp - t0) - clock()
+        if time_to_wait > 0:
+            sleep(time_to_wait)
+
+def _play_by_distance(vesc, motion_data, label, clock, sleep, speed_factor=1.0, poll_interval=0.01, stall_factor=3.0):
+    """
+    Advance through the recording by measured tachometer counts, so steering
+    changes where the recorded car was rather than when. Stops (zero RPM) are
+    held for their recorded duration. A command that takes more than
+    stall_factor times its recorded duration is abandoned with a warning.
+    """
+    profile = distance_profile(motion_data)
+    start_counts = read_tachometer(vesc)
+    if start_counts is None:
+        logger.error(f"{label}: no tachometer reading, falling back to time-indexed playback.")
+        _play_by_time(vesc, motion_data, label, clock, sleep, speed_factor)
+        return
+    travelled = 0
+
+    for end_counts, steering, rpm, duration in profile:
+        steering, rpm = clamp_command(steering, rpm, speed_factor)
+
+        if rpm == 0:
+            vesc.set_servo(steering)
+            vesc.set_rpm(0)
+            if duration > 0:
+                sleep(duration)
+            # Count the distance coasted during the hold
+            counts = read_tachometer(vesc)
+            if counts is not None:
+                travelled = counts - start_counts
+            continue
+
+        # Already past this command (e.g. coasting after a stop)
+        if travelled >= end_counts:
+            continue
+
+        vesc.set_servo(steering)
+        vesc.set_rpm(rpm)
+        logger.debug("%s -> Steering: %.2f, RPM: %s, target counts: %.0f", label, steering, rpm, end_counts)
+
+        deadline = clock() + stall_factor * duration + poll_interval
+        while travelled < end_counts:
+            if clock() > deadline:
+                logger.warning(f"{label}: stalled at {travelled} of {end_counts:.0f} counts, moving on.")
+                break
+            sleep(poll_interval)
+            counts = read_tachometer(vesc)
+            if counts is not None:
+                travelled = counts - start_counts
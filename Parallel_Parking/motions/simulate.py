@@ -0,0 +1,110 @@
+# motions/simulate.py
+
+import argparse
+import math
+import os
+import sys
+
+# Add the parent directory to the system path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_dir)
+
+from fake_vesc import FakeVESC, VirtualClock, MOTOR_TAU, SERVO_RATE
+from motions.playback import load_motion_data, play_motion
+from motions.trajectory import METHODS, resample_motion
+
+MOTIONS = ["U_Turn", "Left_Parking", "Left_Exit", "Right_Parking", "Right_Exit"]
+
+# Time allowed for the motor to spin down after the final stop command
+SETTLE_TIME = 1.0
+
+
+# Motor lag and RPM gain combinations for --compare_modes
+LAG_SCENARIOS = [(0.05, 1.0), (0.15, 1.0), (0.3, 1.0), (0.15, 0.85), (0.3, 0.7)]
+
+
+def simulate_motion(motion_data, speed_factor=1.0, motor_tau=MOTOR_TAU, servo_rate=SERVO_RATE,
+                    rpm_gain=1.0, mode="time"):
+    """
+    Play a recorded motion against the simulated car on a virtual clock.
+
+    Returns:
+        tuple: (final pose (x, y, heading), playback duration in seconds, speed factor applied).
+    """
+    clock = VirtualClock()
+    vesc = FakeVESC(time_source=clock.now, motor_tau=motor_tau, servo_rate=servo_rate, rpm_gain=rpm_gain)
+    applied = play_motion(vesc, motion_data, speed_factor=speed_factor, label="Simulation",
+                          clock=clock.now, sleep=clock.sleep, mode=mode)
+    duration = clock.now()
+    clock.sleep(SETTLE_TIME)
+    return vesc.pose, duration, applied
+
+
+def endpoint_error(pose, reference):
+    """Position error in meters and heading error in degrees between two poses."""
+    distance = math.hypot(pose[0] - reference[0], pose[1] - reference[1])
+    heading = math.atan2(math.sin(pose[2] - reference[2]), math.cos(pose[2] - reference[2]))
+    return distance, math.degrees(abs(heading))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Estimate endpoint error of time-scaled maneuver playback in the kinematic car model.")
+    parser.add_argument("motions", nargs="*", default=MOTIONS, help="Motions to simulate (default: all).")
+    parser.add_argument("--recordings_dir", default=os.path.join(parent_dir, "recordings"),
+                        help="Directory containing the motion CSV files.")
+    parser.add_argument("--factors", type=float, nargs="+", default=[1.0, 1.25, 1.5, 2.0],
+                        help="Speed factors to compare.")
+    parser.add_argument("--motor_tau", type=float, default=MOTOR_TAU, help="Motor time constant in seconds.")
+    parser.add_argument("--servo_rate", type=float, default=SERVO_RATE, help="Servo slew rate in units per second.")
+    parser.add_argument("--mode", choices=["time", "distance"], default="time",
+                        help="Playback indexing used for the speed factor table.")
+    parser.add_argument("--resample_hz", type=float, default=None,
+                        help="Resample recordings to this rate before playback (see motions/trajectory.py).")
+    parser.add_argument("--interpolation", choices=METHODS, default="linear", help="Steering interpolation.")
+    parser.add_argument("--smoothing", type=float, default=0.0, help="Steering moving average width in seconds.")
+    parser.add_argument("--compare_modes", action="store_true",
+                        help="Compare time- and distance-indexed endpoint error under motor lag instead.")
+    return parser.parse_args()
+
+
+def compare_modes(motion, motion_data, servo_rate):
+    """Print endpoint error of both playback modes for each lag scenario."""
+    reference, _, _ = simulate_motion(motion_data, 1.0, motor_tau=0, servo_rate=None)
+
+    print(f"\n{motion} ({len(motion_data)} commands)")
+    print(f"{'tau s':>6} {'gain':>5} {'time cm':>8} {'time deg':>9} {'dist cm':>8} {'dist deg':>9}")
+    for motor_tau, rpm_gain in LAG_SCENARIOS:
+        row = f"{motor_tau:>6.2f} {rpm_gain:>5.2f}"
+        for mode in ("time", "distance"):
+            pose, _, _ = simulate_motion(motion_data, 1.0, motor_tau, servo_rate, rpm_gain, mode)
+            distance, heading = endpoint_error(pose, reference)
+            row += f" {distance * 100:>8.1f} {heading:>9.1f}"
+        print(row)
+
+
+def main():
+    args = parse_arguments()
+
+    for motion in args.motions:
+        motion_data = load_motion_data(os.path.join(args.recordings_dir, f"{motion}.csv"))
+        if args.resample_hz:
+            motion_data = resample_motion(motion_data, args.resample_hz, args.interpolation, args.smoothing)
+        if args.compare_modes:
+            compare_modes(motion, motion_data, args.servo_rate)
+            continue
+
+        # Ideal car: exact kinematic path of the recording at recorded speed
+        reference, _, _ = simulate_motion(motion_data, 1.0, motor_tau=0, servo_rate=None)
+
+        print(f"\n{motion} ({len(motion_data)} commands)")
+        print(f"{'factor':>8} {'applied':>8} {'duration s':>11} {'error cm':>9} {'heading deg':>12}")
+        for factor in args.factors:
+            pose, duration, applied = simulate_motion(motion_data, factor, args.motor_tau, args.servo_rate,
+                                                      mode=args.mode)
+            distance, heading = endpoint_error(pose, reference)
+            print(f"{factor:>8.2f} {applied:>8.2f} {duration:>11.2f} {distance * 100:>9.1f} {heading:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# motions/trajectory.py
+
+import os
+import logging
+import numpy as np
+import control_vals as cv
+from motions.playback import load_motion_data
+
+logger = logging.getLogger('MotionPlayback')
+
+METHODS = ("hold", "linear", "cubic", "slew")
+
+# Resampled trajectories keyed by file, modification time and processing options
+_trajectory_cache = {}
+
+
+def _hold(t, times, values):
+    """Zero-order hold: each sample keeps the last recorded value (what playback did before)."""
+    idx = np.searchsorted(times, t, side="right") - 1
+    return values[np.clip(idx, 0, len(values) - 1)]
+
+
+def _pchip(t, times, values):
+    """
+    Monotone piecewise cubic (Fritsch-Carlson) interpolation. Unlike a plain
+    cubic spline it never overshoots the recorded values, so steering stays
+    inside the recorded range.
+    """
+    h = np.diff(times)
+    delta = np.diff(values) / h
+
+    # Tangents: weighted harmonic mean of neighbouring slopes, zero at extrema
+    slopes = np.zeros_like(values)
+    same_sign = delta[:-1] * delta[1:] > 0
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = (w1 + w2) / (w1 / delta[1:] + w2 / delta[:-1])
+    slopes[1:-1] = np.where(same_sign, harmonic, 0.0)
+    slopes[0] = delta[0]
+    slopes[-1] = delta[-1]
+
+    idx = np.clip(np.searchsorted(times, t, side="right") - 1, 0, len(h) - 1)
+    s = (t - times[idx]) / h[idx]
+    h00 = (1 + 2 * s) * (1 - s) ** 2
+    h10 = s * (1 - s) ** 2
+    h01 = s ** 2 * (3 - 2 * s)
+    h11 = s ** 2 * (s - 1)
+    return (h00 * values[idx] + h10 * h[idx] * slopes[idx]
+            + h01 * values[idx + 1] + h11 * h[idx] * slopes[idx + 1])
+
+
+def _slew_limit(values, max_step):
+    """Limit the change between consecutive samples. The recurrence is sequential, so this loops."""
+    limited = np.empty_like(values)
+    current = values[0]
+    for i, target in enumerate(values):
+        current += min(max_step, max(-max_step, target - current))
+        limited[i] = current
+    return limited
+
+
+def _moving_average(values, window):
+    """Centered moving average over window samples, padded with the edge values."""
+    if window <= 1:
+        return values
+    padded = np.pad(values, (window // 2, window - 1 - window // 2), mode="edge")
+    return np.convolve(padded, np.ones(window) / window, mode="valid")
+
+
+def resample_motion(motion_data, rate_hz=100, method="linear", smoothing=0.0, max_slew=None, rpm_method="hold"):
+    """
+    Resample a recording onto a uniform time grid.
+
+    Args:
+        motion_data (list or np.ndarray): (timestamp, steering, rpm) rows.
+        rate_hz (float): Output command rate.
+        method (str): Steering interpolation: "hold", "linear", "cubic" or "slew".
+        smoothing (float): Width in seconds of a moving average applied to steering, 0 to disable.
+        max_slew (float): Steering slew limit in servo units per second for "slew"
+            (defaults to the full servo range per 0.25 s).
+        rpm_method (str): RPM interpolation. "hold" keeps the recorded distance per command.
+
+    Returns:
+        np.ndarray: (N, 3) float array of timestamp, steering, rpm rows that
+        play_motion accepts in place of the raw recording.
+    """
+    if method not in METHODS or rpm_method not in METHODS:
+        raise ValueError(f"Unknown interpolation method. Expected one of {METHODS}.")
+
+    data = np.asarray(motion_data, dtype=np.float64)
+    if len(data) < 2:
+        return data.reshape(-1, 3)
+    data = data[np.argsort(data[:, 0], kind="stable")]
+    # Drop repeated timestamps, keeping the last command sent at each
+    keep = np.append(np.diff(data[:, 0]) > 0, True)
+    data = data[keep]
+    if len(data) < 2:
+        return data
+
+    times = data[:, 0]
+    dt = 1.0 / rate_hz
+    grid = np.append(np.arange(times[0], times[-1], dt), times[-1])
+
+    def interpolate(values, how):
+        if how == "hold":
+            return _hold(grid, times, values)
+        if how == "cubic" and len(times) > 2:
+            return _pchip(grid, times, values)
+        if how == "slew":
+            step = (max_slew if max_slew is not None
+                    else (cv.STEERING_RIGHT_MAX - cv.STEERING_LEFT_MAX) / 0.25) * dt
+            return _slew_limit(_hold(grid, times, values), step)
+        return np.interp(grid, times, values)
+
+    steering = interpolate(data[:, 1], method)
+    if smoothing > 0:
+        steering = _moving_average(steering, int(round(smoothing * rate_hz)))
+    steering = np.clip(steering, cv.STEERING_LEFT_MAX, cv.STEERING_RIGHT_MAX)
+    rpm = interpolate(data[:, 2], rpm_method)
+
+    return np.column_stack((grid, steering, rpm))
+
+
+def load_trajectory(file_path, rate_hz=None, method=None, smoothing=None, max_slew=None):
+    """
+    Load and resample a recording, reusing the result until the file changes.
+    Options default to the MOTION_* trajectory settings in control_vals.py.
+
+    Returns:
+        np.ndarray: Read-only (N, 3) array, see resample_motion.
+    """
+    rate_hz = rate_hz if rate_hz is not None else cv.MOTION_RESAMPLE_HZ
+    method = method if method is not None else cv.MOTION_INTERPOLATION
+    smoothing = smoothing if smoothing is not None else cv.MOTION_SMOOTHING
+
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, rate_hz, method, smoothing, max_slew)
+    trajectory = _trajectory_cache.get(key)
+    if trajectory is None:
+        trajectory = resample_motion(load_motion_data(path), rate_hz, method, smoothing, max_slew)
+        trajectory.flags.writeable = False
+        # Forget older versions of a re-recorded file
+        for stale in [k for k in _trajectory_cache if k[0] == path and k[1:3] != key[1:3]]:
+            del _trajectory_cache[stale]
+        _trajectory_cache[key] = trajectory
+        logger.info(f"Resampled {file_path} to {len(trajectory)} commands at {rate_hz} Hz ({method}).")
+    return trajectory
@@ -6,13 +6,22 @@ import argparse
 import os
 import sys
 
-def monitor_and_record_vesc(motion_name, output_dir="/home/jetson/projects/final_project/recordings"):
+# Add the parent directory to the system path
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(parent_dir)
+
+from command_recorder import receive_samples, STREAM_SOCKET_PATH
+
+def monitor_and_record_vesc(motion_name, output_dir="/home/jetson/projects/final_project/recordings",
+                            stream_path=STREAM_SOCKET_PATH):
     """
-    Monitor and record VESC steering and RPM values for a specified motion.
+    Record every VESC steering and RPM command streamed by the teleop script
+    (combined_control2.py or train_control.py) for a specified motion.
     
     Args:
         motion_name (str): Name of the motion (e.g., "Right_Exit").
         output_dir (str): Directory where CSV files are stored.
+        stream_path (str): Unix socket the teleop script streams commands to.
     """
     # Ensure the output directory exists
     os.makedirs(output_dir, exist_ok=True)
@@ -30,41 +39,38 @@ def monitor_and_record_vesc(motion_name, output_dir="/home/jetson/projects/final
             sys.exit(1)
     
     print(f"Recording {motion_name} motion to: {output_file}")
-    print("Monitoring VESC steering and RPM. Press 'Ctrl+C' to stop.")
+    print(f"Listening for VESC commands on {stream_path}. Press 'Ctrl+C' to stop.")
     
+    samples = 0
+    missed = 0
+    last_print = 0
     # Open CSV file for recording
     try:
         with open(output_file, mode="w", newline="") as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(["Timestamp", "Steering", "RPM"])  # CSV header
-    
-            while True:
-                try:
-                    with open("/home/jetson/projects/final_project/vesc_values.txt", "r") as file:
-                        data = file.read().strip()
-                        if data:
-                            steering, rpm = map(float, data.split(","))
-                            timestamp = time.time()
-                            print(f"Timestamp: {timestamp:.2f}, Steering: {steering:.2f}, RPM: {rpm}")
-                            
-                            # Write to CSV
-                            writer.writerow([timestamp, steering, rpm])
-                            csvfile.flush()  # Ensure data is saved immediately
-                except FileNotFoundError:
-                    print("Shared file 'vesc_values.txt' not found. Waiting for updates...")
-                except ValueError:
-                    print("Invalid data format in 'vesc_values.txt'. Expected 'steering,rpm'.")
-                except Exception as e:
-                    print(f"Error reading 'vesc_values.txt': {e}")
-    
-                time.sleep(0.05)  # Adjust polling rate as needed
+
+            try:
+                for timestamp, steering, rpm, gap in receive_samples(stream_path):
+                    writer.writerow([timestamp, steering, rpm])
+                    samples += 1
+                    if gap:
+                        missed += gap
+                        print(f"Warning: {gap} commands were not delivered to the recorder.")
+
+                    # Throttle console output so printing never holds up the socket
+                    if time.monotonic() - last_print > 0.5:
+                        print(f"Timestamp: {timestamp:.2f}, Steering: {steering:.2f}, RPM: {rpm}")
+                        last_print = time.monotonic()
+            finally:
+                csvfile.flush()
     
     except KeyboardInterrupt:
         print("\nMonitoring stopped by user.")
     except Exception as e:
-        print(f"Error opening CSV file '{output_file}': {e}")
+        print(f"Error recording to '{output_file}': {e}")
     finally:
-        print(f"Recording saved to {output_file}")
+        print(f"Recording saved to {output_file} ({samples} commands, {missed} missed)")
 
 def parse_arguments():
     """
@@ -86,9 +92,18 @@ def parse_arguments():
         default="/home/jetson/projects/final_project/recordings",
         help="Directory to store CSV recordings. Default is 'recordings/'."
     )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=STREAM_SOCKET_PATH,
+        help=f"Unix socket the teleop script streams commands to. Default is '{STREAM_SOCKET_PATH}'."
+    )
     return parser.parse_args()
 
-if __name__ == "__main__":
+def main():
     args = parse_arguments()
-    monitor_and_record_vesc(args.motion, args.output_dir)
+    monitor_and_record_vesc(args.motion, args.output_dir, args.socket)
+
+if __name__ == "__main__":
+    main()
 
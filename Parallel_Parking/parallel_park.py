@@ -1,43 +1,106 @@
 # parallel_park.py
 
 import logging
-from logger_config import setup_logger
+import os
+import time
+from logger_config import setup_logger, shutdown_logging
+import control_vals as cv
 
 from initialize_vesc import initialize_vesc
-from motions.U_Turn import load_u_turn_data
-from controller_input import wait_for_start_signal, is_motion_paused, get_color_to_search, set_motion_paused
-from perform_line_following import perform_line_following
+from controller_input import wait_for_start_signal, is_motion_paused, get_color_to_search, set_motion_paused, add_controller_listener
+from perform_line_following import perform_line_following, STATE_NAMES
+from run_recorder import RunRecorder, RecordingVESC
+from latency_probe import LatencyProbe
+import tracing
+from telemetry import TelemetryWriter
+from live_telemetry import LiveTelemetry
+from debug_stream import DebugStream
+from calibration import CalibrationWatcher
+from warmup import WarmUp, WarmCamera, load_motions, prepare_vision
 
 # Setup logger for main script
 logger = setup_logger('Main', 'main.log')
 
+def trace_path():
+    return os.path.join(cv.TRACE_DIR, time.strftime("trace_%Y%m%d_%H%M%S.json"))
+
+def close_warm_camera(warmup):
+    """Close the camera opened during warm-up, waiting for it if it is still booting."""
+    warmup.close()
+    try:
+        warmup.result("camera").close()
+    except BaseException:
+        pass  # Failed or cancelled; already reported
+
 def main():
     serial_port = "/dev/ttyACM0"  # Update with your VESC's serial port
     baudrate = 115200
-    u_turn_file = "/home/jetson/projects/final_project/recordings/U_Turn.csv"  # U-turn motion data file
+    u_turn_file = os.path.join(cv.RECORDINGS_DIR, "U_Turn.csv")  # U-turn motion data file
+    recorder = None
+    probe = LatencyProbe() if cv.LATENCY_PROBE else None
+    telemetry = None
+    live_telemetry = None
+    debug_stream = None
+    calibration_watcher = None
+    warmup = None
+
+    if cv.TRACE_ENABLED:
+        # Enable before the controller thread starts so its polling is traced too
+        tracing.enable(cv.TRACE_CAPACITY)
+        tracing.dump_on_signal(trace_path)
 
     try:
+        # Bring up the VESC, camera, motion data and vision while waiting for the start button
+        warmup = WarmUp(logger)
+        warmup.add("vesc", initialize_vesc, serial_port, baudrate)
+        warmup.add("camera", WarmCamera)
+        warmup.add("motion_data", load_motions, u_turn_file)
+        warmup.add("vision", prepare_vision)
+
+        if cv.RUN_RECORDING:
+            # Record frames, commands, gamepad events and state transitions of this run
+            run_file = os.path.join(cv.RUN_RECORDING_DIR, time.strftime("run_%Y%m%d_%H%M%S.run"))
+            recorder = RunRecorder(run_file, jpeg_quality=cv.RUN_RECORDING_JPEG_QUALITY,
+                                   frame_interval=cv.RUN_RECORDING_FRAME_INTERVAL)
+            add_controller_listener(recorder.record_event)
+            logger.info(f"Recording run to {run_file}.")
+
+        if cv.TELEMETRY:
+            telemetry_file = os.path.join(cv.TELEMETRY_DIR, time.strftime("telemetry_%Y%m%d_%H%M%S.tlm"))
+            telemetry = TelemetryWriter(telemetry_file, meta={"states": STATE_NAMES})
+            logger.info(f"Writing telemetry to {telemetry_file}.")
+        if cv.LIVE_TELEMETRY:
+            live_telemetry = LiveTelemetry()
+            logger.info(f"Publishing live telemetry to shared memory '{live_telemetry.name}'.")
+        if cv.DEBUG_STREAM:
+            debug_stream = DebugStream().start()
+        if cv.CALIBRATION_WATCH:
+            # Pick up changes saved by the adjust scripts without restarting
+            calibration_watcher = CalibrationWatcher(logger=logger).start()
+
         # Wait for the Y button to be pressed before starting
         wait_for_start_signal()
+        start_signal = time.monotonic()
 
-        logger.info("Initializing VESC...")
-        print("Initializing VESC")
-        # Initialize the VESC
-        vesc = initialize_vesc(serial_port, baudrate)
+        if warmup.pending():
+            logger.info(f"Start signal before warm-up finished: waiting for {', '.join(warmup.pending())}.")
+        warmup.wait()
+        warmup.report()
+        vesc = warmup.result("vesc")
         logger.info("VESC initialized successfully.")
-        print("VESC initialized successfully on attempt 1.")
-
-        print("Connected to OAK-D Lite Device. Starting line-following")
-        print("Select Y on remote to pause and resume motion")
-
-        # Load U-turn motion data
-        logger.info("Loading U-turn motion data...")
-        motion_data = load_u_turn_data(u_turn_file)
-        logger.info("U-turn motion data loaded.")
+        camera = warmup.result("camera")
+        camera.drain()
+        motion_data = warmup.result("motion_data")
+        vision = warmup.result("vision")
+        if recorder is not None:
+            vesc = RecordingVESC(vesc, recorder)
 
         # Perform line following with U-turn detection and motion control
-        logger.info("Starting line-following routine.")
-        perform_line_following(vesc, motion_data)
+        logger.info(f"Starting line-following routine {(time.monotonic() - start_signal) * 1000:.1f} ms "
+                    f"after the start signal.")
+        perform_line_following(vesc, motion_data, device=camera, recorder=recorder, probe=probe,
+                               telemetry=telemetry, live_telemetry=live_telemetry,
+                               debug_stream=debug_stream, vision=vision)
 
     except KeyboardInterrupt:
         print("\nStopped and reset vehicle")
@@ -46,9 +109,30 @@ def main():
         logger.error(f"Unhandled exception: {e}")
     finally:
         # Ensure controller polling thread is stopped
-        from controller_input import _controller_instance
-        _controller_instance.stop()
+        from controller_input import stop_controller
+        stop_controller()
         logger.info("Controller polling thread stopped.")
+        if recorder is not None:
+            recorder.close()
+        if telemetry is not None:
+            telemetry.close()
+        if live_telemetry is not None:
+            live_telemetry.close()
+        if debug_stream is not None:
+            debug_stream.close()
+        if calibration_watcher is not None:
+            calibration_watcher.stop()
+        if warmup is not None:
+            close_warm_camera(warmup)
+        if probe is not None and probe.frames:
+            logger.info(f"Loop latency: {probe.format_summary()}")
+            print(f"Loop latency: {probe.format_summary()}")
+        if cv.TRACE_ENABLED:
+            path = tracing.get_tracer().dump(trace_path())
+            logger.info(f"Trace written to {path}.")
+            print(f"Trace written to {path}")
+        # Write any log records still queued before the process exits
+        shutdown_logging()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+# park.py
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Subcommand: (module with main(), description). Modules are imported only
+# for the subcommand being run, with the remaining arguments as sys.argv.
+COMMANDS = {
+    "run": ("parallel_park", "Drive the course: line following, U-turns and parking."),
+    "teleop": ("combined_control2", "Drive with the gamepad; --record writes the commands to a CSV."),
+    "record": ("motions.vesc_record", "Record a motion from the command stream of teleop."),
+    "calibrate": ("calibrate", "Calibrate spot bars, endpoint lines, centerline, crop and HSV ranges."),
+    "autocal": ("hsv_autocal", "Compute HSV thresholds from labeled frames."),
+    "replay": ("replay_run", "Replay a recorded run through the line-following loop."),
+}
+BENCHMARKS = {
+    "vision": ("bench_vision", "Time the vision stages on synthetic frames."),
+    "latency": ("bench_latency", "Frame capture to VESC command latency with a fake camera and VESC."),
+    "backends": ("vision_backends", "Benchmark the vision backends and choose the fastest matching one."),
+    "tiled": ("tiled_threshold", "Scaling of tiled yellow thresholding with the thread count."),
+    "golden": ("vision_golden", "Check vision implementations against a golden dataset."),
+}
+
+# Modules the CLI itself must not import; subcommands import what they need
+HEAVY_MODULES = ["depthai", "cv2", "numpy", "pyvesc", "inputs"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def resolve(argv):
+    """
+    Returns:
+        tuple: (display name, module name, remaining arguments), or None if argv names no command.
+    """
+    if argv and argv[0] in COMMANDS:
+        return argv[0], COMMANDS[argv[0]][0], argv[1:]
+    if len(argv) >= 2 and argv[0] == "bench" and argv[1] in BENCHMARKS:
+        return f"bench {argv[1]}", BENCHMARKS[argv[1]][0], argv[2:]
+    return None
+
+
+def load(module_name):
+    """Import a subcommand's module and return its main()."""
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    return importlib.import_module(module_name).main
+
+
+def ready_report(module_name):
+    """
+    Import a subcommand as for running it and report what the import did:
+    heavy modules loaded and threads started (import-time side effects).
+    """
+    threads_before = set(threading.enumerate())
+    if module_name:
+        load(module_name)
+    return {
+        "heavy": [name for name in HEAVY_MODULES if name in sys.modules],
+        "threads": [thread.name for thread in threading.enumerate() if thread not in threads_before],
+    }
+
+
+def parse_importtime(stderr, top):
+    """Modules with the largest self import time from -X importtime output, as (microseconds, name)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        entries.append((int(self_us), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def measure_startup(argv, repeat=3, top=5):
+    """
+    Time-to-ready of a subcommand: a fresh interpreter started, its module
+    imported and main() resolved, without running it.
+
+    Returns:
+        dict: Median wall time in ms, heavy modules and threads started by the
+        import, and the slowest imports of the last run.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--ready"] + argv,
+                                capture_output=True, text=True, cwd=HERE)
+        samples.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(f"park {' '.join(argv)} failed to load:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    samples.sort()
+    report["ready_ms"] = samples[len(samples) // 2]
+    report["slowest_imports"] = parse_importtime(result.stderr, top)
+    return report
+
+
+def startup(argv):
+    """park startup: report (and with --check, enforce) time-to-ready of each subcommand."""
+    import control_vals as cv
+    all_commands = ["cli"] + list(COMMANDS) + [f"bench {name}" for name in BENCHMARKS]
+    parser = argparse.ArgumentParser(prog="park startup",
+                                     description="Measure how long each subcommand takes until it is ready to run.")
+    parser.add_argument("commands", nargs="*", default=None,
+                        help=f"Subcommands to measure (default: all): {', '.join(all_commands)}.")
+    parser.add_argument("--repeat", type=int, default=3, help="Interpreter starts per subcommand (median).")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per subcommand.")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with 1 if a subcommand exceeds its PARK_STARTUP_BUDGET_MS budget, or the CLI "
+                             "itself imports heavy modules or any import starts a thread.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for command in args.commands or all_commands:
+        report = measure_startup([] if command == "cli" else command.split(), args.repeat, args.top)
+        budget = cv.PARK_STARTUP_BUDGET_MS.get(command, cv.PARK_STARTUP_BUDGET_MS["default"])
+        problems = []
+        if report["ready_ms"] > budget:
+            problems.append(f"over the {budget} ms budget")
+        if command == "cli" and report["heavy"]:
+            problems.append(f"imports {', '.join(report['heavy'])}")
+        if report["threads"]:
+            problems.append(f"import started threads: {', '.join(report['threads'])}")
+        failed = failed or bool(problems)
+
+        print(f"{command:<16} {report['ready_ms']:>8.0f} ms  (budget {budget} ms)  "
+              f"heavy: {', '.join(report['heavy']) or '-'}" + "".join(f"  ** {problem}" for problem in problems))
+        for self_us, name in report["slowest_imports"]:
+            print(f"{'':<18}{self_us / 1000:>7.1f} ms  {name}")
+    if args.check:
+        sys.exit(1 if failed else 0)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv[:1] == ["--ready"]:
+        # Used by park startup: load the subcommand without running it
+        command = resolve(argv[1:])
+        print(json.dumps(ready_report(command[1] if command else None)))
+        return
+    if argv[:1] == ["startup"]:
+        startup(argv[1:])
+        return
+
+    command = resolve(argv)
+    if command is None:
+        lines = [f"  {name:<16}{description}" for name, (_, description) in COMMANDS.items()]
+        lines += [f"  bench {name:<10}{description}" for name, (_, description) in BENCHMARKS.items()]
+        lines.append(f"  {'startup':<16}Report the time each subcommand takes to load (--check enforces budgets).")
+        parser = argparse.ArgumentParser(
+            prog="park", formatter_class=argparse.RawDescriptionHelpFormatter,
+            description="Parallel parking car command line. Run park <command> --help for its options.",
+            epilog="commands:\n" + "\n".join(lines))
+        parser.add_argument("command", nargs=argparse.REMAINDER, help="Command and its arguments.")
+        args = parser.parse_args(argv)
+        if args.command:
+            parser.error(f"unknown command: {' '.join(args.command[:2])}")
+        parser.print_help()
+        return
+
+    name, module_name, rest = command
+    command_main = load(module_name)
+    # The subcommand parses its own arguments
+    sys.argv = [f"park {name}"] + rest
+    command_main()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,29 @@
 # perform_line_following.py
 
-import cv2
-import depthai as dai
 import numpy as np
 import time
+import contextlib
 import logging
 from logger_config import setup_logger
 
 from crop_frame import crop_frame
-from filter_yellow_line import filter_yellow_line
-from detect_endpoint import detect_endpoint
-from get_line_position import get_line_position
 from calculate_steering_offset import calculate_steering_offset
 from motions.U_Turn import execute_u_turn
 import control_vals as cv
-from controller_input import is_motion_paused, get_color_to_search, clear_color_to_search, set_motion_paused
-from color_detection import detect_color_in_boxes, is_color_present_in_row
+import calibration
+from controller_input import get_controller
+from vision_backends import get_backend
 from motions.Left_Parking import execute_left_parking
 from motions.Right_Parking import execute_right_parking
 from motions.Left_Exit import execute_left_exit
 from motions.Right_Exit import execute_right_exit
+from run_recorder import RecordingDevice
+from stage_profiler import StageProfiler
+import tracing
+from profile_capture import ProfileCapture
+from log_throttle import ThrottledLog
+from latency_probe import frame_capture_time
+from qos import QosGovernor
 
 logger = setup_logger('LineFollowing', 'line_following.log')
 
@@ -29,16 +33,70 @@ STATE_COLOR_DETECTED = 1        # Color detected and resumed after pause, now mo
 STATE_COLOR_DISAPPEARED = 2     # Color gone, paused indefinitely, waiting for Y press to do parking
 STATE_PARKED = 3                # Finished parking, paused again, waiting for Y press to do exit
 
-def perform_line_following(vesc, motion_data):
-    pipeline = dai.Pipeline()
-    cam_rgb = pipeline.createColorCamera()
-    cam_rgb.setPreviewSize(cv.CAMERA_RESOLUTION_WIDTH, cv.CAMERA_RESOLUTION_HEIGHT)
-    cam_rgb.setInterleaved(False)
-    cam_rgb.setFps(cv.CAMERA_FPS)
+class FrameSourceExhausted(Exception):
+    """Raised by a replayed frame source when the recording has no more frames."""
 
-    xout_rgb = pipeline.createXLinkOut()
-    xout_rgb.setStreamName("rgb")
-    cam_rgb.preview.link(xout_rgb.input)
+STATE_NAMES = {
+    STATE_LINE_FOLLOWING: "LINE_FOLLOWING",
+    STATE_COLOR_DETECTED: "COLOR_DETECTED",
+    STATE_COLOR_DISAPPEARED: "COLOR_DISAPPEARED",
+    STATE_PARKED: "PARKED",
+}
+
+def perform_line_following(vesc, motion_data, recorder=None, device=None, controller=None,
+                           clock=time.monotonic, sleep=time.sleep, probe=None, profiler=None,
+                           telemetry=None, live_telemetry=None, debug_stream=None, vision=None, qos=None):
+    """
+    Follow the yellow line, perform U-turns at the endpoints and park when a
+    color search is active.
+
+    Args:
+        vesc: VESC used for steering and RPM commands.
+        motion_data (list): U-turn motion data.
+        recorder (RunRecorder): Optional run recorder. Frames and state
+            transitions are recorded; commands are recorded when vesc is a RecordingVESC.
+        device: Frame source with getOutputQueue("rgb"), by default the OAK-D Lite.
+        controller (Controller): Source of pause and color search input, by default the gamepad.
+        clock (callable): Monotonic time source in seconds.
+        sleep (callable): Sleep function matching clock.
+        probe (LatencyProbe): Optional probe measuring frame capture to command latency.
+        profiler (StageProfiler): Per-stage timing, by default enabled by PROFILE_STAGES
+            (and recording spans when tracing is enabled).
+        telemetry (TelemetryWriter): Optional per-frame binary telemetry, including stage
+            timings when the profiler is enabled.
+        live_telemetry (LiveTelemetry): Optional shared memory publisher of the same per-frame state.
+        debug_stream (DebugStream): Optional debug view. Overlays are only collected while a viewer
+            is connected and a frame is due; rendering and encoding run on its own thread.
+        vision (VisionBackend): Implementation of the vision stages, by default the one
+            chosen with vision_backends.select_backend() (the OpenCV reference if none was).
+        qos (QosGovernor): Processing quality governor, by default enabled by QOS.
+    """
+    if controller is None:
+        controller = get_controller()
+    if vision is None:
+        vision = get_backend()
+    if qos is None:
+        qos = QosGovernor(enabled=cv.QOS, logger=logger, clock=clock)
+    if device is None:
+        import depthai as dai
+        from camera import create_camera_pipeline
+        device_context = dai.Device(create_camera_pipeline())
+    else:
+        device_context = contextlib.nullcontext(device)
+    if probe is not None:
+        vesc = probe.wrap_vesc(vesc)
+    if profiler is None:
+        tracer = tracing.get_tracer() if tracing.get_tracer().enabled else None
+        profiler = StageProfiler(enabled=cv.PROFILE_STAGES or tracer is not None,
+                                 summary_interval=cv.PROFILE_SUMMARY_INTERVAL if cv.PROFILE_STAGES else None,
+                                 logger=logger, tracer=tracer)
+    vesc = profiler.wrap_vesc(vesc)
+    sinks = [sink for sink in (telemetry, live_telemetry) if sink is not None]
+    for sink in sinks:
+        vesc = sink.wrap_vesc(vesc)
+    stage = profiler.stage
+    profile_capture = ProfileCapture(cv.PROFILE_CAPTURE_DIR, cv.PROFILE_CAPTURE_TOP_N, logger)
+    hot_log = ThrottledLog(logger, clock=clock)  # Messages repeated every frame
 
     LINE_LOST_THRESHOLD = 3
     line_lost_frames = 0
@@ -51,8 +109,17 @@ def perform_line_following(vesc, motion_data):
     pause_start_time = 0
     side_detected = None
     robot_state = STATE_LINE_FOLLOWING
+    recorded_state = None
+
+    # Per-iteration values for telemetry
+    iteration = 0
+    desired_color = None
+    cx = None
+    offset = None
 
-    with dai.Device(pipeline) as device:
+    with device_context as device:
+        if recorder is not None:
+            device = RecordingDevice(device, recorder)
         logger.info("Connected to OAK-D Lite. Starting line-following with endpoint detection.")
         print("Connected to OAK-D Lite Device. Starting line-following")
         print("Select Y on remote to pause and resume motion")
@@ -60,9 +127,29 @@ def perform_line_following(vesc, motion_data):
         rgb_queue = device.getOutputQueue(name="rgb", maxSize=4, blocking=False)
 
         while True:
+            profiler.tick()
+            qos.tick()
+            profile_capture.poll(controller.profile_requested)
+            hot_log.flush_due()
+            # Calibration for this iteration; a reload swaps in a new one between iterations
+            calib = calibration.current()
+            if sinks:
+                # Record what the previous iteration did
+                now = clock()
+                for sink in sinks:
+                    sink.record(now, iteration, robot_state, motion_paused, in_pause, desired_color,
+                                side_detected, cx, line_lost_frames, offset, profiler.last)
+                profiler.last.clear()
+                iteration += 1
+                cx = offset = None
             try:
+                if recorder is not None and (robot_state, motion_paused, in_pause) != recorded_state:
+                    recorded_state = (robot_state, motion_paused, in_pause)
+                    recorder.record_state(STATE_NAMES[robot_state], paused=motion_paused,
+                                          in_pause=in_pause, side=side_detected)
+
                 prev_motion_paused = motion_paused
-                current_motion_paused = is_motion_paused()
+                current_motion_paused = controller.get_motion_paused()
 
                 # Check if Y (motion_paused toggle) was pressed
                 if current_motion_paused != motion_paused:
@@ -82,11 +169,11 @@ def perform_line_following(vesc, motion_data):
                             print(f"Executing {side_detected} Parking...")
                             logger.info(f"Executing {side_detected} Parking...")
                             if side_detected == "Left":
-                                execute_left_parking(vesc)
+                                execute_left_parking(vesc, clock=clock, sleep=sleep)
                             else:
-                                execute_right_parking(vesc)
+                                execute_right_parking(vesc, clock=clock, sleep=sleep)
                             # After parking done, pause again for exit step
-                            set_motion_paused(True)
+                            controller.set_motion_paused(True)
                             robot_state = STATE_PARKED
                             print("Parking done, press Y again to execute exit.")
                             logger.info("Parking done, press Y again to execute exit.")
@@ -95,15 +182,15 @@ def perform_line_following(vesc, motion_data):
                             print(f"Executing {side_detected} Exit...")
                             logger.info(f"Executing {side_detected} Exit...")
                             if side_detected == "Left":
-                                execute_left_exit(vesc)
+                                execute_left_exit(vesc, clock=clock, sleep=sleep)
                             else:
-                                execute_right_exit(vesc)
+                                execute_right_exit(vesc, clock=clock, sleep=sleep)
                             # After exit done, clear color and resume line-following
-                            clear_color_to_search()
+                            controller.clear_color_to_search()
                             side_detected = None
                             color_detected = False
                             robot_state = STATE_LINE_FOLLOWING
-                            set_motion_paused(False)
+                            controller.set_motion_paused(False)
                             print("Exit done, resuming normal line-following.")
                             logger.info("Exit done, resuming normal line-following.")
 
@@ -112,30 +199,30 @@ def perform_line_following(vesc, motion_data):
                     vesc.set_servo(cv.STEERING_NEUTRAL)
                     vesc.set_rpm(0)
                     # Robot is paused, no line-following or color logic
-                    time.sleep(0.01)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        logger.info("Received 'q' keypress. Exiting line-following loop.")
-                        break
+                    with stage("sleep"):
+                        sleep(0.01)
                     continue
 
                 # If we are here, motion_paused is False, proceed with logic
-                desired_color = get_color_to_search()
+                desired_color = controller.get_color_to_search()
                 color_search_active = (desired_color is not None)
 
                 if color_search_active:
-                    if robot_state == STATE_LINE_FOLLOWING and not color_detected and not in_pause:
+                    spot_due = qos.spot_due()
+                    if robot_state == STATE_LINE_FOLLOWING and not color_detected and not in_pause and spot_due:
                         # Try to detect color
-                        detected_flag, side = detect_color_in_boxes(desired_color, device)
+                        with stage("spot_detection"):
+                            detected_flag, side = vision.detect_color_in_boxes(desired_color, device, calib)
                         if detected_flag:
                             print(f"Detected {desired_color.capitalize()} spot on {side} side. Stopping motion.")
                             logger.info(f"Detected {desired_color.capitalize()} spot on {side} side. Stopping motion.")
                             vesc.set_servo(cv.STEERING_NEUTRAL)
                             vesc.set_rpm(0)
                             in_pause = True
-                            pause_start_time = time.time()
+                            pause_start_time = clock()
                             side_detected = side
 
-                    if in_pause and (time.time() - pause_start_time >= 2.5):
+                    if in_pause and (clock() - pause_start_time >= 2.5):
                         # Resume line-following after 2.5s pause
                         print("Resuming line-following after pause.")
                         logger.info("Resuming line-following after pause.")
@@ -146,7 +233,7 @@ def perform_line_following(vesc, motion_data):
                         robot_state = STATE_COLOR_DETECTED
 
 
-                    if robot_state == STATE_COLOR_DETECTED and color_detected:
+                    if robot_state == STATE_COLOR_DETECTED and color_detected and spot_due:
                         # Check if color still present
                         """
                          if not is_color_present_in_row(desired_color, device, row=1):
@@ -158,8 +245,9 @@ def perform_line_following(vesc, motion_data):
                             robot_state = STATE_COLOR_DISAPPEARED
                         """
                         # Check if the color is only visible in the bottom row
-                        color_in_top = is_color_present_in_row(desired_color, device, row=1)
-                        color_in_bottom = is_color_present_in_row(desired_color, device, row=3)
+                        with stage("spot_detection"):
+                            color_in_top = vision.is_color_present_in_row(desired_color, device, row=1, calib=calib)
+                            color_in_bottom = vision.is_color_present_in_row(desired_color, device, row=3, calib=calib)
 
                         # Stop when color is ONLY in bottom row (visible in bottom, not in top)
                         if color_in_bottom and not color_in_top:
@@ -167,67 +255,90 @@ def perform_line_following(vesc, motion_data):
                             logger.info(f"Color {desired_color.capitalize()} now only visible in bottom row (row=3). Pausing indefinitely.")
                             vesc.set_servo(cv.STEERING_NEUTRAL)
                             vesc.set_rpm(0)
-                            set_motion_paused(True)
+                            controller.set_motion_paused(True)
                             robot_state = STATE_COLOR_DISAPPEARED
 
                             # Parking and exit steps will occur on Y presses
 
                 # Normal line-following if STATE_LINE_FOLLOWING or STATE_COLOR_DETECTED and not paused or in_pause
                 if not in_pause and robot_state in [STATE_LINE_FOLLOWING, STATE_COLOR_DETECTED]:
-                    in_frame = rgb_queue.get()
-                    frame = in_frame.getCvFrame()
-                    cropped_frame = crop_frame(frame, cv.LINES["horizontal_y_percent"])
-                    yellow_mask = filter_yellow_line(cropped_frame)
+                    with stage("frame_wait"):
+                        in_frame = rgb_queue.get()
+                        frame = in_frame.getCvFrame()
+                    qos.frame_taken(frame_capture_time(in_frame))
+                    if probe is not None:
+                        probe.frame_taken(frame_capture_time(in_frame))
+                    with stage("crop"):
+                        cropped_frame = crop_frame(frame, calib.lines["horizontal_y_percent"])
+                        # Rows and resolution processed at the current QoS level
+                        region, region_top, decimation = qos.region(cropped_frame)
+                    with stage("yellow_filter"):
+                        yellow_mask = vision.filter_yellow_line(region, calib, close=qos.morphology)
+
+                    # Overlays for the debug view, in mask coordinates
+                    overlays = [] if debug_stream is not None and debug_stream.wants_frame() else None
 
                     # Check endpoint
-                    if detect_endpoint(yellow_mask, cv.LINES, debug_frame=cropped_frame):
+                    with stage("endpoint"):
+                        endpoint_detected = vision.detect_endpoint(yellow_mask, calib.lines, overlays=overlays)
+                    if endpoint_detected:
                         logger.info("🚨 Endpoint detected. Performing U-turn...")
                         print("Starting U-turn execution...")
-                        execute_u_turn(vesc, motion_data)
+                        execute_u_turn(vesc, motion_data, clock=clock, sleep=sleep)
                         print("U-turn completed.")
+                        qos.discard()
                         continue
 
-                    cx = get_line_position(yellow_mask)
+                    with stage("centroid"):
+                        cx = vision.get_line_position(yellow_mask)
                     if cx is not None:
+                        cx *= decimation  # Cropped frame coordinates
                         line_lost_frames = 0
-                        offset = calculate_steering_offset(cx, cropped_frame.shape[1], cv.VERTICAL_CENTERLINE)
+                        offset = calculate_steering_offset(cx, cropped_frame.shape[1], calib.vertical_centerline)
                         steering = cv.STEERING_NEUTRAL + offset * (cv.STEERING_RIGHT_MAX - cv.STEERING_NEUTRAL)
                         steering = np.clip(steering, cv.STEERING_LEFT_MAX, cv.STEERING_RIGHT_MAX)
 
                         if not following_line_logged:
-                            logger.info("Following line.")
-                            print("Following line")
+                            with stage("logging"):
+                                logger.info("Following line.")
+                                print("Following line")
                             following_line_logged = True
                         vesc.set_servo(steering)
                         vesc.set_rpm(cv.FORWARD_RPM_MIN)
                     else:
                         line_lost_frames += 1
-                        logger.warning(f"Line lost. Consecutive lost frames: {line_lost_frames}")
+                        with stage("logging"):
+                            hot_log.log("line_lost", logging.WARNING,
+                                        "Line lost. Consecutive lost frames: %d", line_lost_frames)
                         if line_lost_frames > LINE_LOST_THRESHOLD:
-                            logger.warning("Line lost beyond threshold. Stopping motor.")
-                            print("Line lost beyond threshold. Stopping motor.")
+                            with stage("logging"):
+                                hot_log.log("line_lost_stop", logging.WARNING,
+                                            "Line lost beyond threshold. Stopping motor.", console=True)
                             vesc.set_servo(cv.STEERING_NEUTRAL)
                             vesc.set_rpm(0)
                         else:
-                            logger.info("Line lost briefly. Reducing RPM to half speed.")
-                            print("Line lost briefly. Reducing RPM to half speed.")
+                            with stage("logging"):
+                                hot_log.log("line_lost_slow", logging.INFO,
+                                            "Line lost briefly. Reducing RPM to half speed.", console=True)
                             vesc.set_servo(cv.STEERING_NEUTRAL)
                             vesc.set_rpm(int(cv.FORWARD_RPM_MIN * 0.5))
 
-                    if cv.DISPLAY_COLOR_MASK and color_search_active:
-                        color_hsv = cv.HSV_VALUES.get(desired_color)
-                        if color_hsv:
-                            hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-                            lower = np.array([color_hsv["LOW_H"], color_hsv["LOW_S"], color_hsv["LOW_V"]])
-                            upper = np.array([color_hsv["HIGH_H"], color_hsv["HIGH_S"], color_hsv["HIGH_V"]])
-                            mask = cv2.inRange(hsv_frame, lower, upper)
-                            cv2.imshow("Color Mask", mask)
+                    if overlays is not None:
+                        crop_height = cropped_frame.shape[0]
+                        # Mask overlays into cropped frame coordinates
+                        overlays = [("offset", (0, region_top), [("scale", decimation, overlays)])]
+                        if cx is not None:
+                            overlays.append(("line", (cx, 0), (cx, crop_height), (0, 0, 255), 2))
+                        debug_stream.submit(frame, [("offset", (0, frame.shape[0] - crop_height), overlays),
+                                                    ("text", (10, 20), STATE_NAMES[robot_state], (255, 255, 255))],
+                                            mask_color=desired_color)
 
-                time.sleep(0.01)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    logger.info("Received 'q' keypress. Exiting line-following loop.")
-                    break
+                with stage("sleep"):
+                    sleep(0.01)
 
+            except FrameSourceExhausted:
+                logger.info("Frame source exhausted. Exiting line-following loop.")
+                break
             except KeyboardInterrupt:
                 logger.info("KeyboardInterrupt detected. Shutting down line-following.")
                 break
@@ -235,3 +346,8 @@ def perform_line_following(vesc, motion_data):
                 logger.error(f"Exception in line-following loop: {e}")
                 break
 
+
+        profile_capture.stop()
+        hot_log.flush()
+        if profiler.summary_interval is not None:
+            profiler.log_summary()
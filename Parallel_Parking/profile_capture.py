@@ -0,0 +1,81 @@
+# profile_capture.py
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+
+
+class ProfileCapture:
+    """
+    cProfile session on the line-following loop, started and stopped from
+    the gamepad.
+
+    cProfile only sees the thread that enables it, so the controller thread
+    just flips a flag and the loop calls poll() once per iteration, which
+    compares two booleans until the flag changes. On stop the profile is
+    written to a timestamped .prof file (open with snakeviz or pstats) and
+    the top functions by cumulative time are logged, off the loop thread.
+    """
+    def __init__(self, output_dir="profiles", top_n=25, logger=None):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.logger = logger or logging.getLogger('LineFollowing')
+        self._profile = None
+        self._started = None
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def poll(self, requested):
+        """Start or stop the session so that it is active exactly when requested is True."""
+        if requested == (self._profile is not None):
+            return
+        if requested:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self):
+        self._profile = cProfile.Profile()
+        self._started = time.time()
+        self.logger.info("Profile capture started.")
+        print("Profile capture started.")
+        self._profile.enable()
+
+    def stop(self):
+        """
+        Stop the session and return the path the profile is written to. Writing
+        and summarizing take a while, so they run on a separate thread; it is
+        not a daemon, so a capture stopped at exit still gets written.
+        """
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        profile, self._profile = self._profile, None
+
+        path = os.path.join(self.output_dir,
+                            time.strftime("profile_%Y%m%d_%H%M%S.prof", time.localtime(self._started)))
+        duration = time.time() - self._started
+        threading.Thread(target=self._write, args=(profile, path, duration), name="ProfileWriter").start()
+        return path
+
+    def _write(self, profile, path, duration):
+        """Write the profile to path and log the top functions."""
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profile.dump_stats(path)
+
+            summary = io.StringIO()
+            stats = pstats.Stats(profile, stream=summary)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        except Exception as e:
+            self.logger.error(f"Failed to write profile capture to {path}: {e}")
+            return
+        self.logger.info(f"Profile capture of {duration:.1f} s written to {path}. "
+                         f"Top {self.top_n} by cumulative time:\n{summary.getvalue()}")
+        print(f"Profile capture written to {path}")
@@ -0,0 +1,144 @@
+# qos.py
+
+import time
+import cv2
+import control_vals as cv
+
+
+def describe(settings):
+    """Short text of a quality level's settings for the log."""
+    return (f"ROI {settings['roi'] * 100:.0f}%, decimation {settings['decimation']}, "
+            f"morphology {'on' if settings['morphology'] else 'off'}, spot detection every {settings['spot_interval']}")
+
+
+class QosGovernor:
+    """
+    Steps the processing quality of the line-following loop down when it
+    cannot keep up with the camera and back up when it has headroom again.
+
+    Per frame it compares the loop's work time (frame taken to the next
+    iteration, excluding maneuvers) and the frame age (capture to frame
+    taken) with their targets. Quality drops one level after down_frames
+    consecutive frames over a target, and rises one level after up_frames
+    consecutive frames below up_margin times both targets, so short spikes
+    do not make it oscillate. Levels are dicts of QOS_LEVELS, level 0 being
+    full quality:
+        roi (float): Fraction of the cropped frame's rows processed, taken from the bottom.
+        decimation (int): Every Nth row and column is processed.
+        morphology (bool): Close the yellow mask.
+        spot_interval (int): Spot detection runs on every Nth frame.
+    While disabled it stays on level 0.
+    """
+    def __init__(self, enabled=True, levels=None, loop_target_ms=None, frame_age_target_ms=None,
+                 down_frames=None, up_frames=None, up_margin=None, logger=None, clock=time.monotonic):
+        """
+        Args:
+            enabled (bool): Change levels; otherwise level 0 is kept.
+            levels (list): Quality levels, defaults to QOS_LEVELS.
+            loop_target_ms (float): Work time target per frame, defaults to QOS_LOOP_TARGET_MS.
+            frame_age_target_ms (float): Frame age target, defaults to QOS_FRAME_AGE_TARGET_MS.
+            down_frames (int): Frames over target before stepping down, defaults to QOS_DOWN_FRAMES.
+            up_frames (int): Frames with headroom before stepping up, defaults to QOS_UP_FRAMES.
+            up_margin (float): Fraction of the targets counted as headroom, defaults to QOS_UP_MARGIN.
+            logger (logging.Logger): Logger for level changes.
+            clock (callable): Time source in seconds; frame ages need the host monotonic clock.
+        """
+        self.enabled = enabled
+        self.levels = levels or cv.QOS_LEVELS
+        self.loop_target = (loop_target_ms if loop_target_ms is not None else cv.QOS_LOOP_TARGET_MS) / 1000
+        self.frame_age_target = (frame_age_target_ms if frame_age_target_ms is not None
+                                 else cv.QOS_FRAME_AGE_TARGET_MS) / 1000
+        self.down_frames = down_frames if down_frames is not None else cv.QOS_DOWN_FRAMES
+        self.up_frames = up_frames if up_frames is not None else cv.QOS_UP_FRAMES
+        self.up_margin = up_margin if up_margin is not None else cv.QOS_UP_MARGIN
+        self.logger = logger
+        self._clock = clock
+
+        self.level = 0
+        self.settings = self.levels[0]
+        self.changes = 0
+        self._frame_taken = None
+        self._frame_age = None
+        self._over = 0
+        self._under = 0
+        self._spot_count = 0
+
+    def frame_taken(self, capture_time=None):
+        """
+        Call when the loop got a frame.
+
+        Args:
+            capture_time (float): Host monotonic capture time (latency_probe.frame_capture_time), if known.
+        """
+        now = self._clock()
+        self._frame_taken = now
+        self._frame_age = now - capture_time if capture_time is not None else None
+
+    def discard(self):
+        """Do not count the current iteration, e.g. after a U-turn ran inside it."""
+        self._frame_taken = None
+
+    def tick(self):
+        """Call once at the start of each loop iteration; evaluates the previous one."""
+        if self._frame_taken is None:
+            return
+        work = self._clock() - self._frame_taken
+        age = self._frame_age
+        self._frame_taken = None
+        if not self.enabled:
+            return
+
+        if work > self.loop_target or (age is not None and age > self.frame_age_target):
+            self._over += 1
+            self._under = 0
+            if self._over >= self.down_frames and self.level < len(self.levels) - 1:
+                reason = (f"loop work {work * 1000:.1f} ms (target {self.loop_target * 1000:.0f} ms)"
+                          if work > self.loop_target else
+                          f"frame age {age * 1000:.1f} ms (target {self.frame_age_target * 1000:.0f} ms)")
+                self._set_level(self.level + 1, f"{reason} for {self._over} frames")
+        elif work < self.loop_target * self.up_margin and \
+                (age is None or age < self.frame_age_target * self.up_margin):
+            self._under += 1
+            self._over = 0
+            if self._under >= self.up_frames and self.level > 0:
+                self._set_level(self.level - 1, f"headroom for {self._under} frames "
+                                                f"(loop work {work * 1000:.1f} ms)")
+        else:
+            self._over = self._under = 0
+
+    def _set_level(self, level, reason):
+        direction = "down" if level > self.level else "up"
+        message = f"QoS {direction} to level {level}: {describe(self.levels[level])}; {reason}"
+        self.level = level
+        self.settings = self.levels[level]
+        self.changes += 1
+        self._over = self._under = 0
+        if self.logger is not None:
+            self.logger.info(message)
+        print(message)
+
+    @property
+    def morphology(self):
+        return self.settings["morphology"]
+
+    def spot_due(self):
+        """True if spot detection should run this frame. Call once per frame with a color search active."""
+        due = self._spot_count % self.settings["spot_interval"] == 0
+        self._spot_count += 1
+        return due
+
+    def region(self, cropped_frame):
+        """
+        The part of the cropped frame processed at the current level.
+
+        Returns:
+            tuple: (image, top, decimation): image to threshold, its first row
+            in the cropped frame and the factor its coordinates are scaled down by.
+        """
+        height = cropped_frame.shape[0]
+        top = height - max(1, int(height * self.settings["roi"]))
+        image = cropped_frame[top:] if top else cropped_frame
+        decimation = self.settings["decimation"]
+        if decimation > 1:
+            image = cv2.resize(image, None, fx=1 / decimation, fy=1 / decimation, interpolation=cv2.INTER_NEAREST)
+        return image, top, decimation
@@ -0,0 +1,216 @@
+# replay_run.py
+
+import argparse
+import csv
+import os
+import time
+import control_vals as cv
+from fake_vesc import FakeVESC, VirtualClock
+from run_recorder import (RunReader, RecordingVESC, decode_frame, STREAM_FRAME, STREAM_EVENT,
+                          COMMAND_SERVO)
+from controller_input import Controller
+from perform_line_following import perform_line_following, FrameSourceExhausted
+from motions.U_Turn import load_u_turn_data
+
+# Virtual seconds the loop may keep running (e.g. paused) after the last recorded frame
+END_GRACE = 1.0
+
+
+class ReplayFrame:
+    """Minimal stand-in for dai.ImgFrame holding a decoded recorded frame."""
+    def __init__(self, frame, seq, timestamp):
+        self._frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+
+    def getCvFrame(self):
+        return self._frame
+
+
+class ReplayDevice:
+    """
+    Stand-in for dai.Device that returns the frames of a recorded run in the
+    order they were consumed live. Each frame advances the virtual clock to
+    the time it was originally taken from the camera queue.
+    """
+    def __init__(self, reader, clock):
+        self._frames = reader.records(start=reader.start_time, streams={STREAM_FRAME})
+        self._clock = clock
+        self.frames_replayed = 0
+
+    def getOutputQueue(self, *args, **kwargs):
+        return self
+
+    def get(self):
+        record = next(self._frames, None)
+        if record is None:
+            raise FrameSourceExhausted()
+        seq, _, jpeg = record.data
+        self._clock.advance_to(record.timestamp)
+        self.frames_replayed += 1
+        return ReplayFrame(decode_frame(jpeg), seq, record.timestamp)
+
+
+class ReplayController(Controller):
+    """Controller driven by the recorded gamepad events as the virtual clock reaches them."""
+    def __init__(self, events, clock):
+        super().__init__(start=False, clock=clock.now)
+        self._events = list(events)
+        self._next_event = 0
+        self._virtual_clock = clock
+
+    def _apply_events(self):
+        now = self._virtual_clock.now()
+        while self._next_event < len(self._events) and self._events[self._next_event].timestamp <= now:
+            event = self._events[self._next_event].data
+            self.handle_event(event["code"], event["state"])
+            self._next_event += 1
+
+    def get_motion_paused(self):
+        self._apply_events()
+        return super().get_motion_paused()
+
+    def get_color_to_search(self):
+        self._apply_events()
+        return super().get_color_to_search()
+
+
+class ReplayTrace:
+    """
+    Collects the commands and state transitions produced during a replay,
+    numbered by the frame they followed. Implements the RunRecorder methods
+    that perform_line_following and RecordingVESC call.
+    """
+    def __init__(self, clock, start_time):
+        self._clock = clock
+        self._start_time = start_time
+        self.frame = 0
+        self.rows = []
+        self.frame_times = []
+        self._last_frame_wall = None
+
+    def _add(self, kind, value):
+        self.rows.append((self.frame, round(self._clock.now() - self._start_time, 6), kind, value))
+
+    def record_frame(self, frame, capture_ts=None):
+        now = time.perf_counter()
+        if self._last_frame_wall is not None:
+            self.frame_times.append(now - self._last_frame_wall)
+        self._last_frame_wall = now
+        self.frame += 1
+        self._add("frame", self.frame)
+
+    def record_command(self, kind, value):
+        self._add("servo" if kind == COMMAND_SERVO else "rpm", round(float(value), 6))
+
+    def record_state(self, state, **details):
+        self._add("state", " ".join([state] + [f"{key}={details[key]}" for key in sorted(details)]))
+
+    def save(self, path):
+        with open(path, mode="w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Frame", "Time", "Kind", "Value"])
+            writer.writerows(self.rows)
+
+
+def replay_run(run_file, u_turn_file):
+    """
+    Run a recorded run through perform_line_following with a fake VESC and
+    a virtual clock, as fast as the CPU allows.
+
+    Returns:
+        tuple: (ReplayTrace, wall-clock seconds taken).
+    """
+    reader = RunReader(run_file)
+    clock = VirtualClock(reader.start_time)
+    end_time = reader.end_time + END_GRACE
+
+    def sleep(seconds):
+        clock.sleep(seconds)
+        if clock.now() > end_time:
+            raise FrameSourceExhausted()
+
+    events = list(reader.records(start=reader.start_time, streams={STREAM_EVENT}))
+    device = ReplayDevice(reader, clock)
+    controller = ReplayController(events, clock)
+    trace = ReplayTrace(clock, reader.start_time)
+    vesc = RecordingVESC(FakeVESC(time_source=clock.now), trace)
+    motion_data = load_u_turn_data(u_turn_file)
+
+    start = time.perf_counter()
+    try:
+        perform_line_following(vesc, motion_data, recorder=trace, device=device, controller=controller,
+                               clock=clock.now, sleep=sleep)
+    finally:
+        reader.close()
+    return trace, time.perf_counter() - start
+
+
+def load_trace(path):
+    """Group a saved trace into {frame: [(kind, value), ...]}."""
+    frames = {}
+    with open(path, mode="r") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)  # Skip the header row
+        for frame, _, kind, value in reader:
+            if kind != "frame":
+                frames.setdefault(int(frame), []).append((kind, value))
+    return frames
+
+
+def diff_traces(path_a, path_b, limit=20):
+    """Print the frames where two traces sent different commands or changed state differently."""
+    a = load_trace(path_a)
+    b = load_trace(path_b)
+    differing = [f for f in sorted(set(a) | set(b)) if a.get(f) != b.get(f)]
+    print(f"{len(differing)} of {len(set(a) | set(b))} frames differ.")
+    for frame in differing[:limit]:
+        print(f"frame {frame}:")
+        print(f"  {path_a}: {a.get(frame, [])}")
+        print(f"  {path_b}: {b.get(frame, [])}")
+    return len(differing)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded run through perform_line_following with a fake VESC and virtual clock.")
+    parser.add_argument("run", nargs="?", help="Run file written by run_recorder.py.")
+    parser.add_argument("--trace", default=None, help="CSV file to save the command and state trace to.")
+    parser.add_argument("--recordings_dir", default=None,
+                        help="Directory with the maneuver recordings (default RECORDINGS_DIR, "
+                             "or recordings/ next to this script if that does not exist).")
+    parser.add_argument("--diff", nargs=2, metavar=("TRACE_A", "TRACE_B"), help="Compare two saved traces.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.diff:
+        diff_traces(*args.diff)
+        return
+    if not args.run:
+        print("Usage: python3 replay_run.py <run file> [--trace out.csv] | --diff A.csv B.csv")
+        exit(1)
+
+    if args.recordings_dir:
+        cv.RECORDINGS_DIR = args.recordings_dir
+    elif not os.path.isdir(cv.RECORDINGS_DIR):
+        cv.RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+    trace, elapsed = replay_run(args.run, os.path.join(cv.RECORDINGS_DIR, "U_Turn.csv"))
+
+    frame_times = sorted(trace.frame_times)
+    print(f"Replayed {trace.frame} frames in {elapsed:.2f} s ({trace.frame / max(elapsed, 1e-9):.1f} frames/s).")
+    if frame_times:
+        mean = sum(frame_times) / len(frame_times)
+        p95 = frame_times[int(0.95 * (len(frame_times) - 1))]
+        print(f"Per-frame loop time: mean {mean * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms.")
+    states = [row for row in trace.rows if row[2] == "state"]
+    print(f"{len(trace.rows) - len(states) - trace.frame} commands, {len(states)} state transitions.")
+    if args.trace:
+        trace.save(args.trace)
+        print(f"Trace saved to {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+# run_recorder.py
+
+import bisect
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+logger = logging.getLogger('RunRecorder')
+
+# Record streams
+STREAM_FRAME = 0      # JPEG camera frame
+STREAM_COMMAND = 1    # set_servo / set_rpm sent to the VESC
+STREAM_EVENT = 2      # Gamepad button event
+STREAM_STATE = 3      # Line-following state transition
+STREAM_NAMES = {STREAM_FRAME: "frame", STREAM_COMMAND: "command", STREAM_EVENT: "event", STREAM_STATE: "state"}
+
+COMMAND_SERVO = 0
+COMMAND_RPM = 1
+
+# File layout:
+#   MAGIC, u32 header length, JSON header
+#   chunks: CHUNK_HEADER (tag, record count, first ts, last ts, payload bytes) + records
+#   each record: RECORD_HEADER (stream, ts, payload bytes) + payload
+#   JSON chunk index, then FOOTER (index offset, tag)
+# A run that was not closed cleanly has no footer; the reader rebuilds the index by scanning chunks.
+MAGIC = b"PPRUN01\n"
+CHUNK_TAG = b"CHNK"
+FOOTER_TAG = b"PPRUNIDX"
+HEADER_LENGTH = struct.Struct("<I")
+CHUNK_HEADER = struct.Struct("<4sIddI")
+RECORD_HEADER = struct.Struct("<BdI")
+FOOTER = struct.Struct("<Q8s")
+FRAME_HEADER = struct.Struct("<Id")    # frame seq, capture timestamp
+COMMAND_PAYLOAD = struct.Struct("<Bd") # command kind, value
+
+RunRecord = namedtuple("RunRecord", ["stream", "timestamp", "data"])
+
+
+class RunRecorder:
+    """
+    Records camera frames, VESC commands, gamepad events and state transitions
+    of one run into a single chunked, indexed file on a shared monotonic clock.
+
+    The control loop only timestamps and enqueues records. Frames are
+    JPEG-encoded on a small thread pool and all records are written by one
+    background thread. Pending frames and total size are bounded; frames that
+    would exceed either are dropped and counted. Overhead is measured and
+    reported by stats().
+    """
+    def __init__(self, path, jpeg_quality=80, frame_interval=1, encode_workers=1,
+                 max_pending_frames=4, chunk_records=256, max_bytes=None):
+        """
+        Args:
+            path (str): Output file.
+            jpeg_quality (int): JPEG quality for frames.
+            frame_interval (int): Record every Nth frame.
+            encode_workers (int): Threads encoding frames.
+            max_pending_frames (int): Frames allowed to wait for encoding before new ones are dropped.
+            chunk_records (int): Records per chunk (the seek granularity).
+            max_bytes (int): Stop recording frames once the file reaches this size, None for no limit.
+        """
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self.frame_interval = max(1, frame_interval)
+        self.max_pending_frames = max_pending_frames
+        self.chunk_records = chunk_records
+        self.max_bytes = max_bytes
+
+        self.counts = {name: 0 for name in STREAM_NAMES.values()}
+        self.frames_seen = 0
+        self.frames_dropped = 0
+        self.bytes_written = 0
+        self._loop_time = 0.0       # Seconds spent in record_* on the caller's thread
+        self._loop_calls = 0
+        self._encode_cpu = 0.0      # CPU seconds spent encoding frames
+        self._writer_cpu = 0.0      # CPU seconds spent by the writer thread
+        self._stats_lock = threading.Lock()
+        self._pending_frames = 0
+        self._frame_seq = 0
+        self._closed = False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "wb")
+        header = json.dumps({
+            "version": 1,
+            "wall_time": time.time(),
+            "monotonic_time": time.monotonic(),
+            "streams": STREAM_NAMES,
+        }).encode()
+        self._file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        self.bytes_written = self._file.tell()
+        self._start_time = time.monotonic()
+
+        self._index = []
+        self._chunk = []
+        self._chunk_bytes = 0
+        self._queue = queue.Queue()
+        self._encoder = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="RunRecorderEncode")
+        self._writer = threading.Thread(target=self._write_loop, name="RunRecorderWriter", daemon=True)
+        self._writer.start()
+        logger.info(f"Recording run to {path}.")
+
+    # ---- Recording (called from the control loop and controller thread) ----
+
+    def record_frame(self, frame, capture_ts=None):
+        """Queue a BGR frame for encoding. The frame is copied, so the caller may modify it afterwards."""
+        start = time.perf_counter()
+        timestamp = time.monotonic()
+        self.frames_seen += 1
+        if (self.frames_seen - 1) % self.frame_interval == 0:
+            with self._stats_lock:
+                over_size = self.max_bytes is not None and self.bytes_written >= self.max_bytes
+                accept = not self._closed and not over_size and self._pending_frames < self.max_pending_frames
+                if accept:
+                    self._pending_frames += 1
+            if accept:
+                seq = self._frame_seq
+                self._frame_seq += 1
+                future = self._encoder.submit(self._encode, frame.copy(), seq,
+                                              capture_ts if capture_ts is not None else timestamp)
+                self._queue.put((STREAM_FRAME, timestamp, future))
+            else:
+                with self._stats_lock:
+                    self.frames_dropped += 1
+        self._account(start)
+
+    def record_command(self, kind, value):
+        """Record a set_servo (COMMAND_SERVO) or set_rpm (COMMAND_RPM) command."""
+        start = time.perf_counter()
+        self._put(STREAM_COMMAND, COMMAND_PAYLOAD.pack(kind, float(value)))
+        self._account(start)
+
+    def record_event(self, code, state):
+        """Record a gamepad event."""
+        start = time.perf_counter()
+        self._put(STREAM_EVENT, json.dumps({"code": code, "state": state}).encode())
+        self._account(start)
+
+    def record_state(self, state, **details):
+        """Record a state transition with optional details."""
+        start = time.perf_counter()
+        self._put(STREAM_STATE, json.dumps(dict(details, state=state)).encode())
+        self._account(start)
+
+    def _put(self, stream, payload):
+        if not self._closed:
+            self._queue.put((stream, time.monotonic(), payload))
+
+    def _account(self, start):
+        with self._stats_lock:
+            self._loop_time += time.perf_counter() - start
+            self._loop_calls += 1
+
+    # ---- Background work ----
+
+    def _encode(self, frame, seq, capture_ts):
+        cpu_start = time.thread_time()
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        with self._stats_lock:
+            self._encode_cpu += time.thread_time() - cpu_start
+        if not ok:
+            return None
+        return FRAME_HEADER.pack(seq, capture_ts) + jpeg.tobytes()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            stream, timestamp, payload = item
+            if stream == STREAM_FRAME:
+                try:
+                    payload = payload.result()
+                except Exception as e:
+                    logger.error(f"Frame encoding failed: {e}")
+                    payload = None
+                with self._stats_lock:
+                    self._pending_frames -= 1
+                    if payload is None:
+                        self.frames_dropped += 1
+                if payload is None:
+                    continue
+
+            cpu_start = time.thread_time()
+            self._chunk.append(RECORD_HEADER.pack(stream, timestamp, len(payload)) + payload)
+            self._chunk_bytes += RECORD_HEADER.size + len(payload)
+            self._chunk_first = timestamp if len(self._chunk) == 1 else self._chunk_first
+            self._chunk_last = timestamp
+            self.counts[STREAM_NAMES[stream]] += 1
+            if len(self._chunk) >= self.chunk_records or self._chunk_bytes >= 4 * 1024 * 1024:
+                self._flush_chunk()
+            self._writer_cpu += time.thread_time() - cpu_start
+        self._flush_chunk()
+
+    def _flush_chunk(self):
+        if not self._chunk:
+            return
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEADER.pack(CHUNK_TAG, len(self._chunk), self._chunk_first,
+                                           self._chunk_last, self._chunk_bytes))
+        self._file.write(b"".join(self._chunk))
+        self._index.append([offset, self._chunk_first, self._chunk_last, len(self._chunk)])
+        with self._stats_lock:
+            self.bytes_written = self._file.tell()
+        self._chunk = []
+        self._chunk_bytes = 0
+
+    # ---- Shutdown and reporting ----
+
+    def stats(self):
+        """Overhead and volume of the recording so far."""
+        elapsed = max(time.monotonic() - self._start_time, 1e-9)
+        with self._stats_lock:
+            return {
+                "elapsed_s": elapsed,
+                "records": dict(self.counts),
+                "frames_seen": self.frames_seen,
+                "frames_dropped": self.frames_dropped,
+                "bytes_written": self.bytes_written,
+                "disk_mb_per_s": self.bytes_written / elapsed / 1e6,
+                "loop_us_per_call": self._loop_time / max(self._loop_calls, 1) * 1e6,
+                "loop_cpu_percent": self._loop_time / elapsed * 100,
+                "encode_cpu_percent": self._encode_cpu / elapsed * 100,
+                "writer_cpu_percent": self._writer_cpu / elapsed * 100,
+            }
+
+    def close(self):
+        """Finish writing, append the chunk index and log the overhead summary."""
+        if self._closed:
+            return
+        self._closed = True
+        self._encoder.shutdown(wait=True)
+        self._queue.put(None)
+        self._writer.join()
+
+        index_offset = self._file.tell()
+        self._file.write(json.dumps(self._index).encode())
+        self._file.write(FOOTER.pack(index_offset, FOOTER_TAG))
+        self._file.close()
+
+        stats = self.stats()
+        summary = (f"Run saved to {self.path}: {stats['records']}, {stats['frames_dropped']} frames dropped, "
+                   f"{stats['bytes_written'] / 1e6:.1f} MB ({stats['disk_mb_per_s']:.2f} MB/s), "
+                   f"loop {stats['loop_us_per_call']:.0f} us/call, "
+                   f"encode {stats['encode_cpu_percent']:.1f}% CPU, writer {stats['writer_cpu_percent']:.1f}% CPU")
+        logger.info(summary)
+        print(summary)
+
+
+class RecordingVESC:
+    """Forwards commands to a VESC and records each one."""
+    def __init__(self, vesc, recorder):
+        self._vesc = vesc
+        self._recorder = recorder
+
+    def set_servo(self, value):
+        self._vesc.set_servo(value)
+        self._recorder.record_command(COMMAND_SERVO, value)
+
+    def set_rpm(self, value):
+        self._vesc.set_rpm(value)
+        self._recorder.record_command(COMMAND_RPM, value)
+
+    def __getattr__(self, name):
+        return getattr(self._vesc, name)
+
+
+class _RecordedFrame:
+    """ImgFrame whose converted image is computed once and shared with the recorder."""
+    def __init__(self, in_frame, frame):
+        self._in_frame = in_frame
+        self._frame = frame
+
+    def getCvFrame(self):
+        return self._frame
+
+    def __getattr__(self, name):
+        return getattr(self._in_frame, name)
+
+
+class _RecordingQueue:
+    def __init__(self, output_queue, recorder):
+        self._queue = output_queue
+        self._recorder = recorder
+
+    def get(self):
+        in_frame = self._queue.get()
+        frame = in_frame.getCvFrame()
+        self._recorder.record_frame(frame)
+        return _RecordedFrame(in_frame, frame)
+
+    def __getattr__(self, name):
+        return getattr(self._queue, name)
+
+
+class RecordingDevice:
+    """Wraps a dai.Device so every frame taken from its output queues is recorded."""
+    def __init__(self, device, recorder):
+        self._device = device
+        self._recorder = recorder
+
+    def getOutputQueue(self, *args, **kwargs):
+        return _RecordingQueue(self._device.getOutputQueue(*args, **kwargs), self._recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._device, name)
+
+
+class RunReader:
+    """Reads a run file written by RunRecorder, with seeking by time."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a run recording.")
+        (length,) = HEADER_LENGTH.unpack(self._file.read(HEADER_LENGTH.size))
+        self.header = json.loads(self._file.read(length))
+        self._data_start = self._file.tell()
+        self.index = self._load_index()
+        self._chunk_ends = [entry[2] for entry in self.index]
+        self._position = 0
+        self._seek_time = None
+
+    def _load_index(self):
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size >= self._data_start + FOOTER.size:
+            self._file.seek(size - FOOTER.size)
+            index_offset, tag = FOOTER.unpack(self._file.read(FOOTER.size))
+            if tag == FOOTER_TAG:
+                self._file.seek(index_offset)
+                return json.loads(self._file.read(size - FOOTER.size - index_offset))
+
+        # No footer: the run was interrupted, rebuild the index from the chunk headers
+        logger.warning(f"{self.path} has no index, scanning chunks.")
+        index = []
+        offset = self._data_start
+        while offset + CHUNK_HEADER.size <= size:
+            self._file.seek(offset)
+            tag, count, first, last, length = CHUNK_HEADER.unpack(self._file.read(CHUNK_HEADER.size))
+            if tag != CHUNK_TAG or offset + CHUNK_HEADER.size + length > size:
+                break
+            index.append([offset, first, last, count])
+            offset += CHUNK_HEADER.size + length
+        return index
+
+    @property
+    def start_time(self):
+        return self.index[0][1] if self.index else 0.0
+
+    @property
+    def end_time(self):
+        return self.index[-1][2] if self.index else 0.0
+
+    def seek(self, timestamp):
+        """Position the reader at the first chunk that may contain records at or after timestamp."""
+        self._position = bisect.bisect_left(self._chunk_ends, timestamp)
+        self._seek_time = timestamp
+
+    def _read_chunk(self, chunk):
+        offset, _, _, count = self.index[chunk]
+        self._file.seek(offset)
+        _, _, _, _, length = CHUNK_HEADER.unpack(self._file.read(CHUNK_HEADER.size))
+        data = self._file.read(length)
+        position = 0
+        for _ in range(count):
+            stream, timestamp, size = RECORD_HEADER.unpack_from(data, position)
+            position += RECORD_HEADER.size
+            yield stream, timestamp, data[position:position + size]
+            position += size
+
+    def records(self, start=None, end=None, streams=None):
+        """
+        Iterate records in time order.
+
+        Args:
+            start (float): First timestamp to return (monotonic seconds), defaults to the last seek().
+            end (float): Stop after this timestamp.
+            streams (set): Stream ids to return, default all.
+
+        Yields:
+            RunRecord: Commands as (kind, value), events and states as dicts,
+            frames as (seq, capture timestamp, JPEG bytes); see decode_frame.
+        """
+        if start is not None:
+            self.seek(start)
+        start = self._seek_time
+        for chunk in range(self._position, len(self.index)):
+            if end is not None and self.index[chunk][1] > end:
+                break
+            for stream, timestamp, payload in self._read_chunk(chunk):
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    return
+                if streams is not None and stream not in streams:
+                    continue
+                yield RunRecord(stream, timestamp, _decode_payload(stream, payload))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _decode_payload(stream, payload):
+    if stream == STREAM_FRAME:
+        seq, capture_ts = FRAME_HEADER.unpack_from(payload)
+        return seq, capture_ts, payload[FRAME_HEADER.size:]
+    if stream == STREAM_COMMAND:
+        return COMMAND_PAYLOAD.unpack(payload)
+    return json.loads(payload)
+
+
+def decode_frame(jpeg):
+    """Decode the JPEG bytes of a frame record into a BGR image."""
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize a run recording or print its records in a time window.")
+    parser.add_argument("run", help="Run file written by RunRecorder.")
+    parser.add_argument("--start", type=float, default=None, help="Seconds from the start of the run.")
+    parser.add_argument("--end", type=float, default=None, help="Seconds from the start of the run.")
+    parser.add_argument("--frames", action="store_true", help="Also list frame records.")
+    args = parser.parse_args()
+
+    with RunReader(args.run) as reader:
+        t0 = reader.start_time
+        print(f"{args.run}: {len(reader.index)} chunks, {reader.end_time - t0:.1f} s")
+        if args.start is None and args.end is None:
+            counts = {name: 0 for name in STREAM_NAMES.values()}
+            for record in reader.records():
+                counts[STREAM_NAMES[record.stream]] += 1
+            print(counts)
+            return
+
+        start = t0 + (args.start or 0.0)
+        end = t0 + args.end if args.end is not None else None
+        for record in reader.records(start=start, end=end):
+            if record.stream == STREAM_FRAME:
+                if args.frames:
+                    print(f"{record.timestamp - t0:9.3f} frame   #{record.data[0]} ({len(record.data[2])} bytes)")
+            elif record.stream == STREAM_COMMAND:
+                kind = "servo" if record.data[0] == COMMAND_SERVO else "rpm"
+                print(f"{record.timestamp - t0:9.3f} command {kind} {record.data[1]:g}")
+            else:
+                print(f"{record.timestamp - t0:9.3f} {STREAM_NAMES[record.stream]:<7} {record.data}")
+
+
+if __name__ == "__main__":
+    main()
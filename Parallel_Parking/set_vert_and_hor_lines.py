@@ -1,26 +1,17 @@
 import cv2
 import depthai as dai
 import control_vals as cv
+from calibration import save_calibration
 
 
 def save_lines_to_control_vals(line1_x_percent, line2_x_percent, horizontal_y_percent):
-    """Save the vertical and horizontal line positions (as percentages) to control_vals.py."""
-    with open("control_vals.py", "r") as file:
-        lines = file.readlines()
-
-    with open("control_vals.py", "w") as file:
-        for line in lines:
-            if line.strip().startswith("LINES"):
-                file.write(
-                    f"LINES = {{'line1_x_percent': {line1_x_percent}, 'line2_x_percent': {line2_x_percent}, "
-                    f"'horizontal_y_percent': {horizontal_y_percent}}}\n"
-                )
-            else:
-                file.write(line)
+    """Save the vertical and horizontal line positions (as percentages) to the calibration file."""
+    save_calibration({"LINES": {"line1_x_percent": line1_x_percent, "line2_x_percent": line2_x_percent,
+                                "horizontal_y_percent": horizontal_y_percent}})
 
 
 def load_saved_values():
-    """Load the last saved values from control_vals.py."""
+    """Load the last saved values (control_vals.py defaults or the calibration file)."""
     try:
         saved_values = cv.LINES
         line1_x_percent = saved_values.get("line1_x_percent", 25)
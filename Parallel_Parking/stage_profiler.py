@@ -0,0 +1,197 @@
+# stage_profiler.py
+
+import bisect
+import contextlib
+import logging
+import threading
+import time
+
+# Histogram bucket upper edges in milliseconds; one more bucket collects everything slower
+BUCKET_EDGES_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 15, 20, 30, 50, 83, 100, 200, 500, 1000)
+
+# Returned by StageProfiler.stage() while disabled, so timing costs one call
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class StageHistogram:
+    """Fixed-bucket latency histogram with count, total and max."""
+    def __init__(self, edges_ms=BUCKET_EDGES_MS):
+        self.edges_ms = tuple(edges_ms)
+        self._edges = [edge / 1000 for edge in self.edges_ms]
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self._edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self._edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge in ms of the bucket holding the q-th percentile (the max for the overflow bucket)."""
+        if not self.count:
+            return None
+        target = q / 100 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return self.edges_ms[i] if i < len(self.edges_ms) else self.max * 1000
+        return self.max * 1000
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": list(self.counts),
+        }
+
+
+class _StageTimer:
+    """Reusable context manager timing one stage into its histograms."""
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self._profiler.add(self._name, end - self._start)
+        if self._profiler.tracer is not None:
+            self._profiler.tracer.record(self._name, self._start, end)
+        return False
+
+
+class StageProfiler:
+    """
+    Times the stages of the line-following loop into rolling (per summary
+    interval) and cumulative fixed-bucket histograms.
+
+    Usage:
+        with profiler.stage("crop"):
+            cropped_frame = crop_frame(frame, ...)
+        profiler.tick()  # once per loop iteration; also times the whole iteration as "loop"
+
+    While disabled, stage() returns a shared no-op context manager and tick()
+    returns immediately.
+    """
+    def __init__(self, enabled=True, summary_interval=10.0, logger=None, edges_ms=BUCKET_EDGES_MS, tracer=None):
+        """
+        Args:
+            enabled (bool): Collect timings.
+            summary_interval (float): Seconds between summaries logged by tick(), None to disable.
+            logger (logging.Logger): Logger for the summaries.
+            edges_ms (tuple): Histogram bucket upper edges in milliseconds.
+            tracer (Tracer): Also record every stage as a span, numbered by loop iteration.
+        """
+        self.enabled = enabled
+        self.summary_interval = summary_interval
+        self.logger = logger or logging.getLogger('LineFollowing')
+        self._edges_ms = edges_ms
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._window = {}
+        self._total = {}
+        self.last = {}  # Latest duration in seconds per stage
+        self._last_tick = None
+        self._last_summary = time.perf_counter()
+
+    def stage(self, name):
+        """Context manager timing the named stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _StageTimer(self, name)
+        return timer
+
+    def add(self, name, seconds):
+        """Record one duration for a stage."""
+        self.last[name] = seconds
+        with self._lock:
+            if name not in self._total:
+                self._window[name] = StageHistogram(self._edges_ms)
+                self._total[name] = StageHistogram(self._edges_ms)
+            self._window[name].add(seconds)
+            self._total[name].add(seconds)
+
+    def tick(self):
+        """Mark the start of a loop iteration and log a summary every summary_interval seconds."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            self.add("loop", now - self._last_tick)
+            if self.tracer is not None:
+                self.tracer.record("loop", self._last_tick, now)
+        self._last_tick = now
+        if self.tracer is not None:
+            self.tracer.frame_seq += 1
+        if self.summary_interval is not None and now - self._last_summary >= self.summary_interval:
+            self.log_summary()
+
+    def snapshot(self, window=False):
+        """
+        Args:
+            window (bool): Only timings since the last logged summary.
+
+        Returns:
+            dict: Stage name to histogram summary (count, mean/p50/p95/p99/max in ms, bucket counts).
+        """
+        with self._lock:
+            histograms = self._window if window else self._total
+            return {name: histogram.as_dict() for name, histogram in histograms.items()}
+
+    def wrap_vesc(self, vesc):
+        """Time every set_servo/set_rpm of vesc as the "vesc_write" stage."""
+        if not self.enabled:
+            return vesc
+        return _ProfiledVESC(vesc, self.stage("vesc_write"))
+
+    def log_summary(self):
+        """Log mean/p95/max of each stage since the previous summary and start a new window."""
+        stages = self.snapshot(window=True)
+        with self._lock:
+            for histogram in self._window.values():
+                histogram.reset()
+            self._last_summary = time.perf_counter()
+        lines = [f"{name:<15} n={s['count']:<5} mean {s['mean_ms']:.2f} ms  p95 <={s['p95_ms']:.2f} ms"
+                 f"  max {s['max_ms']:.2f} ms"
+                 for name, s in sorted(stages.items(), key=lambda item: -item[1]["count"] * (item[1]["mean_ms"] or 0))
+                 if s["count"]]
+        if lines:
+            self.logger.info("Stage timings:\n  " + "\n  ".join(lines))
+
+
+class _ProfiledVESC:
+    def __init__(self, vesc, timer):
+        self._vesc = vesc
+        self._timer = timer
+
+    def set_servo(self, value):
+        with self._timer:
+            self._vesc.set_servo(value)
+
+    def set_rpm(self, value):
+        with self._timer:
+            self._vesc.set_rpm(value)
+
+    def __getattr__(self, name):
+        return getattr(self._vesc, name)
@@ -0,0 +1,92 @@
+# synthetic_frames.py
+
+import cv2
+import numpy as np
+import control_vals as cv
+
+RESOLUTIONS = [(1280, 720), (640, 360), (320, 180)]
+
+BACKGROUND_BGR = (70, 70, 70)  # Gray track surface, matches none of the HSV ranges
+
+# Named scenes: line offset (fraction of half width), curvature (fraction of
+# width the line bends by at the top), end-of-track T-bar, spot color and side
+SCENES = {
+    "straight": dict(offset=0.0, curvature=0.0),
+    "offset_left": dict(offset=-0.3, curvature=0.0),
+    "offset_right": dict(offset=0.3, curvature=0.0),
+    "curve_left": dict(offset=0.0, curvature=-0.25),
+    "curve_right": dict(offset=0.1, curvature=0.25),
+    "endpoint": dict(offset=0.0, curvature=0.0, endpoint=True),
+    "no_line": dict(offset=None),
+    "red_left": dict(offset=0.0, spot="red", side="Left"),
+    "blue_right": dict(offset=0.0, spot="blue", side="Right"),
+    "green_left_bottom": dict(offset=0.0, spot="green", side="Left", rows=(3,)),
+}
+
+
+def color_bgr(color):
+    """BGR value in the middle of the HSV range configured for color."""
+    hsv_values = cv.HSV_VALUES[color]
+    hsv = np.uint8([[[(hsv_values["LOW_H"] + hsv_values["HIGH_H"]) // 2,
+                      (hsv_values["LOW_S"] + hsv_values["HIGH_S"]) // 2,
+                      (hsv_values["LOW_V"] + hsv_values["HIGH_V"]) // 2]]])
+    return tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+
+
+def cell_bounds(width, height, row, col):
+    """Pixel bounds (x1, y1, x2, y2) of a BAR_POSITIONS grid cell, rows counted from the top."""
+    y_h1 = height - int(height * cv.BAR_POSITIONS['horizontal1'] / 100)
+    y_h2 = height - int(height * cv.BAR_POSITIONS['horizontal2'] / 100)
+    rows = {1: (0, y_h2), 2: (y_h2, y_h1), 3: (y_h1, height)}
+    xs = [0] + [int(width * cv.BAR_POSITIONS[f'vertical{i}'] / 100) for i in range(1, 5)] + [width]
+    return xs[col - 1], rows[row][0], xs[col], rows[row][1]
+
+
+def make_frame(width, height, offset=0.0, curvature=0.0, endpoint=False, spot=None, side="Left", rows=(1, 3)):
+    """
+    Draw a synthetic camera frame.
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        offset (float): Line position at the bottom edge relative to the center,
+            in fractions of half the width, or None for no line.
+        curvature (float): Horizontal bend of the line at the top edge, in fractions of the width.
+        endpoint (bool): Draw an end-of-track T-bar across the cropped region.
+        spot (str): Color of parking spot patches, or None.
+        side (str): "Left" (grid column 2) or "Right" (grid column 4) for the spot.
+        rows (tuple): Grid rows the spot patches are drawn in.
+
+    Returns:
+        np.ndarray: BGR frame.
+    """
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = BACKGROUND_BGR
+    thickness = max(2, width // 40)
+
+    if spot is not None:
+        col = 2 if side == "Left" else 4
+        for row in rows:
+            x1, y1, x2, y2 = cell_bounds(width, height, row, col)
+            margin_x, margin_y = (x2 - x1) // 4, (y2 - y1) // 4
+            cv2.rectangle(frame, (x1 + margin_x, y1 + margin_y), (x2 - margin_x, y2 - margin_y),
+                          color_bgr(spot), -1)
+
+    if offset is not None:
+        yellow = color_bgr("yellow")
+        ys = np.linspace(height - 1, 0, 32)
+        progress = 1 - ys / (height - 1)
+        xs = width / 2 * (1 + offset) + curvature * width * progress ** 2
+        points = np.column_stack((xs, ys)).astype(np.int32)
+        cv2.polylines(frame, [points], False, yellow, thickness)
+
+        if endpoint:
+            y = height - int(height * cv.LINES["horizontal_y_percent"] / 200)
+            cv2.line(frame, (int(width * 0.1), y), (int(width * 0.9), y), yellow, thickness)
+
+    return frame
+
+
+def scene_frame(name, width, height):
+    """Frame for one of the named SCENES."""
+    return make_frame(width, height, **SCENES[name])
@@ -0,0 +1,203 @@
+# telemetry.py
+
+import argparse
+import csv
+import json
+import math
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b"PPTELEM1"
+HEADER_LENGTH = struct.Struct("<I")
+
+COLOR_CODES = {None: 0, "red": 1, "blue": 2, "green": 3}
+COLOR_NAMES = {code: color for color, code in COLOR_CODES.items()}
+SIDE_CODES = {None: 0, "Left": 1, "Right": 2}
+
+# Stage timings recorded per frame (milliseconds, NaN when stage profiling is off or the stage did not run)
+TELEMETRY_STAGES = ["frame_wait", "crop", "yellow_filter", "endpoint", "centroid", "spot_detection", "loop"]
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),           # Loop clock in seconds
+    ("frame", "<u4"),          # Loop iteration
+    ("state", "u1"),           # Robot state (perform_line_following.STATE_*)
+    ("paused", "u1"),
+    ("in_pause", "u1"),
+    ("color", "u1"),           # Color searched for, see COLOR_CODES
+    ("side", "u1"),            # Side of the detected spot, see SIDE_CODES
+    ("cx", "<i2"),             # Line centroid x in the cropped frame, -1 if not found
+    ("lost_frames", "<u2"),    # Consecutive frames without a line
+    ("offset", "<f4"),         # Normalized steering offset, NaN if not computed
+    ("steering", "<f4"),       # Last servo command
+    ("rpm", "<f4"),            # Last RPM command
+] + [(f"{stage}_ms", "<f4") for stage in TELEMETRY_STAGES])
+
+
+class CommandTracker:
+    """Remembers the last servo and RPM commands sent through wrap_vesc() and builds records."""
+    def __init__(self):
+        self._last_servo = math.nan
+        self._last_rpm = math.nan
+
+    def wrap_vesc(self, vesc):
+        """Forward commands to vesc, remembering the last servo and RPM values for the records."""
+        return _TelemetryVESC(vesc, self)
+
+    def make_record(self, timestamp, frame, state, paused, in_pause, color, side, cx, lost_frames, offset,
+                    stage_times=None):
+        """Field values of one RECORD_DTYPE record as a tuple."""
+        stage_ms = tuple(math.nan if seconds is None else seconds * 1000
+                         for seconds in (stage_times.get(stage) if stage_times else None
+                                         for stage in TELEMETRY_STAGES))
+        return (timestamp, frame, state, paused, in_pause, COLOR_CODES.get(color, 0), SIDE_CODES.get(side, 0),
+                -1 if cx is None else cx, min(lost_frames, 65535), math.nan if offset is None else offset,
+                self._last_servo, self._last_rpm) + stage_ms
+
+
+class TelemetryWriter(CommandTracker):
+    """
+    Appends one fixed-size binary record per loop iteration to a file.
+
+    The file starts with MAGIC, a little-endian uint32 header length and a
+    JSON header holding the NumPy dtype of the records, followed by the raw
+    records. record() fills a row of a preallocated structured array; full
+    blocks are written with a single write() call.
+    """
+    def __init__(self, path, block_records=512, meta=None):
+        super().__init__()
+        self.path = path
+        self.records = 0
+        self._block = np.zeros(block_records, dtype=RECORD_DTYPE)
+        self._count = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        header = json.dumps({
+            "dtype": RECORD_DTYPE.descr,
+            "stages": TELEMETRY_STAGES,
+            "colors": {str(code): color for code, color in COLOR_NAMES.items()},
+            "sides": {str(code): side for side, code in SIDE_CODES.items()},
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "meta": meta or {},
+        }).encode()
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+
+    def record(self, *args):
+        """
+        Add the record for one loop iteration. Takes the arguments of
+        make_record(); stage_times is the last duration in seconds per stage
+        name (StageProfiler.last), or None.
+        """
+        # One tuple assignment is much cheaper than setting the fields one by one
+        self._block[self._count] = self.make_record(*args)
+        self._count += 1
+        self.records += 1
+        if self._count == len(self._block):
+            self.flush()
+
+    def flush(self):
+        if self._count:
+            self._file.write(self._block[:self._count].tobytes())
+            self._file.flush()
+            self._count = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+
+class _TelemetryVESC:
+    def __init__(self, vesc, tracker):
+        self._vesc = vesc
+        self._tracker = tracker
+
+    def set_servo(self, value):
+        self._vesc.set_servo(value)
+        self._tracker._last_servo = value
+
+    def set_rpm(self, value):
+        self._vesc.set_rpm(value)
+        self._tracker._last_rpm = value
+
+    def __getattr__(self, name):
+        return getattr(self._vesc, name)
+
+
+def load_telemetry(path):
+    """
+    Load a telemetry file. A partially written last record is ignored.
+
+    Returns:
+        tuple: (header dict, NumPy structured array of records).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a telemetry file.")
+        (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+        header = json.loads(f.read(length))
+        offset = f.tell()
+    dtype = np.dtype([tuple(field) for field in header["dtype"]])
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    return header, np.fromfile(path, dtype=dtype, count=count, offset=offset)
+
+
+def summarize(records, header, state_names=None):
+    """Print summary statistics of a loaded run."""
+    if len(records) == 0:
+        print("No records.")
+        return
+    duration = records["time"][-1] - records["time"][0]
+    print(f"{len(records)} frames over {duration:.1f} s ({(len(records) - 1) / max(duration, 1e-9):.1f} Hz)")
+
+    print("\nTime per state:")
+    dt = np.diff(records["time"], append=records["time"][-1])
+    for state in np.unique(records["state"]):
+        name = (state_names or {}).get(int(state), str(state))
+        mask = records["state"] == state
+        print(f"  {name:<18} {dt[mask].sum():7.1f} s  ({mask.sum()} frames)")
+    print(f"  {'paused':<18} {dt[records['paused'] == 1].sum():7.1f} s")
+
+    following = records["cx"] >= 0
+    print(f"\nLine found in {following.mean():.1%} of frames, longest loss {records['lost_frames'].max()} frames")
+    if following.any():
+        cx = records["cx"][following]
+        offset = records["offset"][following]
+        print(f"cx mean {cx.mean():.1f} px, std {cx.std():.1f} px; offset mean {np.nanmean(offset):+.3f}, "
+              f"std {np.nanstd(offset):.3f}")
+    steering = records["steering"][~np.isnan(records["steering"])]
+    if len(steering):
+        print(f"steering mean {steering.mean():.3f}, std {steering.std():.3f}, "
+              f"range {steering.min():.2f}..{steering.max():.2f}")
+
+    timed = [stage for stage in header["stages"] if not np.isnan(records[f"{stage}_ms"]).all()]
+    if timed:
+        print(f"\n{'stage':<15} {'mean ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        for stage in timed:
+            ms = records[f"{stage}_ms"]
+            ms = ms[~np.isnan(ms)]
+            print(f"{stage:<15} {ms.mean():>8.2f} {np.percentile(ms, 95):>8.2f} {ms.max():>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print summary statistics of a telemetry file.")
+    parser.add_argument("path", help="Telemetry file written with TELEMETRY = True.")
+    parser.add_argument("--csv", default=None, help="Also export the records to this CSV file.")
+    args = parser.parse_args()
+
+    header, records = load_telemetry(args.path)
+    state_names = {int(state): name for state, name in header["meta"].get("states", {}).items()}
+    summarize(records, header, state_names)
+    if args.csv:
+        with open(args.csv, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(records.dtype.names)
+            writer.writerows(records.tolist())
+        print(f"\nRecords exported to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The modules live flat in Parallel_Parking; make them importable from the tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
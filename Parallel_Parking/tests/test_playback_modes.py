@@ -0,0 +1,25 @@
+# tests/test_playback_modes.py
+
+import os
+import pytest
+from motions.playback import load_motion_data
+from motions.simulate import simulate_motion, endpoint_error
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), '..', 'recordings')
+
+# Endpoint error distance mode must stay within, in meters
+DISTANCE_MODE_BOUND = 0.2
+
+
+@pytest.mark.parametrize("motor_tau, rpm_gain", [(0.15, 0.85), (0.3, 0.7)])
+def test_distance_mode_beats_time_mode_under_motor_lag(motor_tau, rpm_gain):
+    motion_data = load_motion_data(os.path.join(RECORDINGS_DIR, "U_Turn.csv"))
+    reference, _, _ = simulate_motion(motion_data, motor_tau=0, servo_rate=None)
+
+    errors = {}
+    for mode in ("time", "distance"):
+        pose, _, _ = simulate_motion(motion_data, motor_tau=motor_tau, rpm_gain=rpm_gain, mode=mode)
+        errors[mode], _ = endpoint_error(pose, reference)
+
+    assert errors["distance"] < errors["time"]
+    assert errors["distance"] < DISTANCE_MODE_BOUND
@@ -0,0 +1,25 @@
+# tests/test_startup.py
+
+import pytest
+import control_vals as cv
+from park import BENCHMARKS, COMMANDS, measure_startup
+
+SUBCOMMANDS = [[name] for name in COMMANDS] + [["bench", name] for name in BENCHMARKS]
+
+
+def test_cli_is_ready_within_budget_without_heavy_imports():
+    report = measure_startup([])
+    assert report["ready_ms"] <= cv.PARK_STARTUP_BUDGET_MS["cli"]
+    assert report["heavy"] == []
+    assert report["threads"] == []
+
+
+@pytest.mark.parametrize("argv", SUBCOMMANDS, ids=" ".join)
+def test_subcommand_import_starts_no_threads(argv):
+    try:
+        report = measure_startup(argv, repeat=1)
+    except RuntimeError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(f"dependency not installed: {str(e).strip().splitlines()[-1]}")
+        raise
+    assert report["threads"] == []
@@ -0,0 +1,131 @@
+# tiled_threshold.py
+
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+import control_vals as cv
+import calibration
+from filter_yellow_line import filter_yellow_line, KERNEL
+
+# Rows a band reads beyond its edges: the close is a dilation then an erosion,
+# each reaching kernel radius rows, so results further inside are exact
+HALO = 2 * (KERNEL.shape[0] // 2)
+
+
+class TiledFilter:
+    """
+    filter_yellow_line() split into horizontal bands processed on a persistent
+    thread pool. Each band is converted, thresholded and closed with HALO
+    extra rows on either side, and only its own rows are copied into the
+    result, so the mask is identical to the single-threaded one. OpenCV
+    releases the GIL in cvtColor, inRange and morphologyEx.
+    """
+    def __init__(self, threads=None, min_rows=None):
+        """
+        Args:
+            threads (int): Bands (and pool threads), defaults to VISION_TILE_THREADS, 0 meaning one per CPU core.
+            min_rows (int): Fewest rows per band, defaults to VISION_TILE_MIN_ROWS.
+        """
+        threads = threads if threads is not None else cv.VISION_TILE_THREADS
+        self.threads = threads or os.cpu_count() or 1
+        self.min_rows = min_rows if min_rows is not None else cv.VISION_TILE_MIN_ROWS
+        self._pool = None
+        if self.threads > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="VisionTile")
+
+    def bands(self, height):
+        """(top, bottom) rows of each band of a frame with the given height."""
+        count = max(1, min(self.threads, height // max(1, self.min_rows)))
+        edges = np.linspace(0, height, count + 1).astype(int)
+        return list(zip(edges[:-1], edges[1:]))
+
+    def __call__(self, frame, calib=None, close=True):
+        """Same result as filter_yellow_line(frame, calib, close)."""
+        bands = self.bands(frame.shape[0])
+        if self._pool is None or len(bands) == 1:
+            return filter_yellow_line(frame, calib, close)
+        lower_bound, upper_bound = (calib or calibration.current()).hsv_bounds["yellow"]
+        height = frame.shape[0]
+        mask = np.empty(frame.shape[:2], dtype=np.uint8)
+
+        def band_mask(band):
+            top, bottom = band
+            start, end = max(0, top - HALO), min(height, bottom + HALO)
+            hsv = cv2.cvtColor(frame[start:end], cv2.COLOR_BGR2HSV)
+            result = cv2.inRange(hsv, lower_bound, upper_bound)
+            if close:
+                result = cv2.morphologyEx(result, cv2.MORPH_CLOSE, KERNEL)
+            mask[top:bottom] = result[top - start:bottom - start]
+
+        # Consume the results so exceptions from the bands are raised here
+        for _ in self._pool.map(band_mask, bands):
+            pass
+        return mask
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def tiled_filter_yellow_line(frame, calib=None, close=True):
+    """filter_yellow_line() on the shared TiledFilter (VISION_TILE_THREADS threads), created on first use."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = TiledFilter()
+                atexit.register(_default.close)
+    return _default(frame, calib, close)
+
+
+def main():
+    import argparse
+    from crop_frame import crop_frame
+    from synthetic_frames import SCENES, scene_frame
+
+    parser = argparse.ArgumentParser(description="Scaling of tiled yellow thresholding with the thread count.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 3, 4], help="Thread counts to time.")
+    parser.add_argument("--resolution", default=f"{cv.CAMERA_RESOLUTION_WIDTH}x{cv.CAMERA_RESOLUTION_HEIGHT}",
+                        help="Frame size WIDTHxHEIGHT.")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed calls per scene.")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.resolution.lower().split("x"))
+    calib = calibration.current()
+    frames = [crop_frame(scene_frame(name, width, height), calib.lines["horizontal_y_percent"]) for name in SCENES]
+    print(f"{len(frames)} scenes, cropped to {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"{os.cpu_count()} CPU cores, OpenCV threads: {cv2.getNumThreads()}\n")
+
+    def median_ms(function):
+        for frame in frames:
+            function(frame, calib)
+        samples = []
+        for frame in frames:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                function(frame, calib)
+                samples.append((time.perf_counter() - start) * 1000)
+        return float(np.median(samples))
+
+    baseline = median_ms(filter_yellow_line)
+    print(f"{'threads':<10} {'median ms':>10} {'speedup':>8}  exact")
+    print(f"{'reference':<10} {baseline:>10.3f} {1.0:>8.2f}  -")
+    for threads in args.threads:
+        tiled = TiledFilter(threads)
+        exact = all(np.array_equal(tiled(frame, calib), filter_yellow_line(frame, calib)) for frame in frames)
+        elapsed = median_ms(tiled)
+        tiled.close()
+        print(f"{threads:<10} {elapsed:>10.3f} {baseline / elapsed:>8.2f}  {'yes' if exact else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# tracing.py
+
+import functools
+import json
+import os
+import signal
+import threading
+import time
+import numpy as np
+
+# Default number of spans kept; older spans are overwritten
+TRACE_CAPACITY = 65536
+
+
+class _Span:
+    """Context manager recording one span into the tracer."""
+    __slots__ = ("_tracer", "_name", "_seq", "_start")
+
+    def __init__(self, tracer, name, seq):
+        self._tracer = tracer
+        self._name = name
+        self._seq = seq
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.record(self._name, self._start, time.perf_counter(), self._seq)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Records begin/end spans (thread, stage name, frame sequence number) into a
+    preallocated ring buffer and exports them as Chrome Trace Event JSON,
+    which chrome://tracing and https://ui.perfetto.dev open directly.
+
+    Recording a span only writes five numbers into NumPy arrays, so tracing
+    can stay on for a whole run; the newest `capacity` spans are kept.
+    """
+    def __init__(self, capacity=TRACE_CAPACITY, enabled=False):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frame_seq = -1  # Frame being processed by the line-following loop
+        self._lock = threading.Lock()
+        self._starts = np.zeros(capacity, dtype=np.float64)
+        self._ends = np.zeros(capacity, dtype=np.float64)
+        self._tids = np.zeros(capacity, dtype=np.int64)
+        self._names = np.zeros(capacity, dtype=np.int32)
+        self._seqs = np.zeros(capacity, dtype=np.int64)
+        self._count = 0
+        self._name_ids = {}
+        self._thread_names = {}
+        self._origin = time.perf_counter()
+
+    def span(self, name, seq=None):
+        """Context manager recording a span; seq defaults to the current frame_seq."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, self.frame_seq if seq is None else seq)
+
+    def record(self, name, start, end, seq=None):
+        """Record a span given its perf_counter start and end times."""
+        if not self.enabled:
+            return
+        tid = threading.get_native_id()
+        with self._lock:
+            name_id = self._name_ids.get(name)
+            if name_id is None:
+                name_id = self._name_ids[name] = len(self._name_ids)
+            if tid not in self._thread_names:
+                self._thread_names[tid] = threading.current_thread().name
+            i = self._count % self.capacity
+            self._starts[i] = start
+            self._ends[i] = end
+            self._tids[i] = tid
+            self._names[i] = name_id
+            self._seqs[i] = self.frame_seq if seq is None else seq
+            self._count += 1
+
+    @property
+    def dropped(self):
+        """Number of spans overwritten because the buffer was full."""
+        return max(0, self._count - self.capacity)
+
+    def events(self):
+        """Recorded spans as Chrome Trace Event dicts, oldest first."""
+        with self._lock:
+            count = min(self._count, self.capacity)
+            order = (np.arange(count) + (self._count - count)) % self.capacity
+            starts, ends = self._starts[order], self._ends[order]
+            tids, names, seqs = self._tids[order], self._names[order], self._seqs[order]
+            name_list = sorted(self._name_ids, key=self._name_ids.get)
+            thread_names = dict(self._thread_names)
+
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in thread_names.items()]
+        for start, end, tid, name, seq in zip(starts.tolist(), ends.tolist(), tids.tolist(),
+                                              names.tolist(), seqs.tolist()):
+            event = {"name": name_list[name], "ph": "X", "pid": pid, "tid": tid,
+                     "ts": round((start - self._origin) * 1e6, 3), "dur": round((end - start) * 1e6, 3)}
+            if seq >= 0:
+                event["args"] = {"frame": seq}
+            events.append(event)
+        return events
+
+    def dump(self, path):
+        """Write the recorded spans to path as Chrome Trace Event JSON."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms",
+                       "otherData": {"dropped_spans": self.dropped}}, f)
+        return path
+
+
+# Process-wide tracer used by the instrumented modules; disabled until enable() is called
+TRACER = Tracer(capacity=1)
+
+
+def enable(capacity=TRACE_CAPACITY):
+    """Allocate the ring buffer and start recording spans."""
+    global TRACER
+    if not TRACER.enabled:
+        TRACER = Tracer(capacity, enabled=True)
+    return TRACER
+
+
+def get_tracer():
+    return TRACER
+
+
+def span(name, seq=None):
+    """Span on the process-wide tracer (a no-op while tracing is disabled)."""
+    return TRACER.span(name, seq)
+
+
+def traced(name):
+    """Decorator recording each call of the function as a span."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def dump_on_signal(path_factory, signum=signal.SIGUSR1):
+    """
+    Dump the trace whenever the process receives signum (e.g. kill -USR1 <pid>).
+    Must be called from the main thread.
+
+    Args:
+        path_factory (callable): Returns the file path for each dump.
+    """
+    def write():
+        print(f"Trace written to {TRACER.dump(path_factory())}")
+
+    def handler(signum, frame):
+        # The interrupted main thread may hold the tracer lock, so write from another thread
+        threading.Thread(target=write, daemon=True).start()
+    signal.signal(signum, handler)
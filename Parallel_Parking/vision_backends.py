@@ -0,0 +1,397 @@
+# vision_backends.py
+
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+import control_vals as cv
+import calibration
+from crop_frame import crop_frame
+from filter_yellow_line import filter_yellow_line, KERNEL
+from get_line_position import get_line_position
+from detect_endpoint import detect_endpoint, endpoint_columns
+from color_detection import _detect_color_in_roi, detect_color_in_boxes, is_color_present_in_row
+from tiled_threshold import tiled_filter_yellow_line
+
+logger = logging.getLogger('LineFollowing')
+
+# Stages a backend can replace; the rest come from the reference ("opencv") backend
+STAGES = ["filter_yellow_line", "get_line_position", "detect_endpoint", "color_in_roi"]
+REFERENCE = "opencv"
+
+# Grid cells checked by the color stages (color_detection.py)
+COLOR_CELLS = [(row, col) for row in (1, 2, 3) for col in (2, 4)]
+
+
+class VisionBackend:
+    """
+    Vision stage functions with the signatures of the reference modules:
+        filter_yellow_line(frame, calib=None, close=True) -> mask
+        get_line_position(mask) -> cx or None
+        detect_endpoint(mask, vertical_lines, overlays=None) -> bool
+        color_in_roi(roi, bounds) -> bool, bounds being (lower, upper) HSV arrays
+    detect_color_in_boxes() and is_color_present_in_row() use color_in_roi.
+    """
+    crop_frame = staticmethod(crop_frame)
+
+    def __init__(self, name, filter_yellow_line=filter_yellow_line, get_line_position=get_line_position,
+                 detect_endpoint=detect_endpoint, color_in_roi=_detect_color_in_roi, stages=None):
+        self.name = name
+        self.filter_yellow_line = filter_yellow_line
+        self.get_line_position = get_line_position
+        self.detect_endpoint = detect_endpoint
+        self.color_in_roi = color_in_roi
+        # Backend each stage comes from
+        self.stages = stages or {stage: name for stage in STAGES}
+
+    def detect_color_in_boxes(self, color, device, calib=None):
+        return detect_color_in_boxes(color, device, calib, self.color_in_roi)
+
+    def is_color_present_in_row(self, color, device, row, calib=None):
+        return is_color_present_in_row(color, device, row, calib, self.color_in_roi)
+
+    def __repr__(self):
+        if all(backend == self.name for backend in self.stages.values()):
+            return f"VisionBackend({self.name})"
+        return f"VisionBackend({', '.join(f'{stage}={backend}' for stage, backend in self.stages.items())})"
+
+
+BACKENDS = {}
+
+
+def register_backend(name, **functions):
+    """
+    Register a backend. Stages not given are taken from the reference, so a
+    backend can replace a single stage. A module registering a backend can
+    be named in VISION_BACKEND_PLUGINS.
+
+    Returns:
+        VisionBackend: The registered backend.
+    """
+    unknown = set(functions) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown vision stage(s): {', '.join(sorted(unknown))}.")
+    BACKENDS[name] = VisionBackend(name, **functions)
+    return BACKENDS[name]
+
+
+def compose(stages):
+    """Backend taking each stage from the backend named in stages."""
+    functions = {stage: getattr(BACKENDS[backend], stage) for stage, backend in stages.items()}
+    backends = set(stages.values())
+    name = backends.pop() if len(backends) == 1 else "mixed"
+    return VisionBackend(name, stages=dict(stages), **functions)
+
+
+# NumPy backend: thresholds and reductions on arrays instead of cv2.inRange/countNonZero
+
+def _numpy_in_range(hsv, bounds):
+    lower, upper = bounds
+    return ((hsv >= lower) & (hsv <= upper)).all(axis=2)
+
+
+def numpy_filter_yellow_line(frame, calib=None, close=True):
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    mask = _numpy_in_range(hsv, (calib or calibration.current()).hsv_bounds["yellow"]).view(np.uint8) * 255
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, KERNEL) if close else mask
+
+
+def numpy_detect_endpoint(mask, vertical_lines, overlays=None):
+    height, width = mask.shape
+    line1_x, line2_x = endpoint_columns(width, vertical_lines)
+    if overlays is not None:
+        overlays.append(("line", (line1_x, 0), (line1_x, height), (0, 255, 0), 2))
+        overlays.append(("line", (line2_x, 0), (line2_x, height), (0, 255, 0), 2))
+    return bool(mask[:, :line1_x].any()) and bool(mask[:, line2_x:].any())
+
+
+def numpy_color_in_roi(roi, bounds):
+    if roi is None or roi.size == 0:
+        return False
+    return bool(_numpy_in_range(cv2.cvtColor(roi, cv2.COLOR_BGR2HSV), bounds).any())
+
+
+# LUT backend: per-channel lookup tables built once per HSV range
+
+_luts = {}
+
+
+def _lut(bounds):
+    """Lookup table (3 x 256 bool) of the HSV values inside bounds, cached per range."""
+    key = bounds[0].tobytes() + bounds[1].tobytes()
+    table = _luts.get(key)
+    if table is None:
+        values = np.arange(256)
+        table = np.stack([(values >= bounds[0][i]) & (values <= bounds[1][i]) for i in range(3)])
+        _luts[key] = table
+    return table
+
+
+def _lut_in_range(hsv, bounds):
+    table = _lut(bounds)
+    return table[0][hsv[..., 0]] & table[1][hsv[..., 1]] & table[2][hsv[..., 2]]
+
+
+def lut_filter_yellow_line(frame, calib=None, close=True):
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    mask = _lut_in_range(hsv, (calib or calibration.current()).hsv_bounds["yellow"]).view(np.uint8) * 255
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, KERNEL) if close else mask
+
+
+def lut_color_in_roi(roi, bounds):
+    if roi is None or roi.size == 0:
+        return False
+    return bool(_lut_in_range(cv2.cvtColor(roi, cv2.COLOR_BGR2HSV), bounds).any())
+
+
+# Connected components backend: centroid of the largest blob by pixel count
+
+def components_get_line_position(mask):
+    count, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count < 2:
+        return None
+    largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    return int(centroids[largest][0])
+
+
+register_backend(REFERENCE)
+register_backend("numpy", filter_yellow_line=numpy_filter_yellow_line,
+                 detect_endpoint=numpy_detect_endpoint, color_in_roi=numpy_color_in_roi)
+register_backend("lut", filter_yellow_line=lut_filter_yellow_line, color_in_roi=lut_color_in_roi)
+register_backend("components", get_line_position=components_get_line_position)
+register_backend("tiled", filter_yellow_line=tiled_filter_yellow_line)
+
+
+def reference_frames(width, height):
+    """Synthetic scenes (synthetic_frames.py) at the camera resolution, for the parity check and the benchmark."""
+    from synthetic_frames import SCENES, make_frame
+    return [make_frame(width, height, **scene) for scene in SCENES.values()]
+
+
+def _stage_cases(frames, calib):
+    """
+    Calls of each stage over the reference frames, as (args, expected result)
+    pairs with the results of the reference backend.
+    """
+    reference = BACKENDS[REFERENCE]
+    cases = {stage: [] for stage in STAGES}
+    for frame in frames:
+        cropped = crop_frame(frame, calib.lines["horizontal_y_percent"])
+        mask = reference.filter_yellow_line(cropped, calib)
+        cases["filter_yellow_line"].append(((cropped, calib), mask))
+        cases["get_line_position"].append(((mask,), reference.get_line_position(mask)))
+        cases["detect_endpoint"].append(((mask, calib.lines), reference.detect_endpoint(mask, calib.lines)))
+        geometry = calib.geometry(frame.shape[1], frame.shape[0])
+        for row, col in COLOR_CELLS:
+            roi = geometry.cell(frame, row, col)
+            for color in calib.hsv_bounds:
+                bounds = calib.hsv_bounds[color]
+                cases["color_in_roi"].append(((roi, bounds), reference.color_in_roi(roi, bounds)))
+    return cases
+
+
+def _matches(stage, result, expected, cx_tolerance):
+    if stage == "filter_yellow_line":
+        return result.shape == expected.shape and np.array_equal(result, expected)
+    if stage == "get_line_position":
+        if result is None or expected is None:
+            return result is None and expected is None
+        return abs(result - expected) <= cx_tolerance
+    return bool(result) == bool(expected)
+
+
+def parity_failures(backend, cases, cx_tolerance):
+    """
+    Returns:
+        list: Stages of backend (among those it replaces) whose results differ from the reference.
+    """
+    failed = []
+    for stage in STAGES:
+        function = getattr(backend, stage)
+        if function is getattr(BACKENDS[REFERENCE], stage) and backend.name != REFERENCE:
+            continue
+        try:
+            if not all(_matches(stage, function(*args), expected, cx_tolerance) for args, expected in cases[stage]):
+                failed.append(stage)
+        except Exception as e:
+            logger.warning(f"Vision backend {backend.name} failed in {stage}: {e}")
+            failed.append(stage)
+    return failed
+
+
+def _time_stage(function, cases, repeat):
+    """Median time in microseconds of one pass over the stage's calls."""
+    samples = []
+    for _ in range(repeat + 1):  # First pass warms up caches and allocations
+        start = time.perf_counter()
+        for args, _ in cases:
+            function(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(samples[1:]))
+
+
+def autotune(width, height, repeat=None, cx_tolerance=None, calib=None):
+    """
+    Benchmark every registered backend on the reference frames and choose,
+    per stage, the fastest one whose results match the reference backend.
+
+    Returns:
+        dict: "stages" (stage to backend name), "timings_us" (backend to stage
+        to median microseconds per pass) and "rejected" (backend to stages failing the parity check).
+    """
+    repeat = repeat if repeat is not None else cv.VISION_AUTOTUNE_REPEAT
+    cx_tolerance = cx_tolerance if cx_tolerance is not None else cv.VISION_PARITY_CX_TOLERANCE
+    calib = calib or calibration.current()
+    cases = _stage_cases(reference_frames(width, height), calib)
+
+    timings, rejected = {}, {}
+    for name, backend in BACKENDS.items():
+        failed = parity_failures(backend, cases, cx_tolerance)
+        if failed:
+            rejected[name] = failed
+        timings[name] = {}
+        for stage in STAGES:
+            function = getattr(backend, stage)
+            if stage in failed or (name != REFERENCE and function is getattr(BACKENDS[REFERENCE], stage)):
+                continue
+            timings[name][stage] = round(_time_stage(function, cases[stage], repeat), 1)
+
+    stages = {}
+    for stage in STAGES:
+        candidates = [(stage_timings[stage], name) for name, stage_timings in timings.items() if stage in stage_timings]
+        stages[stage] = min(candidates)[1]
+    return {"stages": stages, "timings_us": timings, "rejected": rejected}
+
+
+def cache_key(width, height):
+    """Cache key of autotune results: machine, library versions and resolution."""
+    return (f"{platform.node()}/{platform.machine()}/python {platform.python_version()}"
+            f"/opencv {cv2.__version__}/numpy {np.__version__}/{width}x{height}")
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(path, cache):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".vision_backends_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=4)
+            f.write("\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_plugins(modules=None):
+    """Import the modules in VISION_BACKEND_PLUGINS so they can register backends."""
+    import importlib
+    for module in (modules if modules is not None else cv.VISION_BACKEND_PLUGINS):
+        importlib.import_module(module)
+
+
+_active = None
+
+
+def select_backend(width=None, height=None, choice=None, cache_path=None, retune=False):
+    """
+    Choose the vision backend for the line-following loop and make it the
+    one get_backend() returns.
+
+    Args:
+        width (int): Frame width, defaults to CAMERA_RESOLUTION_WIDTH.
+        height (int): Frame height, defaults to CAMERA_RESOLUTION_HEIGHT.
+        choice (str): A backend name, or "auto" to autotune; defaults to VISION_BACKEND.
+        cache_path (str): Autotune cache, defaults to VISION_BACKEND_CACHE.
+        retune (bool): Autotune even when a cached result exists.
+
+    Returns:
+        VisionBackend: The selected backend.
+    """
+    global _active
+    width = width or cv.CAMERA_RESOLUTION_WIDTH
+    height = height or cv.CAMERA_RESOLUTION_HEIGHT
+    choice = choice or cv.VISION_BACKEND
+    cache_path = cache_path or cv.VISION_BACKEND_CACHE
+    load_plugins()
+
+    if choice != "auto":
+        if choice not in BACKENDS:
+            raise ValueError(f"Unknown vision backend '{choice}'; registered: {', '.join(BACKENDS)}.")
+        _active = BACKENDS[choice]
+    else:
+        cache = _read_cache(cache_path)
+        key = cache_key(width, height)
+        entry = cache.get(key)
+        # Re-tune when the registered backends changed since the cached run
+        if retune or not entry or entry.get("backends") != sorted(BACKENDS) \
+                or not all(entry["stages"].get(stage) in BACKENDS for stage in STAGES):
+            start = time.perf_counter()
+            entry = autotune(width, height)
+            entry["backends"] = sorted(BACKENDS)
+            for name, stages in entry["rejected"].items():
+                logger.warning(f"Vision backend {name} does not match the reference in: {', '.join(stages)}")
+            logger.info(f"Vision backends tuned for {width}x{height} in {time.perf_counter() - start:.1f} s.")
+            cache[key] = entry
+            try:
+                _write_cache(cache_path, cache)
+            except OSError as e:
+                logger.warning(f"Cannot write vision backend cache {cache_path}: {e}")
+        _active = compose(entry["stages"])
+
+    logger.info(f"Vision backend: {_active!r}")
+    print(f"Vision backend: {_active!r}")
+    return _active
+
+
+def get_backend():
+    """The backend chosen by select_backend(), the reference backend if none was chosen."""
+    return _active or BACKENDS[REFERENCE]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the vision backends and choose the fastest matching one.")
+    parser.add_argument("--resolution", default=None,
+                        help="WIDTHxHEIGHT, defaults to CAMERA_RESOLUTION_WIDTH x CAMERA_RESOLUTION_HEIGHT.")
+    parser.add_argument("--backend", default="auto", help="Backend name, or auto (default).")
+    parser.add_argument("--retune", action="store_true", help="Ignore the cached result.")
+    args = parser.parse_args()
+
+    width = height = None
+    if args.resolution:
+        width, height = (int(value) for value in args.resolution.lower().split("x"))
+    select_backend(width, height, args.backend, retune=args.retune)
+    if args.backend == "auto":
+        entry = _read_cache(cv.VISION_BACKEND_CACHE).get(cache_key(width or cv.CAMERA_RESOLUTION_WIDTH,
+                                                                   height or cv.CAMERA_RESOLUTION_HEIGHT), {})
+        print(f"\n{'backend':<14}" + "".join(f"{stage:>22}" for stage in STAGES))
+        for name, stage_timings in entry.get("timings_us", {}).items():
+            cells = []
+            for stage in STAGES:
+                if stage in entry.get("rejected", {}).get(name, []):
+                    cells.append(f"{'mismatch':>22}")
+                elif stage in stage_timings:
+                    mark = "*" if entry["stages"][stage] == name else " "
+                    cells.append(f"{stage_timings[stage]:>19.1f}us{mark}")
+                else:
+                    cells.append(f"{'-':>22}")
+            print(f"{name:<14}" + "".join(cells))
+        print("\n* selected; times are one pass over all reference frames")
+
+
+if __name__ == "__main__":
+    sys.modules.setdefault("vision_backends", sys.modules[__name__])
+    main()
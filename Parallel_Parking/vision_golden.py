@@ -0,0 +1,291 @@
+# vision_golden.py
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+import calibration
+import vision_backends
+from crop_frame import crop_frame
+from filter_yellow_line import filter_yellow_line
+from get_line_position import get_line_position
+from detect_endpoint import detect_endpoint
+from color_detection import detect_color_in_boxes, is_color_present_in_row
+from bench_vision import StaticFrameDevice
+from synthetic_frames import SCENES, make_frame
+
+LABEL_FILE = "golden.json"
+ROWS = [1, 2, 3]
+METRICS = ["line_found", "cx", "endpoint", "spot_side", "row_occupancy"]
+
+
+class VisionImplementation:
+    """A set of vision functions with the signatures of the reference modules."""
+    def __init__(self, crop_frame=crop_frame, filter_yellow_line=filter_yellow_line,
+                 detect_endpoint=detect_endpoint, get_line_position=get_line_position,
+                 detect_color_in_boxes=detect_color_in_boxes, is_color_present_in_row=is_color_present_in_row):
+        self.crop_frame = crop_frame
+        self.filter_yellow_line = filter_yellow_line
+        self.detect_endpoint = detect_endpoint
+        self.get_line_position = get_line_position
+        self.detect_color_in_boxes = detect_color_in_boxes
+        self.is_color_present_in_row = is_color_present_in_row
+
+
+IMPLEMENTATIONS = {"reference": VisionImplementation()}
+
+
+def register_implementation(name, **functions):
+    """
+    Register an implementation for the harness. Functions not given are
+    taken from the reference, so an implementation can replace a single stage.
+    """
+    IMPLEMENTATIONS[name] = VisionImplementation(**functions)
+    return IMPLEMENTATIONS[name]
+
+
+def analyze_frame(impl, frame, colors, calib):
+    """
+    Run one implementation on a frame, as the line-following loop does.
+
+    Returns:
+        dict: Observations in the label format (cx, endpoint, spots).
+    """
+    cropped = impl.crop_frame(frame, calib.lines["horizontal_y_percent"])
+    mask = impl.filter_yellow_line(cropped)
+    result = {"endpoint": bool(impl.detect_endpoint(mask, calib.lines)),
+              "cx": impl.get_line_position(mask), "spots": {}}
+    device = StaticFrameDevice(frame)
+    for color in colors:
+        _, side = impl.detect_color_in_boxes(color, device)
+        result["spots"][color] = {"side": side,
+                                  "rows": [row for row in ROWS if impl.is_color_present_in_row(color, device, row)]}
+    return result
+
+
+def load_dataset(directory):
+    """
+    Load a golden dataset: LABEL_FILE in directory listing
+    {"frames": [{"image": ..., "cx": int or null, "endpoint": bool,
+    "spots": {color: {"side": "Left"/"Right"/null, "rows": [...]}}}]}.
+
+    Returns:
+        list: (label, BGR frame) pairs.
+    """
+    with open(os.path.join(directory, LABEL_FILE)) as f:
+        labels = json.load(f)["frames"]
+    dataset = []
+    for label in labels:
+        frame = cv2.imread(os.path.join(directory, label["image"]))
+        if frame is None:
+            raise ValueError(f"Cannot read {label['image']} in {directory}.")
+        dataset.append((label, frame))
+    return dataset
+
+
+def score_frame(label, observed, cx_tolerance):
+    """Per-metric correctness (True/False, or None when the metric does not apply) of one frame."""
+    scores = {"line_found": (label["cx"] is None) == (observed["cx"] is None),
+              "endpoint": label["endpoint"] == observed["endpoint"]}
+    scores["cx"] = (abs(label["cx"] - observed["cx"]) <= cx_tolerance
+                    if label["cx"] is not None and observed["cx"] is not None else None)
+    spots = label.get("spots", {})
+    scores["spot_side"] = all(observed["spots"][color]["side"] == spot["side"] for color, spot in spots.items()) \
+        if spots else None
+    scores["row_occupancy"] = all(sorted(observed["spots"][color]["rows"]) == sorted(spot["rows"])
+                                  for color, spot in spots.items()) if spots else None
+    return scores
+
+
+def evaluate(impl, dataset, cx_tolerance=3, repeat=1, calib=None):
+    """
+    Accuracy and throughput of an implementation on a dataset.
+
+    Returns:
+        dict: Accuracy per metric (share of frames where it applies), mean cx
+        error in pixels, frames per second and the names of failing frames.
+    """
+    calib = calib or calibration.current()
+    totals = {metric: [0, 0] for metric in METRICS}
+    cx_errors = []
+    failures = []
+    elapsed = 0.0
+    for label, frame in dataset:
+        colors = list(label.get("spots", {}))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            observed = analyze_frame(impl, frame, colors, calib)
+        elapsed += time.perf_counter() - start
+        scores = score_frame(label, observed, cx_tolerance)
+        for metric, correct in scores.items():
+            if correct is not None:
+                totals[metric][0] += correct
+                totals[metric][1] += 1
+        if label["cx"] is not None and observed["cx"] is not None:
+            cx_errors.append(abs(label["cx"] - observed["cx"]))
+        if not all(correct is not False for correct in scores.values()):
+            failures.append(label["image"])
+    return {
+        "accuracy": {metric: (correct / count if count else None) for metric, (correct, count) in totals.items()},
+        "cx_mean_error_px": float(np.mean(cx_errors)) if cx_errors else None,
+        "fps": len(dataset) * repeat / max(elapsed, 1e-9),
+        "failures": failures,
+    }
+
+
+def compare(result, reference, tolerance):
+    """
+    Returns:
+        list: (metric, reference accuracy, accuracy) for each metric more than tolerance below the reference.
+    """
+    regressions = []
+    for metric in METRICS:
+        base, value = reference["accuracy"][metric], result["accuracy"][metric]
+        if base is not None and value is not None and value < base - tolerance:
+            regressions.append((metric, base, value))
+    return regressions
+
+
+def write_dataset(directory, entries):
+    """Write (label, frame) pairs as a golden dataset."""
+    os.makedirs(directory, exist_ok=True)
+    labels = []
+    for label, frame in entries:
+        cv2.imwrite(os.path.join(directory, label["image"]), frame)
+        labels.append(label)
+    with open(os.path.join(directory, LABEL_FILE), "w") as f:
+        json.dump({"frames": labels}, f, indent=2)
+        f.write("\n")
+
+
+def bootstrap_labels(frames, colors, calib=None):
+    """
+    Label frames with the reference implementation, as a starting point for
+    a dataset from real frames. Review the labels before relying on them.
+    """
+    calib = calib or calibration.current()
+    entries = []
+    for i, frame in enumerate(frames):
+        observed = analyze_frame(IMPLEMENTATIONS["reference"], frame, colors, calib)
+        entries.append((dict(image=f"{i:05d}.png", **observed), frame))
+    return entries
+
+
+def synthetic_dataset(resolution=(640, 360), variants=4, seed=0):
+    """
+    Golden frames from the synthetic scenes with lighting and noise variants.
+    Endpoint and spot labels come from the scene definitions, cx from the
+    reference implementation on the clean frame.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = resolution
+    calib = calibration.current()
+    reference = IMPLEMENTATIONS["reference"]
+    entries = []
+    for name, scene in SCENES.items():
+        clean = make_frame(width, height, **scene)
+        cropped = crop_frame(clean, calib.lines["horizontal_y_percent"])
+        cx = reference.get_line_position(reference.filter_yellow_line(cropped))
+        spots = {}
+        if scene.get("spot"):
+            rows = list(scene.get("rows", (1, 3)))
+            spots[scene["spot"]] = {"side": scene["side"] if rows == [1, 3] else None, "rows": rows}
+        for variant in range(variants):
+            frame = clean
+            if variant:
+                gain = rng.uniform(0.92, 1.08)
+                frame = np.clip(clean * gain + rng.normal(0, 2.0, clean.shape), 0, 255).astype(np.uint8)
+            entries.append(({"image": f"{name}_{variant}.png", "scene": name, "cx": cx,
+                             "endpoint": bool(scene.get("endpoint", False)), "spots": spots}, frame))
+    return entries
+
+
+def print_results(results, reference_name):
+    reference = results[reference_name]
+    print(f"{'implementation':<20} {'fps':>8} " + " ".join(f"{metric:>14}" for metric in METRICS))
+    for name, result in results.items():
+        cells = []
+        for metric in METRICS:
+            value = result["accuracy"][metric]
+            base = reference["accuracy"][metric]
+            if value is None:
+                cells.append(f"{'-':>14}")
+            elif name == reference_name or base is None:
+                cells.append(f"{value:>14.3f}")
+            else:
+                cells.append(f"{value:.3f} ({value - base:+.3f})".rjust(14))
+        print(f"{name:<20} {result['fps']:>8.1f} " + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check vision implementations against a golden dataset.")
+    parser.add_argument("dataset", help=f"Directory with frames and {LABEL_FILE}.")
+    parser.add_argument("--impl", nargs="+", default=None, help="Implementations to run (default: all registered).")
+    parser.add_argument("--plugin", action="append", default=[],
+                        help="Module to import that registers implementations with register_implementation().")
+    parser.add_argument("--reference", default="reference", help="Implementation the others are compared to.")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Allowed accuracy drop against the reference per metric before failing.")
+    parser.add_argument("--cx-tolerance", type=int, default=3, help="Pixels cx may differ from the label.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per frame for the throughput figure.")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON.")
+    parser.add_argument("--synthetic", action="store_true", help="Create the dataset from the synthetic scenes.")
+    parser.add_argument("--bootstrap", nargs="+", default=None, metavar="IMAGE",
+                        help="Create the dataset by labeling these images with the reference implementation.")
+    parser.add_argument("--colors", nargs="+", default=["red", "blue", "green"],
+                        help="Spot colors labeled by --bootstrap.")
+    args = parser.parse_args()
+
+    if args.synthetic or args.bootstrap:
+        if args.synthetic:
+            entries = synthetic_dataset()
+        else:
+            entries = bootstrap_labels([cv2.imread(path) for path in args.bootstrap], args.colors)
+        write_dataset(args.dataset, entries)
+        print(f"Wrote {len(entries)} labeled frames to {args.dataset}")
+        return
+
+    for module in args.plugin:
+        importlib.import_module(module)
+    # Vision backends (vision_backends.py) are checked too; "opencv" is the reference itself
+    vision_backends.load_plugins()
+    for name, backend in vision_backends.BACKENDS.items():
+        if name != vision_backends.REFERENCE:
+            IMPLEMENTATIONS.setdefault(name, backend)
+    names = args.impl or list(IMPLEMENTATIONS)
+    if args.reference not in names:
+        names.insert(0, args.reference)
+    unknown = [name for name in names if name not in IMPLEMENTATIONS]
+    if unknown:
+        parser.error(f"unknown implementation(s): {', '.join(unknown)}; registered: {', '.join(IMPLEMENTATIONS)}")
+
+    dataset = load_dataset(args.dataset)
+    results = {name: evaluate(IMPLEMENTATIONS[name], dataset, args.cx_tolerance, args.repeat) for name in names}
+    print(f"{len(dataset)} frames\n")
+    print_results(results, args.reference)
+
+    failed = False
+    for name, result in results.items():
+        if result["failures"]:
+            print(f"\n{name}: frames not matching the labels: {', '.join(result['failures'][:10])}"
+                  + (" ..." if len(result["failures"]) > 10 else ""))
+        if name == args.reference:
+            continue
+        for metric, base, value in compare(result, results[args.reference], args.tolerance):
+            print(f"REGRESSION {name}: {metric} accuracy {value:.3f} vs {base:.3f} for {args.reference}")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    # Plugins import vision_golden; let them register into this module's IMPLEMENTATIONS
+    sys.modules.setdefault("vision_golden", sys.modules[__name__])
+    main()
@@ -0,0 +1,146 @@
+# warmup.py
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import control_vals as cv
+
+logger = logging.getLogger('Main')
+
+# Recordings preloaded besides U_Turn.csv, so the maneuvers start without reading files
+MANEUVER_RECORDINGS = ["Left_Parking.csv", "Right_Parking.csv", "Left_Exit.csv", "Right_Exit.csv"]
+
+
+class WarmUp:
+    """
+    Runs bring-up tasks (VESC, camera, motion data, vision) concurrently on
+    background threads from launch, so they are done by the time the start
+    button is pressed. Records when each task finished relative to start and
+    reports failures as soon as they happen.
+    """
+    def __init__(self, logger=logger, clock=time.monotonic):
+        self.logger = logger
+        self._clock = clock
+        self.started = clock()
+        self.timings = {}  # Task name to seconds from start until done
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="WarmUp")
+
+    def add(self, name, function, *args, **kwargs):
+        """Start function(*args, **kwargs) as the task name."""
+        future = self._executor.submit(self._run, name, function, args, kwargs)
+        self._futures[name] = future
+        return future
+
+    def _run(self, name, function, args, kwargs):
+        try:
+            return function(*args, **kwargs)
+        except BaseException as e:
+            # Report right away; the exception is raised again by result()
+            self.logger.error(f"Warm-up of {name} failed: {e}")
+            print(f"Warm-up of {name} failed: {e}")
+            raise
+        finally:
+            with self._lock:
+                self.timings[name] = self._clock() - self.started
+
+    def pending(self):
+        """Names of the tasks still running."""
+        return [name for name, future in self._futures.items() if not future.done()]
+
+    def wait(self, status_interval=1.0):
+        """Wait for all tasks, printing the ones still running every status_interval seconds."""
+        while True:
+            done, not_done = wait(list(self._futures.values()), timeout=status_interval)
+            if not not_done:
+                return
+            print(f"Waiting for {', '.join(self.pending())} ({self._clock() - self.started:.1f} s)")
+
+    def result(self, name):
+        """Value of task name, waiting for it; raises the task's exception if it failed."""
+        return self._futures[name].result()
+
+    def report(self):
+        """Log and print when each task became ready."""
+        with self._lock:
+            parts = [f"{name} {seconds:.2f} s" for name, seconds in sorted(self.timings.items(), key=lambda x: x[1])]
+            ready = max(self.timings.values(), default=0.0)
+        text = f"Warm-up ready {ready:.2f} s after launch: {', '.join(parts)}"
+        self.logger.info(text)
+        print(text)
+
+    def close(self):
+        """Stop waiting for tasks that have not started; running ones finish in the background."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class WarmCamera:
+    """
+    OAK-D Lite booted and streaming before the run starts. Pass it as the
+    device of perform_line_following(); it stays open until close().
+    """
+    def __init__(self, warmup_frames=None):
+        """
+        Args:
+            warmup_frames (int): Frames read before the camera counts as ready (auto exposure
+                settles on them), defaults to CAMERA_WARMUP_FRAMES.
+        """
+        import depthai as dai
+        from camera import create_camera_pipeline
+        self._device = dai.Device(create_camera_pipeline())
+        self._queue = self._device.getOutputQueue(name="rgb", maxSize=4, blocking=False)
+        for _ in range(warmup_frames if warmup_frames is not None else cv.CAMERA_WARMUP_FRAMES):
+            self._queue.get()
+
+    def getOutputQueue(self, *args, **kwargs):
+        return self._queue
+
+    def drain(self):
+        """Drop the frames queued while waiting, so the loop starts on a fresh one."""
+        try_get_all = getattr(self._queue, "tryGetAll", None)
+        if try_get_all is not None:
+            try_get_all()
+
+    def close(self):
+        self._device.close()
+
+
+def load_motions(u_turn_file):
+    """
+    Load the U-turn data and preload the maneuver recordings (filling the
+    trajectory cache when MOTION_RESAMPLE_HZ is set).
+
+    Returns:
+        list: U-turn motion data.
+    """
+    from motions.U_Turn import load_u_turn_data
+    from motions.playback import load_recording
+    motion_data = load_u_turn_data(u_turn_file)
+    for name in MANEUVER_RECORDINGS:
+        path = os.path.join(cv.RECORDINGS_DIR, name)
+        if os.path.exists(path):
+            load_recording(path)
+        else:
+            logger.warning(f"Maneuver recording {path} not found.")
+    return motion_data
+
+
+def prepare_vision():
+    """Select the vision backend and run it once on a synthetic frame, so the first camera frame is not the first call."""
+    import calibration
+    from crop_frame import crop_frame
+    from synthetic_frames import make_frame
+    from bench_vision import StaticFrameDevice
+    from vision_backends import select_backend
+
+    vision = select_backend()
+    calib = calibration.current()
+    frame = make_frame(cv.CAMERA_RESOLUTION_WIDTH, cv.CAMERA_RESOLUTION_HEIGHT, spot="red")
+    mask = vision.filter_yellow_line(crop_frame(frame, calib.lines["horizontal_y_percent"]), calib)
+    vision.detect_endpoint(mask, calib.lines)
+    vision.get_line_position(mask)
+    vision.detect_color_in_boxes("red", StaticFrameDevice(frame), calib)
+    return vision